@@ -4,9 +4,10 @@ import os
 # Evita problemas de fork com GUI e libs nativas no macOS
 os.environ.setdefault("OBJC_DISABLE_INITIALIZE_FORK_SAFETY", "YES")
 
-# Reduz contenção/segfault por excesso de threads nativas
-for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS"):
-    os.environ.setdefault(var, "1")
+# Threads nativas (OpenMP/MKL): 1 no perfil "safe" (macOS), núcleos disponíveis no "auto".
+# Precisa vir antes de qualquer import de numpy/torch. Ver app/threads.py.
+from app.threads import apply_env_defaults  # noqa: E402
+apply_env_defaults()
 
 # Evita barulho de paralelismo de tokenizers
 os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
@@ -25,10 +26,5 @@ except RuntimeError:
     # já definido
     pass
 
-# Limita threads do Torch se ele já estiver disponível
-try:
-    import torch  # noqa: E402
-    torch.set_num_threads(1)
-    torch.set_num_interop_threads(1)
-except Exception:
-    pass
+# Threads do Torch: ele NÃO é importado aqui (custa segundos no startup da GUI);
+# os engines chamam app.threads.configure_torch() logo depois de importá-lo.
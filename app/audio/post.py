@@ -5,18 +5,26 @@ import math
 import shutil
 import subprocess
 
+import numpy as np
+
 from app.config import MP3_BITRATE  # usa o bitrate configurado na tua app
+from app.threads import ffmpeg_thread_args
+from app import trace
 
 
-def _run_ffmpeg(args: list[str]) -> None:
-    """Executa ffmpeg e lança uma exceção com stderr se falhar."""
+def _run_ffmpeg(args: list[str], input_bytes: bytes | None = None) -> None:
+    """
+    Executa ffmpeg e lança uma exceção com stderr se falhar.
+    input_bytes: dados enviados pelo stdin (para entradas "-i pipe:0").
+    """
     try:
-        proc = subprocess.run(
-            ["ffmpeg", "-y", *args],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
+        with trace.span("ffmpeg"):
+            proc = subprocess.run(
+                ["ffmpeg", "-y", *ffmpeg_thread_args(), *args],
+                input=input_bytes,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
     except FileNotFoundError as e:
         raise RuntimeError(
             "ffmpeg não encontrado. Instale com 'brew install ffmpeg' (macOS) "
@@ -24,7 +32,8 @@ def _run_ffmpeg(args: list[str]) -> None:
         ) from e
 
     if proc.returncode != 0:
-        raise RuntimeError(f"ffmpeg falhou:\n{proc.stderr}")
+        stderr = proc.stderr.decode("utf-8", errors="replace")
+        raise RuntimeError(f"ffmpeg falhou:\n{stderr}")
 
 
 def _decompose_atempo_factor(f: float) -> list[float]:
@@ -49,18 +58,63 @@ def _decompose_atempo_factor(f: float) -> list[float]:
     return chain
 
 
+def _speed_pitch_filters(speed: float, semitones: int) -> list[str]:
+    """Cadeia de filtros ffmpeg para speed/pitch (saída em 44.1 kHz)."""
+    filters: list[str] = []
+
+    # 1) Pitch (em semitons) preservando a duração
+    if semitones != 0:
+        pf = 2.0 ** (semitones / 12.0)  # fator de frequência
+        # parte de 44.1 kHz (a entrada pode vir em 24/22.05 kHz), muda o
+        # "sample rate efetivo" para alterar pitch... e volta a duração ao normal com atempo = 1/pf
+        filters.append("aresample=44100")
+        filters.append(f"asetrate=44100*{pf:.8f}")
+        filters.append("aresample=44100")
+        for f in _decompose_atempo_factor(1.0 / pf):
+            filters.append(f"atempo={f:.8f}")
+
+    # 2) Speed global (tempo)
+    if not math.isclose(speed, 1.0, rel_tol=1e-6) and speed > 0:
+        for f in _decompose_atempo_factor(speed):
+            filters.append(f"atempo={f:.8f}")
+    return filters
+
+
+def apply_speed_pitch_array(
+    y: np.ndarray,
+    sr: int,
+    *,
+    speed: float = 1.0,
+    semitones: int = 0,
+) -> np.ndarray:
+    """
+    Mesmo efeito do apply_speed_pitch, em memória (WSOLA em NumPy, sem ffmpeg).
+    Mantém o SR de entrada.
+    """
+    from app.audio.stretch import pitch_shift, time_stretch
+
+    out = np.asarray(y, dtype=np.float32).reshape(-1)
+    if semitones != 0:
+        out = pitch_shift(out, sr, semitones)
+    if not math.isclose(speed, 1.0, rel_tol=1e-6) and speed > 0:
+        out = time_stretch(out, sr, speed)
+    return out
+
+
 def apply_speed_pitch(
     in_wav: Path,
     out_wav: Path,
     *,
     speed: float = 1.0,
     semitones: int = 0,
+    backend: str = "ffmpeg",
 ) -> None:
     """
     Ajusta velocidade (tempo) e afinação (pitch) com **alta qualidade** via FFmpeg.
     - Pitch: usa truque asetrate+aresample+atempo para preservar duração.
     - Speed: usa cadeia de 'atempo' (0.5..2.0) para valores fora desse intervalo.
     - Saída: mono, 44.1 kHz, 16-bit PCM (compatível com teu fluxo atual).
+    - backend="numpy": mesmo processamento em memória (app/audio/stretch.py), sem subprocesso.
     """
     in_wav = Path(in_wav)
     out_wav = Path(out_wav)
@@ -68,6 +122,17 @@ def apply_speed_pitch(
     if not in_wav.exists():
         raise FileNotFoundError(f"Arquivo não encontrado: {in_wav}")
 
+    if backend == "numpy":
+        import soundfile as sf
+        from app.audio.stretch import resample
+
+        y, sr = sf.read(str(in_wav), dtype="float32", always_2d=True)
+        out = apply_speed_pitch_array(y.mean(axis=1), sr, speed=speed, semitones=semitones)
+        out = resample(out, sr, 44100)
+        with trace.span("write.wav"):
+            sf.write(str(out_wav), np.clip(out, -1.0, 1.0), 44100, subtype="PCM_16")
+        return
+
     # Se nada para fazer, apenas copia como 44.1 kHz / PCM16
     if (math.isclose(speed, 1.0, rel_tol=1e-6) or speed <= 0) and semitones == 0:
         _run_ffmpeg([
@@ -78,22 +143,7 @@ def apply_speed_pitch(
         ])
         return
 
-    filters: list[str] = []
-
-    # 1) Pitch (em semitons) preservando a duração
-    if semitones != 0:
-        pf = 2.0 ** (semitones / 12.0)  # fator de frequência
-        # muda o "sample rate efetivo" para alterar pitch...
-        # e volta a duração ao normal com atempo = 1/pf
-        filters.append(f"asetrate=44100*{pf:.8f}")
-        filters.append("aresample=44100")
-        for f in _decompose_atempo_factor(1.0 / pf):
-            filters.append(f"atempo={f:.8f}")
-
-    # 2) Speed global (tempo)
-    if not math.isclose(speed, 1.0, rel_tol=1e-6) and speed > 0:
-        for f in _decompose_atempo_factor(speed):
-            filters.append(f"atempo={f:.8f}")
+    filters = _speed_pitch_filters(speed, semitones)
 
     filter_arg = ",".join(filters) if filters else "anull"
 
@@ -119,3 +169,60 @@ def wav_to_mp3(in_wav: Path, out_mp3: Path, bitrate: str | None = None) -> None:
         "-b:a", str(br),
         str(out_mp3),
     ])
+
+
+def export_audio(
+    src: Path | np.ndarray,
+    *,
+    sr: int | None = None,
+    wav_out: Path | None = None,
+    mp3_out: Path | None = None,
+    speed: float = 1.0,
+    semitones: int = 0,
+    sample_rate: int | None = 44100,
+    bitrate: str | None = None,
+) -> None:
+    """
+    Render final em UMA passada de ffmpeg: speed/pitch + resample + WAV e/ou MP3.
+    - src: arquivo (Path) ou forma de onda mono float32 em memória (exige sr),
+      enviada como PCM f32le pelo stdin (sem WAV intermediário);
+    - Várias saídas usam 'asplit' no filter graph (um decode, um processamento);
+    - sample_rate: SR das saídas (None mantém o da entrada); WAV sai mono PCM 16-bit.
+    """
+    if wav_out is None and mp3_out is None:
+        raise ValueError("export_audio: informe wav_out e/ou mp3_out.")
+
+    args = ["-hide_banner", "-loglevel", "error"]
+    input_bytes = None
+    if isinstance(src, np.ndarray):
+        if not sr:
+            raise ValueError("export_audio: 'sr' é obrigatório para entrada em memória.")
+        input_bytes = np.ascontiguousarray(src, dtype="<f4").reshape(-1).tobytes()
+        args += ["-f", "f32le", "-ar", str(int(sr)), "-ac", "1", "-i", "pipe:0"]
+    else:
+        src = Path(src)
+        if not src.exists():
+            raise FileNotFoundError(f"Arquivo não encontrado: {src}")
+        args += ["-i", str(src)]
+
+    outputs = [p for p in (wav_out, mp3_out) if p is not None]
+    chain = _speed_pitch_filters(speed, semitones) or ["anull"]
+    labels = [f"[o{i}]" for i in range(len(outputs))]
+    graph = "[0:a]" + ",".join(chain)
+    if len(outputs) > 1:
+        graph += f",asplit={len(outputs)}" + "".join(labels)
+    else:
+        graph += labels[0]
+    args += ["-filter_complex", graph]
+
+    rate = ["-ar", str(int(sample_rate))] if sample_rate else []
+    label_iter = iter(labels)
+    if wav_out is not None:
+        Path(wav_out).parent.mkdir(parents=True, exist_ok=True)
+        args += ["-map", next(label_iter), "-ac", "1", *rate, "-c:a", "pcm_s16le", str(wav_out)]
+    if mp3_out is not None:
+        Path(mp3_out).parent.mkdir(parents=True, exist_ok=True)
+        args += ["-map", next(label_iter), "-ac", "1", *rate,
+                 "-c:a", "libmp3lame", "-b:a", str(bitrate or MP3_BITRATE), str(mp3_out)]
+
+    _run_ffmpeg(args, input_bytes=input_bytes)
@@ -0,0 +1,192 @@
+# app/audio/stream.py
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterator
+import struct
+import subprocess
+import wave
+
+import numpy as np
+import soundfile as sf
+
+from app.threads import ffmpeg_thread_args
+from app import trace
+
+
+def pcm16_bytes(data: np.ndarray) -> bytes:
+    """float (-1..1) -> PCM 16-bit little-endian."""
+    arr = np.asarray(data, dtype=np.float32)
+    return (np.clip(arr, -1.0, 1.0) * 32767.0).astype("<i2").tobytes()
+
+
+def wav_header(sr: int, channels: int = 1, n_frames: int | None = None) -> bytes:
+    """
+    Cabeçalho RIFF/WAVE PCM 16-bit (44 bytes).
+    n_frames=None -> tamanho "desconhecido" (0xFFFFFFFF), para streaming por HTTP/pipe;
+    players e o ffmpeg leem até o fim do fluxo.
+    """
+    block = 2 * int(channels)
+    data_len = 0xFFFFFFFF if n_frames is None else int(n_frames) * block
+    riff_len = 0xFFFFFFFF if n_frames is None else 36 + data_len
+    return (b"RIFF" + struct.pack("<I", riff_len) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, int(channels), int(sr), int(sr) * block, block, 16)
+            + b"data" + struct.pack("<I", data_len))
+
+
+class StreamingWavWriter:
+    """
+    Grava um WAV PCM 16-bit aos poucos (append por bloco).
+    O módulo `wave` reescreve o cabeçalho a cada escrita, então o arquivo
+    é um WAV válido (com a duração atual) depois de cada append.
+
+    Uso:
+        with StreamingWavWriter(path, sr) as w:
+            w.append(chunk)
+    """
+
+    def __init__(self, path: Path, sr: int, channels: int = 1):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.sr = int(sr)
+        self.channels = int(channels)
+        self.frames = 0
+        self._wf = wave.open(str(self.path), "wb")
+        self._wf.setnchannels(self.channels)
+        self._wf.setsampwidth(2)
+        self._wf.setframerate(self.sr)
+
+    @property
+    def duration_sec(self) -> float:
+        return self.frames / float(self.sr)
+
+    @trace.timed("write.wav")
+    def append(self, data: np.ndarray) -> None:
+        """Acrescenta amostras float (-1..1); mono (N,) ou (N, canais)."""
+        if self._wf is None:
+            raise RuntimeError(f"StreamingWavWriter já fechado: {self.path}")
+        arr = np.asarray(data, dtype=np.float32)
+        if arr.size == 0:
+            return
+        self._wf.writeframes(pcm16_bytes(arr))
+        self.frames += len(arr) if arr.ndim == 1 else arr.shape[0]
+
+    def close(self) -> None:
+        if self._wf is not None:
+            self._wf.close()
+            self._wf = None
+
+    def __enter__(self) -> "StreamingWavWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# ================== Fontes de áudio em streaming (memória limitada) ==================
+class AudioSource(ABC):
+    """
+    Leitura incremental de uma mídia como blocos mono float32 em `sr`,
+    sem decodificar o arquivo inteiro para a memória nem para um WAV temporário.
+    Use open_audio(path, sr) para escolher a implementação.
+    """
+    path: Path
+    sr: int
+    duration: float   # segundos, vindo dos metadados (sem decodificar)
+
+    @abstractmethod
+    def blocks(self, block_frames: int = 1 << 16) -> Iterator[np.ndarray]:
+        """Blocos consecutivos de até `block_frames` amostras, do início ao fim."""
+
+    @abstractmethod
+    def read(self, start_sec: float = 0.0, end_sec: float | None = None) -> np.ndarray:
+        """Só o trecho [start_sec, end_sec) em memória."""
+
+
+class WavSource(AudioSource):
+    """Arquivo que o soundfile abre na taxa pedida (WAV/FLAC/OGG...): leitura com seek, sem cópia."""
+
+    def __init__(self, path: Path):
+        from app.audio.utils import probe  # import tardio: utils importa este módulo
+        self.path = Path(path)
+        info = probe(self.path)
+        if not info.native:
+            raise RuntimeError(f"soundfile não abre {self.path.name} ({info.container})")
+        self.sr = int(info.sample_rate)
+        self.channels = int(info.channels)
+        self.duration = info.duration
+
+    def blocks(self, block_frames: int = 1 << 16) -> Iterator[np.ndarray]:
+        for block in sf.blocks(str(self.path), blocksize=block_frames, dtype="float32", always_2d=True):
+            yield block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+
+    def read(self, start_sec: float = 0.0, end_sec: float | None = None) -> np.ndarray:
+        with sf.SoundFile(str(self.path)) as f:
+            start = max(0, int(start_sec * self.sr))
+            stop = f.frames if end_sec is None else min(f.frames, int(round(end_sec * self.sr)))
+            f.seek(start)
+            y = f.read(max(0, stop - start), dtype="float32", always_2d=True)
+        return y.mean(axis=1) if y.shape[1] > 1 else y[:, 0]
+
+
+class FFmpegSource(AudioSource):
+    """Qualquer mídia (mp4, mov, mp3...): ffmpeg decodifica para f32le mono em `sr` num pipe."""
+
+    def __init__(self, path: Path, sr: int):
+        self.path = Path(path)
+        self.sr = int(sr)
+        self.channels = 1
+        from app.audio.utils import probe  # import tardio: utils importa este módulo
+        self.duration = probe(self.path).duration
+
+    def _pipe(self, start_sec: float = 0.0, dur_sec: float | None = None) -> subprocess.Popen:
+        cmd = ["ffmpeg", "-v", "error", "-nostdin", *ffmpeg_thread_args()]
+        if start_sec > 0:
+            cmd += ["-ss", f"{start_sec:.3f}"]
+        cmd += ["-i", str(self.path)]
+        if dur_sec is not None:
+            cmd += ["-t", f"{dur_sec:.3f}"]
+        cmd += ["-vn", "-ac", "1", "-ar", str(self.sr), "-f", "f32le", "-"]
+        return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def _iter(self, proc: subprocess.Popen, block_frames: int) -> Iterator[np.ndarray]:
+        nbytes = 4 * int(block_frames)
+        try:
+            while True:
+                buf = proc.stdout.read(nbytes)
+                if not buf:
+                    break
+                buf = buf[:len(buf) - len(buf) % 4]
+                if buf:
+                    yield np.frombuffer(buf, dtype="<f4").astype(np.float32)
+            err = proc.stderr.read().decode("utf-8", "replace")
+            if proc.wait() != 0:
+                raise RuntimeError(f"ffmpeg falhou ao ler '{self.path}': {err.strip()}")
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            proc.stdout.close()
+            proc.stderr.close()
+
+    def blocks(self, block_frames: int = 1 << 16) -> Iterator[np.ndarray]:
+        return self._iter(self._pipe(), block_frames)
+
+    def read(self, start_sec: float = 0.0, end_sec: float | None = None) -> np.ndarray:
+        dur = None if end_sec is None else max(0.0, end_sec - start_sec)
+        parts = list(self._iter(self._pipe(start_sec, dur), 1 << 16))
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+
+def open_audio(path: Path, sr: int | None = None) -> AudioSource:
+    """
+    WavSource se o soundfile abre o arquivo (na taxa `sr`, se pedida);
+    senão FFmpegSource (decodifica em streaming; sr padrão 16 kHz).
+    """
+    try:
+        src = WavSource(path)
+        if sr is None or src.sr == int(sr):
+            return src
+    except (RuntimeError, ValueError):
+        pass
+    return FFmpegSource(path, sr or 16000)
@@ -0,0 +1,120 @@
+# app/audio/stretch.py
+from __future__ import annotations
+
+import numpy as np
+
+from app import trace
+
+
+@trace.timed("dsp.resample")
+def resample(y: np.ndarray, sr_in: int, sr_out: int) -> np.ndarray:
+    """Ressampla mono float32 (librosa/soxr; cai para interpolação linear se faltar)."""
+    if sr_in == sr_out:
+        return y.astype(np.float32, copy=False)
+    try:
+        import librosa
+        return librosa.resample(y.astype(np.float32), orig_sr=sr_in, target_sr=sr_out,
+                                res_type="soxr_hq").astype(np.float32)
+    except Exception:
+        n_out = int(round(len(y) * sr_out / float(sr_in)))
+        if n_out <= 0 or len(y) == 0:
+            return np.zeros(0, dtype=np.float32)
+        return np.interp(np.linspace(0, len(y) - 1, n_out), np.arange(len(y)), y).astype(np.float32)
+
+
+def _wsola(x: np.ndarray, rate: float, frame: int, tol: int) -> np.ndarray:
+    """
+    WSOLA (overlap-add com busca de similaridade):
+    - janela Hann, hop de síntese = frame/2, hop de análise = hop * rate;
+    - para cada quadro, procura em ±tol o trecho da entrada mais parecido com a
+      "continuação natural" do quadro anterior (correlação cruzada em NumPy),
+      o que evita as descontinuidades de fase do OLA simples.
+    """
+    hs = frame // 2
+    ha = hs * rate
+    n_out = int(round(len(x) / rate))
+    n_frames = int(np.ceil(n_out / hs)) + 1
+
+    # entrada com folga: tol à esquerda e quadros extras à direita
+    need = max(tol + len(x), int(np.ceil(n_frames * ha)) + 2 * tol + 2 * frame)
+    xp = np.zeros(need, dtype=np.float32)
+    xp[tol:tol + len(x)] = x
+
+    # Hann periódica: com 50% de overlap soma exatamente 1
+    win = (0.5 - 0.5 * np.cos(2.0 * np.pi * np.arange(frame) / frame)).astype(np.float32)
+    out = np.zeros(n_frames * hs + frame, dtype=np.float32)
+    norm = np.zeros_like(out)
+
+    prev = tol
+    for k in range(n_frames):
+        nominal = int(round(k * ha)) + tol
+        if k == 0:
+            pos = nominal
+        else:
+            template = xp[prev + hs:prev + hs + frame]
+            lo = nominal - tol
+            region = xp[lo:nominal + tol + frame]
+            if len(region) < frame + 2 * tol or len(template) < frame:
+                pos = nominal
+            else:
+                cc = np.correlate(region, template, mode="valid")
+                pos = lo + int(np.argmax(cc))
+        seg = xp[pos:pos + frame]
+        if len(seg) < frame:
+            seg = np.pad(seg, (0, frame - len(seg)))
+        o = k * hs
+        out[o:o + frame] += seg * win
+        norm[o:o + frame] += win
+        prev = pos
+
+    nz = norm > 1e-3
+    out[nz] /= norm[nz]
+    return out[:n_out]
+
+
+@trace.timed("dsp.stretch")
+def time_stretch(y: np.ndarray, sr: int, rate: float, method: str = "wsola") -> np.ndarray:
+    """
+    Altera a duração preservando o pitch, em memória.
+    rate: >1 acelera (encurta), <1 desacelera (alonga) – mesma convenção do atempo.
+    method: "wsola" (padrão, NumPy puro) ou "phase_vocoder" (librosa).
+    """
+    y = np.asarray(y, dtype=np.float32).reshape(-1)
+    if rate <= 0 or abs(rate - 1.0) < 1e-6 or y.size == 0:
+        return y.copy()
+
+    if method == "phase_vocoder":
+        import librosa
+        return librosa.effects.time_stretch(y, rate=float(rate)).astype(np.float32)
+
+    frame = max(64, int(sr * 0.03)) & ~1   # ~30 ms, par
+    tol = frame // 4                       # busca em ±7.5 ms
+    if y.size < frame:
+        # trecho curtíssimo: interpolação simples basta
+        n_out = max(1, int(round(y.size / rate)))
+        return np.interp(np.linspace(0, y.size - 1, n_out), np.arange(y.size), y).astype(np.float32)
+    return _wsola(y, float(rate), frame, tol)
+
+
+def stretch_to_duration(y: np.ndarray, sr: int, target_sec: float, method: str = "wsola") -> np.ndarray:
+    """Estica/encolhe para caber exatamente em target_sec (ajusta o último pedaço com corte/zeros)."""
+    n_target = max(1, int(round(target_sec * sr)))
+    out = time_stretch(y, sr, len(y) / float(n_target), method=method)
+    if len(out) > n_target:
+        return out[:n_target]
+    if len(out) < n_target:
+        return np.pad(out, (0, n_target - len(out)))
+    return out
+
+
+@trace.timed("dsp.pitch")
+def pitch_shift(y: np.ndarray, sr: int, semitones: float, method: str = "wsola") -> np.ndarray:
+    """
+    Muda o pitch preservando a duração (mesma ideia do asetrate+aresample+atempo):
+    ressampla por 2^(st/12) e depois estica de volta ao tamanho original.
+    """
+    if semitones == 0:
+        return np.asarray(y, dtype=np.float32).copy()
+    pf = 2.0 ** (semitones / 12.0)
+    shifted = resample(np.asarray(y, dtype=np.float32), int(round(sr * pf)), sr)
+    return time_stretch(shifted, sr, 1.0 / pf, method=method)
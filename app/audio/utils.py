@@ -1,36 +1,158 @@
-import subprocess, json, math
+import subprocess, json, math, re
+from collections import OrderedDict
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Tuple
+from threading import Lock
+from typing import Dict, Optional, Tuple
 import numpy as np
 import soundfile as sf
-import librosa
 
 from app.config import SAMPLE_RATE
+from app.audio.stream import open_audio
+from app.threads import ffmpeg_thread_args
+from app import trace
 from pathlib import Path
 import soundfile as sf
 
+# ---------------- probe: metadados da mídia (cache por path/mtime/tamanho) ----------------
+
+@dataclass(frozen=True)
+class MediaInfo:
+    path: str
+    duration: float              # segundos (0.0 se desconhecida)
+    sample_rate: Optional[int]   # da 1ª trilha de áudio
+    channels: Optional[int]
+    codec: Optional[str]         # ex.: "aac", "pcm_s16le", "PCM_16"
+    container: Optional[str]     # ex.: "wav", "mov,mp4,m4a,3gp,3g2,mj2"
+    has_audio: bool
+    has_video: bool
+    native: bool = False         # True se o soundfile lê direto (sem ffmpeg)
+
+
+_PROBE_CACHE: "OrderedDict[tuple, MediaInfo]" = OrderedDict()
+_PROBE_LOCK = Lock()
+_PROBE_CACHE_MAX = 256
+_DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+_AUDIO_RE = re.compile(r"Stream #\S+.*?: Audio: (\w+)[^,]*, (\d+) Hz, ([^,]+)")
+
+
+def probe(path: Path) -> MediaInfo:
+    """
+    Duração, SR, canais, codec e presença de áudio/vídeo, só pelos metadados:
+    soundfile (WAV/FLAC/OGG, sem subprocess) -> ffprobe -> cabeçalho do `ffmpeg -i`.
+    Resultado em cache por (caminho, mtime, tamanho). FileNotFoundError se não existir;
+    ValueError se nem o ffmpeg reconhecer o arquivo.
+    """
+    path = Path(path)
+    st = path.stat()
+    key = (str(path.resolve()), st.st_mtime_ns, st.st_size)
+    with _PROBE_LOCK:
+        hit = _PROBE_CACHE.get(key)
+        if hit is not None:
+            _PROBE_CACHE.move_to_end(key)
+            return hit
+
+    info = _probe_soundfile(path) or _probe_ffprobe(path) or _probe_ffmpeg(path)
+    if info is None:
+        raise ValueError(f"Não foi possível ler a mídia: {path}")
+
+    with _PROBE_LOCK:
+        _PROBE_CACHE[key] = info
+        while len(_PROBE_CACHE) > _PROBE_CACHE_MAX:
+            _PROBE_CACHE.popitem(last=False)
+    return info
+
+
+def require_audio(path: Path) -> MediaInfo:
+    """probe() + erro claro (antes de qualquer trabalho pesado) se não houver trilha de áudio."""
+    info = probe(path)
+    if not info.has_audio:
+        raise ValueError(f"O arquivo não tem trilha de áudio: {Path(path).name}")
+    return info
+
+
+def _probe_soundfile(path: Path) -> Optional[MediaInfo]:
+    try:
+        i = sf.info(str(path))
+    except RuntimeError:
+        return None
+    dur = float(i.frames) / float(i.samplerate) if i.samplerate and i.frames else 0.0
+    return MediaInfo(str(path), dur, int(i.samplerate), int(i.channels), i.subtype,
+                     (i.format or "").lower() or None, has_audio=True, has_video=False, native=True)
+
+
+def _probe_ffprobe(path: Path) -> Optional[MediaInfo]:
+    try:
+        code, out, _err = run(["ffprobe", "-v", "error", "-print_format", "json",
+                               "-show_format", "-show_streams", str(path)])
+    except FileNotFoundError:
+        return None
+    if code != 0:
+        return None
+    j = json.loads(out or "{}")
+    streams = j.get("streams") or []
+    fmt = j.get("format") or {}
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    has_video = any(s.get("codec_type") == "video" and not (s.get("disposition") or {}).get("attached_pic")
+                    for s in streams)
+    try:
+        dur = float(fmt.get("duration") or (audio or {}).get("duration") or 0.0)
+    except ValueError:
+        dur = 0.0
+    return MediaInfo(
+        str(path), dur,
+        int(audio["sample_rate"]) if audio and audio.get("sample_rate") else None,
+        int(audio["channels"]) if audio and audio.get("channels") else None,
+        audio.get("codec_name") if audio else None,
+        fmt.get("format_name"),
+        has_audio=audio is not None, has_video=has_video,
+    )
+
+
+def _probe_ffmpeg(path: Path) -> Optional[MediaInfo]:
+    """Sem ffprobe: lê o cabeçalho que o `ffmpeg -i` imprime (sai com código 1, é esperado)."""
+    _code, _out, err = run(["ffmpeg", "-hide_banner", "-i", str(path)])
+    if "Input #0" not in err:
+        return None
+    m = _DURATION_RE.search(err)
+    dur = int(m.group(1)) * 3600 + int(m.group(2)) * 60 + float(m.group(3)) if m else 0.0
+    a = _AUDIO_RE.search(err)
+    layout = a.group(3).strip() if a else ""
+    channels = {"mono": 1, "stereo": 2}.get(layout) or (int(layout.split()[0]) if layout[:1].isdigit() else None)
+    container = re.search(r"Input #0, ([^ ]+), from", err)
+    return MediaInfo(
+        str(path), dur,
+        int(a.group(2)) if a else None, channels if a else None, a.group(1) if a else None,
+        container.group(1) if container else None,
+        has_audio=a is not None, has_video=bool(re.search(r"Stream #\S+.*?: Video:", err)),
+    )
+
+
 def get_audio_duration_sec(path: Path) -> float:
-    """Retorna a duração do arquivo de áudio em segundos (float)."""
-    info = sf.info(str(path))
-    if info.samplerate and info.frames:
-        return float(info.frames) / float(info.samplerate)
-    return 0.0
+    """Retorna a duração do arquivo de áudio em segundos (float), pelos metadados (sem decodificar)."""
+    return probe(path).duration
 
 def run(cmd: list) -> Tuple[int, str, str]:
-    p = subprocess.run(cmd, text=True, capture_output=True)
+    with trace.span(Path(cmd[0]).name):   # "ffmpeg" / "ffprobe" no trace
+        p = subprocess.run(cmd, text=True, capture_output=True)
     return p.returncode, p.stdout, p.stderr
 
 def sniff_media_type(path: Path) -> str:
     ext = path.suffix.lower()
     if ext in [".wav", ".mp3", ".m4a", ".aac", ".flac", ".ogg", ".mp4", ".mov"]:
         return ext[1:]
-    return "unknown"
+    # extensão desconhecida: pergunta ao probe (ex.: .webm, .mkv, sem extensão)
+    try:
+        info = probe(path)
+    except (OSError, ValueError):
+        return "unknown"
+    return (info.container or "unknown").split(",")[0] if info.has_audio else "unknown"
 
 def ensure_wav_mono_22050(src: Path, dst: Path) -> Path:
     """Converte para WAV mono 22.05 kHz (padrão do TTS)."""
     dst.parent.mkdir(parents=True, exist_ok=True)
     cmd = [
-        "ffmpeg", "-y", "-i", str(src),
+        "ffmpeg", "-y", *ffmpeg_thread_args(), "-i", str(src),
         "-ac", "1", "-ar", str(SAMPLE_RATE),
         "-sample_fmt", "s16",
         str(dst)
@@ -44,7 +166,7 @@ def ensure_wav_mono_sr(src: Path, dst: Path, sr: int) -> Path:
     """Converte qualquer mídia para WAV mono, SR definido (ex.: 16000 p/ ASR)."""
     dst.parent.mkdir(parents=True, exist_ok=True)
     cmd = [
-        "ffmpeg", "-y", "-i", str(src),
+        "ffmpeg", "-y", *ffmpeg_thread_args(), "-i", str(src),
         "-ac", "1", "-ar", str(sr),
         "-sample_fmt", "s16",
         str(dst)
@@ -86,24 +208,134 @@ def trim_audio(src: Path, dst: Path, start_sec: float = 0.0, duration_sec: float
             raise RuntimeError(f"ffmpeg falhou ao cortar '{src}': {err2}")
     return dst
 
-def measure_audio_stats(wav_path: Path) -> Dict:
-    """Mede duração, RMS, pico, clipping aprox, % silêncio e LUFS estimado."""
-    y, sr = librosa.load(wav_path, sr=SAMPLE_RATE, mono=True)
-    dur = librosa.get_duration(y=y, sr=sr)
-    rms = float(np.sqrt(np.mean(y**2))) if len(y) else 0.0
-    peak = float(np.max(np.abs(y))) if len(y) else 0.0
+# ---------------- Estatísticas de áudio (vetorizado, em blocos) ----------------
+
+def _k_weighting_sos(sr: int) -> np.ndarray:
+    """
+    Filtro K (BS.1770): shelving de alta + passa-altas RLB, coeficientes
+    calculados para qualquer SR (mesmas fórmulas do libebur128).
+    """
+    # estágio 1: high-shelf (~+4 dB acima de ~1.7 kHz)
+    f0, gain_db, q = 1681.974450955533, 3.999843853973347, 0.7071752369554196
+    k = math.tan(math.pi * f0 / sr)
+    vh = 10.0 ** (gain_db / 20.0)
+    vb = vh ** 0.4996667741545416
+    a0 = 1.0 + k / q + k * k
+    shelf = [(vh + vb * k / q + k * k) / a0, 2.0 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0,
+             1.0, 2.0 * (k * k - 1.0) / a0, (1.0 - k / q + k * k) / a0]
+    # estágio 2: passa-altas (~38 Hz)
+    f0, q = 38.13547087602444, 0.5003270373238773
+    k = math.tan(math.pi * f0 / sr)
+    a0 = 1.0 + k / q + k * k
+    hp = [1.0, -2.0, 1.0, 1.0, 2.0 * (k * k - 1.0) / a0, (1.0 - k / q + k * k) / a0]
+    return np.array([shelf, hp], dtype=np.float64)
 
-    clip_ratio = float(np.mean(np.abs(y) > 0.999)) if len(y) else 0.0
 
-    frame_len = int(0.02 * sr) or 1  # 20 ms
-    if len(y) >= frame_len:
-        frames = np.array([np.sqrt(np.mean(y[i:i+frame_len]**2))
-                           for i in range(0, len(y), frame_len)])
-        silence_ratio = float(np.mean(frames < 0.001))
+def _gated_loudness(hop_ms: np.ndarray) -> float:
+    """
+    Loudness integrada (LUFS) a partir da energia média (K-weighted) de cada hop de 100 ms:
+    blocos de 400 ms com 75% de overlap, gate absoluto -70 LUFS e relativo -10 LU.
+    """
+    if hop_ms.size == 0:
+        return -70.0
+    if hop_ms.size >= 4:
+        csum = np.concatenate([[0.0], np.cumsum(hop_ms)])
+        z = (csum[4:] - csum[:-4]) / 4.0
+    else:
+        z = np.array([float(np.mean(hop_ms))])
+    loud = -0.691 + 10.0 * np.log10(z + 1e-12)
+    z = z[loud > -70.0]
+    if z.size == 0:
+        return -70.0
+    rel_gate = -0.691 + 10.0 * math.log10(float(np.mean(z)) + 1e-12) - 10.0
+    z_rel = z[(-0.691 + 10.0 * np.log10(z + 1e-12)) > rel_gate]
+    if z_rel.size == 0:
+        return -70.0
+    return max(-70.0, -0.691 + 10.0 * math.log10(float(np.mean(z_rel)) + 1e-12))
+
+
+def _iter_mono_blocks(wav_path: Path, block_frames: int, sr: int | None):
+    """
+    Gera blocos mono float32. Sem `sr`: lê na taxa nativa com soundfile (sem resample).
+    Com `sr` diferente do arquivo (ou formato que o soundfile não abre): ffmpeg em pipe,
+    também em blocos (nunca o arquivo inteiro em memória).
+    """
+    yield from open_audio(wav_path, sr).blocks(block_frames)
+
+
+def measure_audio_stats(wav_path: Path, sr: int | None = None, block_seconds: float = 1.0) -> Dict:
+    """
+    Mede duração, RMS, pico, clipping aprox, % silêncio e loudness.
+    - Lê na taxa nativa (sr=None) e processa em blocos: memória limitada, sem resample;
+    - Frames RMS de 20 ms vetorizados (reshape por bloco);
+    - "lufs": loudness integrada BS.1770 (filtro K + gating); "lufs_est" mantido por compatibilidade.
+    """
+    from scipy.signal import sosfilt, sosfilt_zi
+
+    if sr is None:
+        info = probe(wav_path)
+        if info.native:
+            sr_eff = info.sample_rate
+        else:
+            sr_eff = SAMPLE_RATE
+            sr = SAMPLE_RATE  # formato não suportado pelo soundfile: decodifica via ffmpeg
+    else:
+        sr_eff = int(sr)
+
+    frame_len = int(0.02 * sr_eff) or 1   # 20 ms
+    hop_len = int(round(0.1 * sr_eff)) or 1  # 100 ms (gating BS.1770)
+    block_frames = max(frame_len, int(block_seconds * sr_eff) // frame_len * frame_len)
+
+    sos = _k_weighting_sos(sr_eff)
+    zi = sosfilt_zi(sos) * 0.0
+
+    n = 0
+    sumsq = 0.0
+    peak = 0.0
+    clipped = 0
+    frame_rms: list[np.ndarray] = []
+    hop_ms: list[np.ndarray] = []
+    rms_carry = np.zeros(0, dtype=np.float32)
+    kw_carry = np.zeros(0, dtype=np.float64)
+
+    for x in _iter_mono_blocks(wav_path, block_frames, sr):
+        if x.size == 0:
+            continue
+        n += x.size
+        sumsq += float(np.dot(x, x))
+        peak = max(peak, float(np.max(np.abs(x))))
+        clipped += int(np.count_nonzero(np.abs(x) > 0.999))
+
+        buf = np.concatenate([rms_carry, x]) if rms_carry.size else x
+        m = len(buf) // frame_len
+        if m:
+            fr = buf[:m * frame_len].reshape(m, frame_len)
+            frame_rms.append(np.sqrt(np.mean(fr * fr, axis=1)))
+        rms_carry = buf[m * frame_len:]
+
+        kx, zi = sosfilt(sos, x.astype(np.float64), zi=zi)
+        buf2 = np.concatenate([kw_carry, kx]) if kw_carry.size else kx
+        m2 = len(buf2) // hop_len
+        if m2:
+            hb = buf2[:m2 * hop_len].reshape(m2, hop_len)
+            hop_ms.append(np.mean(hb * hb, axis=1))
+        kw_carry = buf2[m2 * hop_len:]
+
+    if rms_carry.size:
+        # último frame parcial (como no cálculo original)
+        frame_rms.append(np.array([np.sqrt(np.mean(rms_carry * rms_carry))]))
+
+    dur = n / float(sr_eff)
+    rms = math.sqrt(sumsq / n) if n else 0.0
+    clip_ratio = clipped / n if n else 0.0
+
+    if n >= frame_len and frame_rms:
+        silence_ratio = float(np.mean(np.concatenate(frame_rms) < 0.001))
     else:
         silence_ratio = 1.0
 
-    lufs_est = -0.691 + 10 * math.log10(rms**2 + 1e-12)  # aprox
+    lufs_est = -0.691 + 10 * math.log10(rms**2 + 1e-12)  # aprox (sem filtro K / gating)
+    lufs = _gated_loudness(np.concatenate(hop_ms) if hop_ms else np.zeros(0))
 
     return {
         "duration_sec": round(dur, 3),
@@ -112,5 +344,58 @@ def measure_audio_stats(wav_path: Path) -> Dict:
         "clip_ratio": round(clip_ratio, 6),
         "silence_ratio": round(silence_ratio, 6),
         "lufs_est": round(lufs_est, 2),
-        "sr": sr,
+        "lufs": round(lufs, 2),
+        "sr": sr_eff,
     }
+
+
+# ================== Janelas cortadas em silêncios (ASR de arquivos longos) ==================
+def frame_energy_db(wav_path: Path, frame_ms: float = 30.0) -> Tuple[np.ndarray, float]:
+    """RMS (dBFS) por quadro de frame_ms, lido em blocos. Retorna (dB por quadro, duração do quadro em s)."""
+    src = open_audio(wav_path)
+    sr = src.sr
+    hop = max(1, int(sr * frame_ms / 1000.0))
+    out, carry = [], np.zeros(0, dtype=np.float32)
+    for block in src.blocks(hop * 2000):
+        x = np.concatenate([carry, block]) if carry.size else block
+        n = len(x) // hop
+        if n:
+            frames = x[:n * hop].reshape(n, hop).astype(np.float64)
+            out.append(10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-12))
+        carry = x[n * hop:]
+    if carry.size:
+        out.append(np.array([10.0 * np.log10(np.mean(carry.astype(np.float64) ** 2) + 1e-12)]))
+    return (np.concatenate(out) if out else np.zeros(0)), hop / float(sr)
+
+
+def split_on_silence(wav_path: Path,
+                     max_window_sec: float = 120.0,
+                     min_window_sec: float = 20.0,
+                     min_silence_ms: float = 400.0) -> list[Tuple[float, float]]:
+    """
+    Divide o áudio em janelas (start, end) de até max_window_sec, cortando no meio de
+    silêncios (quadros abaixo de um limiar adaptativo por >= min_silence_ms).
+    Sem silêncio utilizável dentro do limite, corta em max_window_sec.
+    """
+    total = get_audio_duration_sec(wav_path)   # probe em cache: arquivo curto nem é decodificado
+    if total <= max_window_sec:
+        return [(0.0, total)] if total > 0 else []
+    db, fdur = frame_energy_db(wav_path)
+
+    # limiar: 10 dB acima do "chão" de ruído (percentil 10), no máx. -35 dBFS
+    thr = min(-35.0, float(np.percentile(db, 10)) + 10.0)
+    quiet = np.concatenate([[False], db < thr, [False]])
+    edges = np.flatnonzero(np.diff(quiet.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    min_frames = int(np.ceil(min_silence_ms / 1000.0 / fdur))
+    keep = (ends - starts) >= min_frames
+    cuts = ((starts[keep] + ends[keep]) / 2.0) * fdur   # meio de cada silêncio (s)
+
+    windows, t0 = [], 0.0
+    while total - t0 > max_window_sec:
+        ok = cuts[(cuts > t0 + min_window_sec) & (cuts <= t0 + max_window_sec)]
+        t1 = float(ok[-1]) if ok.size else t0 + max_window_sec
+        windows.append((t0, t1))
+        t0 = t1
+    windows.append((t0, total))
+    return windows
@@ -0,0 +1,308 @@
+# app/cli.py
+"""
+CLI headless (sem Tk/customtkinter) para servidores de render.
+
+Exemplos:
+  python -m app.cli tts --voice "Minha voz" --text "Olá. Tudo bem?" --mp3
+  python -m app.cli tts --manifest jobs.csv              # colunas: text, voice, lang, speed, pitch, mp3, out_dir
+  python -m app.cli transcribe video.mp4                # transcript.txt/.json/.srt/.vtt
+  python -m app.cli s2s entrada.mp4 --voice 430ae9ba
+  python -m app.cli voice add gravacao.wav --name "Locutor"
+  python -m app.cli voice list
+  python -m app.cli tts --manifest jobs.csv --enqueue    # só enfileira (fila persistente)
+  python -m app.cli jobs run                             # processa a fila até esvaziar
+  python -m app.cli jobs list --status pending
+  python -m app.cli jobs cancel 42
+  python -m app.cli trace data/projects/tts-20250101-120000   # tempo por etapa (trace.jsonl)
+
+Saída: uma linha JSON por job no stdout (logs dos engines vão para o stderr).
+Exit code: 0 = todos ok, 1 = algum job falhou, 2 = erro de uso.
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import csv
+import json
+import sys
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List
+
+from app.config import LANG_DEFAULT
+from app.pipeline import _as_bool, _as_formats
+
+
+def read_manifest(path: Path) -> List[Dict[str, Any]]:
+    """Lê um manifesto .csv (com cabeçalho) ou .jsonl (um objeto por linha)."""
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(str(path))
+    if path.suffix.lower() == ".csv":
+        with path.open(newline="", encoding="utf-8") as f:
+            return [{k.strip(): (v or "").strip() for k, v in row.items() if k} for row in csv.DictReader(f)]
+    rows = []
+    for n, line in enumerate(path.read_text(encoding="utf-8").splitlines(), start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            rows.append(json.loads(line))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{path}:{n}: JSON inválido ({e})") from e
+    return rows
+
+
+# ---------------- jobs: linha do manifesto/args -> função do pipeline ----------------
+
+def _job_tts(p: Dict[str, Any]) -> Dict[str, Any]:
+    from app.pipeline import run_tts
+    text = p.get("text")
+    if not text and p.get("text_file"):
+        text = Path(p["text_file"]).read_text(encoding="utf-8")
+    return run_tts(
+        text=text or "",
+        voice=str(p.get("voice") or ""),
+        language=p.get("lang") or LANG_DEFAULT,
+        out_dir=Path(p["out_dir"]) if p.get("out_dir") else None,
+        speed=float(p.get("speed") or 1.0),
+        semitones=int(p.get("pitch") or 0),
+        mp3=_as_bool(p.get("mp3", False)),
+        incremental=_as_bool(p.get("incremental", False)),
+    )
+
+
+def _job_transcribe(p: Dict[str, Any]) -> Dict[str, Any]:
+    from app.pipeline import run_transcribe
+    return run_transcribe(
+        src=Path(p["src"]),
+        out_dir=Path(p["out_dir"]) if p.get("out_dir") else None,
+        asr_backend=p.get("asr") or "whisper",
+        formats=_as_formats(p.get("formats")),
+    )
+
+
+def _job_s2s(p: Dict[str, Any]) -> Dict[str, Any]:
+    from app.pipeline import run_s2s
+    return run_s2s(
+        src=Path(p["src"]),
+        voice=str(p.get("voice") or ""),
+        language=p.get("lang") or LANG_DEFAULT,
+        out_dir=Path(p["out_dir"]) if p.get("out_dir") else None,
+        mp3=_as_bool(p.get("mp3", False)),
+    )
+
+
+def _job_voice_add(p: Dict[str, Any]) -> Dict[str, Any]:
+    from app.pipeline import add_voice
+    return add_voice(Path(p["src"]), name=p.get("name") or None)
+
+
+def run_jobs(command: str,
+             job: Callable[[Dict[str, Any]], Dict[str, Any]],
+             rows: Iterable[Dict[str, Any]],
+             out=sys.stdout) -> int:
+    """
+    Roda os jobs em sequência no MESMO processo (modelos carregados 1x)
+    e escreve uma linha JSON por job. Retorna o número de falhas.
+    """
+    failures = 0
+    for i, row in enumerate(rows):
+        t0 = time.time()
+        rec: Dict[str, Any] = {"index": i, "command": command}
+        try:
+            # prints dos engines ("[ASR] ...") não podem poluir o JSON do stdout
+            with contextlib.redirect_stdout(sys.stderr):
+                rec["result"] = job(row)
+            rec["ok"] = True
+        except Exception as e:
+            failures += 1
+            rec["ok"] = False
+            rec["error"] = f"{type(e).__name__}: {e}"
+        rec["elapsed_sec"] = round(time.time() - t0, 3)
+        out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        out.flush()
+    return failures
+
+
+# nomes do CLI/manifesto -> nomes do payload dos handlers (app/pipeline.py)
+_PAYLOAD_KEYS = {"lang": "language", "pitch": "semitones", "asr": "asr_backend"}
+_JOB_KINDS = {"tts": "tts", "transcribe": "transcribe", "s2s": "s2s", "voice add": "voice_add"}
+
+
+def enqueue_jobs(command: str, rows: Iterable[Dict[str, Any]], priority: int = 0, out=sys.stdout) -> int:
+    """Enfileira no JobScheduler (SQLite) sem rodar; uma linha JSON com o id de cada job."""
+    from app.scheduler import JobScheduler
+    from app.pipeline import register_default_handlers
+
+    sched = JobScheduler()   # sem start(): só grava na fila
+    register_default_handlers(sched)
+    for i, row in enumerate(rows):
+        payload = {_PAYLOAD_KEYS.get(k, k): v for k, v in row.items()}
+        if payload.get("text_file") and not payload.get("text"):
+            payload["text"] = Path(payload.pop("text_file")).read_text(encoding="utf-8")
+        job_id = sched.submit(_JOB_KINDS[command], payload, priority=priority)
+        out.write(json.dumps({"index": i, "command": command, "job_id": job_id}, ensure_ascii=False) + "\n")
+    return 0
+
+
+def _jobs_command(args: argparse.Namespace) -> int:
+    from app.scheduler import JobScheduler, FAILED
+
+    if args.jobs_command != "run":
+        sched = JobScheduler()   # sem start(): não despacha nada
+        if args.jobs_command == "list":
+            for job in sched.list(status=args.status, limit=args.limit):
+                print(json.dumps(asdict(job), ensure_ascii=False))
+            return 0
+        if args.jobs_command == "cancel":
+            ok = sched.cancel(args.job_id)
+            print(json.dumps({"job_id": args.job_id, "cancelled": ok}))
+            return 0 if ok else 1
+
+    # run: instance() registra os handlers e inicia o despachante; espera a fila esvaziar
+    t0 = time.time()
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            sched = JobScheduler.instance()
+            sched.wait_idle()
+    finally:
+        from app.engines.asr_parallel import ASRReplicaPool
+        from app.engines.s2s_pool import S2SWorkerPool
+        JobScheduler.shutdown_instance()
+        S2SWorkerPool.shutdown_instance()   # jobs s2s rodam no pool
+        ASRReplicaPool.shutdown_instance()
+    failed = [j for j in sched.list(status=FAILED) if (j.finished_at or 0) >= t0]
+    print(json.dumps({"failed": [j.id for j in failed]}))
+    return 1 if failed else 0
+
+
+def _trace_command(args: argparse.Namespace) -> int:
+    """Resumo do trace.jsonl de um job: uma linha JSON por etapa (mais cara primeiro) e o total."""
+    from app.trace import read_trace
+
+    try:
+        tr = read_trace(Path(args.path), run=args.run)
+    except (OSError, ValueError) as e:
+        print(f"erro: {e}", file=sys.stderr)
+        return 2
+    end = tr["end"] or {}
+    total_ms = end.get("dur_ms")
+    for name, st in tr["stages"].items():
+        share = round(st["ms"] / total_ms, 3) if total_ms else None
+        print(json.dumps({"stage": name, "ms": st["ms"], "calls": st["calls"], "share": share}))
+    start = tr["start"] or {}
+    print(json.dumps({"run": tr["run"], "kind": start.get("kind"), "status": end.get("status", "incomplete"),
+                      "dur_ms": total_ms, "spans": len(tr["spans"]), "labels": start.get("labels", {})},
+                     ensure_ascii=False))
+    return 0
+
+
+def _rows_from_args(args: argparse.Namespace, keys: List[str]) -> List[Dict[str, Any]]:
+    """Manifesto (cada linha herda os valores padrão da linha de comando) ou job único."""
+    defaults = {k: getattr(args, k) for k in keys if getattr(args, k, None) not in (None, "")}
+    if getattr(args, "manifest", None):
+        return [{**defaults, **{k: v for k, v in row.items() if v not in (None, "")}}
+                for row in read_manifest(args.manifest)]
+    return [defaults]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="python -m app.cli", description="Dublador/Transcritor – modo headless")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("tts", help="texto -> voz")
+    p.add_argument("--text")
+    p.add_argument("--text-file", dest="text_file")
+    p.add_argument("--voice", help="id ou nome da voz-base")
+    p.add_argument("--lang", default=LANG_DEFAULT)
+    p.add_argument("--speed", type=float, default=1.0)
+    p.add_argument("--pitch", type=int, default=0, help="semitons")
+    p.add_argument("--mp3", action="store_true")
+    p.add_argument("--out-dir", dest="out_dir")
+    p.add_argument("--incremental", action="store_true",
+                   help="com --out-dir: re-sintetiza só as frases que mudaram desde a última geração")
+    p.add_argument("--manifest", type=Path, help="CSV/JSONL com um job por linha")
+    p.add_argument("--enqueue", action="store_true", help="só enfileirar (rodar depois com 'jobs run')")
+
+    p = sub.add_parser("transcribe", help="áudio/vídeo -> texto")
+    p.add_argument("src", nargs="?")
+    p.add_argument("--asr", choices=["whisper", "openai"], default="whisper")
+    p.add_argument("--formats", default="txt,json,srt,vtt", help="saídas: txt, json, srt, vtt (separadas por vírgula)")
+    p.add_argument("--out-dir", dest="out_dir")
+    p.add_argument("--manifest", type=Path)
+    p.add_argument("--enqueue", action="store_true")
+
+    p = sub.add_parser("s2s", help="voz -> voz (tempo idêntico)")
+    p.add_argument("src", nargs="?")
+    p.add_argument("--voice")
+    p.add_argument("--lang", default=LANG_DEFAULT)
+    p.add_argument("--mp3", action="store_true")
+    p.add_argument("--out-dir", dest="out_dir")
+    p.add_argument("--manifest", type=Path)
+    p.add_argument("--enqueue", action="store_true")
+
+    p = sub.add_parser("voice", help="vozes-base")
+    vsub = p.add_subparsers(dest="voice_command", required=True)
+    pa = vsub.add_parser("add", help="cadastrar voz-base")
+    pa.add_argument("src", nargs="?")
+    pa.add_argument("--name")
+    pa.add_argument("--manifest", type=Path)
+    pv = vsub.add_parser("list", help="listar vozes-base")
+    pv.add_argument("--search", default="", help="filtrar por parte do nome")
+
+    p = sub.add_parser("jobs", help="fila persistente de jobs")
+    jsub = p.add_subparsers(dest="jobs_command", required=True)
+    pl = jsub.add_parser("list", help="listar jobs (mais recentes primeiro)")
+    pl.add_argument("--status", choices=["pending", "running", "done", "failed", "cancelled"])
+    pl.add_argument("--limit", type=int, default=50)
+    pc = jsub.add_parser("cancel", help="cancelar um job")
+    pc.add_argument("job_id", type=int)
+    jsub.add_parser("run", help="processar a fila até esvaziar")
+
+    p = sub.add_parser("trace", help="tempo por etapa de um job (trace.jsonl)")
+    p.add_argument("path", help="pasta do job ou arquivo trace.jsonl")
+    p.add_argument("--run", help="id da execução (padrão: a última)")
+    return ap
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = build_parser()
+    args = ap.parse_args(argv)
+
+    if args.command == "voice" and args.voice_command == "list":
+        from app.voice_manager import VoiceManager
+        for v in VoiceManager().find_voices(args.search):
+            print(json.dumps(asdict(v), ensure_ascii=False))
+        return 0
+    if args.command == "jobs":
+        return _jobs_command(args)
+    if args.command == "trace":
+        return _trace_command(args)
+
+    if args.command == "tts":
+        command, job, keys = "tts", _job_tts, ["text", "text_file", "voice", "lang", "speed", "pitch", "mp3",
+                                               "out_dir", "incremental"]
+    elif args.command == "transcribe":
+        command, job, keys = "transcribe", _job_transcribe, ["src", "asr", "formats", "out_dir"]
+    elif args.command == "s2s":
+        command, job, keys = "s2s", _job_s2s, ["src", "voice", "lang", "mp3", "out_dir"]
+    else:
+        command, job, keys = "voice add", _job_voice_add, ["src", "name"]
+
+    try:
+        rows = _rows_from_args(args, keys)
+    except (OSError, ValueError) as e:
+        print(f"erro: {e}", file=sys.stderr)
+        return 2
+    if not args.manifest and not any(rows[0].get(k) for k in ("text", "text_file", "src")):
+        ap.error(f"{command}: informe a entrada (ou --manifest).")
+
+    if getattr(args, "enqueue", False):
+        return enqueue_jobs(command, rows)
+    failures = run_jobs(command, job, rows)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,6 +2,12 @@ from pathlib import Path
 import sys
 import os
 
+
+def _env_threads(name: str) -> int:
+    """Nº de threads fixado por variável de ambiente; 0 = automático (app/threads.py)."""
+    val = os.getenv(name, "").strip()
+    return max(1, int(val)) if val.isdigit() and int(val) > 0 else 0
+
 APP_NAME = "Dublador Secret Brand World"
 
 # Detecta se está rodando empacotado (PyInstaller) ou em dev
@@ -57,3 +63,85 @@ ASR_MODEL_SIZE = os.getenv("DUBBER_ASR_MODEL", "tiny")
 
 # Dispositivo para o Whisper. No seu Mac: "cpu".
 ASR_DEVICE = os.getenv("DUBBER_ASR_DEVICE", "cpu")
+
+# faster-whisper (CTranslate2): tipo de cálculo e threads de CPU.
+# Usados tanto na transcrição quanto no S2S (mesmo modelo, carregado 1x por processo).
+# Threads: 0 = orçamento de app/threads.py (perfil safe: 2).
+ASR_COMPUTE_TYPE = os.getenv("DUBBER_ASR_COMPUTE_TYPE", "int8")
+ASR_CPU_THREADS = _env_threads("DUBBER_ASR_CPU_THREADS")
+# Arquivos longos: corta nos silêncios em janelas de até ASR_WINDOW_SEC e transcreve
+# em paralelo com N processos (cada um com sua cópia do modelo, 1 thread).
+# Só vale a partir de ASR_LONG_MIN_SEC de áudio; ASR_REPLICAS=1 desliga, 0 = automático.
+ASR_REPLICAS = _env_threads("DUBBER_ASR_REPLICAS")
+ASR_WINDOW_SEC = float(os.getenv("DUBBER_ASR_WINDOW_SEC", "120"))
+ASR_LONG_MIN_SEC = float(os.getenv("DUBBER_ASR_LONG_MIN_SEC", "300"))
+
+# ====== TTS (XTTS-v2) ======
+# Quantas vozes manter com latentes de condicionamento em memória (LRU).
+# Os latentes também ficam salvos em data/voices/<id>/xtts_latents.pt.
+XTTS_LATENT_CACHE_SIZE = int(os.getenv("DUBBER_XTTS_LATENT_CACHE", "8"))
+# Quantos segmentos (frases) rodar juntos no decoder do XTTS.
+# 1 = um por vez (padrão); >1 agrupa frases de tamanho parecido em lotes.
+XTTS_BATCH_SIZE = max(1, int(os.getenv("DUBBER_XTTS_BATCH_SIZE", "1")))
+# Backend de inferência do XTTS na CPU (bench/xtts_quality.py compara com o fp32):
+#   "fp32"      = PyTorch original (padrão);
+#   "int8"      = quantização dinâmica int8 das camadas lineares do GPT (menos RAM, frase mais rápida);
+#   "onnx"      = decoder HiFi-GAN exportado para o ONNX Runtime (1x, cache em XTTS_ONNX_DIR);
+#   "int8+onnx" = os dois. Em GPU/MPS é ignorado.
+XTTS_BACKEND = os.getenv("DUBBER_XTTS_BACKEND", "fp32").strip().lower()
+XTTS_ONNX_DIR = DATA_ROOT / "cache" / "onnx"
+# Cache em disco do áudio por frase (vinhetas/avisos repetidos não voltam ao modelo).
+# Tamanho máximo em MB; 0 desativa.
+TTS_CACHE_DIR = DATA_ROOT / "cache" / "tts"
+TTS_CACHE_MAX_MB = int(os.getenv("DUBBER_TTS_CACHE_MB", "512"))
+
+# ====== S2S (voz -> voz) ======
+# Processos do pool S2S (cada um mantém XTTS + Whisper carregados em memória)
+S2S_WORKERS = max(1, int(os.getenv("DUBBER_S2S_WORKERS", "1")))
+# Threads para o DSP do S2S (time-stretch/resample) rodando em paralelo ao TTS (0 = automático)
+S2S_DSP_THREADS = _env_threads("DUBBER_S2S_DSP_THREADS")
+
+# ====== Fila de jobs (app/scheduler.py) ======
+JOBS_DB = DATA_ROOT / "jobs.sqlite3"
+# Lease de um job "running": o dono renova a cada ~1/3 disso; vencido, outro processo pode retomá-lo
+JOB_LEASE_SEC = float(os.getenv("DUBBER_JOB_LEASE_SEC", "60"))
+
+def _parse_limits(spec: str) -> dict:
+    """'xtts=1,asr=2' -> {'xtts': 1, 'asr': 2} (entradas inválidas são ignoradas)."""
+    out = {}
+    for part in (spec or "").split(","):
+        name, _, val = part.partition("=")
+        if name.strip() and val.strip().isdigit():
+            out[name.strip()] = max(1, int(val))
+    return out
+
+# Jobs simultâneos por engine (sobrescreva com DUBBER_JOB_LIMITS="xtts=1,asr=2,...")
+JOB_LIMITS = {"xtts": 1, "asr": 1, "s2s": S2S_WORKERS, "ffmpeg": 2, **_parse_limits(os.getenv("DUBBER_JOB_LIMITS", ""))}
+
+# ====== Threads de CPU (app/threads.py) ======
+# Perfil: "safe" = 1 thread por lib nativa (padrão no macOS, estável com a GUI);
+# "auto" = divide os núcleos (afinidade + cota do cgroup) entre os engines ativos.
+THREAD_PROFILE = os.getenv("DUBBER_THREAD_PROFILE", "safe" if sys.platform == "darwin" else "auto").strip().lower()
+# Núcleos a considerar (0 = detectar)
+CPU_CORES = _env_threads("DUBBER_CPU_CORES")
+# Peso de cada engine na divisão (DUBBER_THREAD_WEIGHTS="xtts=3,asr=1,...")
+THREAD_WEIGHTS = {"xtts": 2, "asr": 1, "s2s": 2, "ffmpeg": 1, **_parse_limits(os.getenv("DUBBER_THREAD_WEIGHTS", ""))}
+# Valores fixos (0 = pelo orçamento)
+TORCH_THREADS = _env_threads("DUBBER_TORCH_THREADS")
+FFMPEG_THREADS = _env_threads("DUBBER_FFMPEG_THREADS")
+
+# ====== Serviço HTTP local (app/server.py) ======
+SERVER_HOST = os.getenv("DUBBER_SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("DUBBER_SERVER_PORT", "8765"))
+
+# ====== Startup da GUI ======
+# Pré-carregamento em background (app/warmup.py) na GUI:
+# "auto" = engine do último job / da aba aberta; "off" = desliga;
+# ou lista fixa, ex.: "xtts,s2s" (alvos: xtts, asr, s2s).
+WARMUP = os.getenv("DUBBER_WARMUP", "auto").strip().lower()
+
+# ====== Telemetria (app/trace.py) ======
+# Spans por etapa gravados em <job>/trace.jsonl ("0" desliga; as métricas em memória continuam)
+TRACE_ENABLED = os.getenv("DUBBER_TRACE", "1").strip().lower() not in ("0", "false", "off", "no")
+# GET /metrics (Prometheus) na GUI; 0 = desligado (o app/server.py sempre expõe /metrics)
+METRICS_PORT = int(os.getenv("DUBBER_METRICS_PORT", "0"))
@@ -3,9 +3,11 @@ from threading import Lock
 from typing import Dict, Any, List
 
 import whisper
-import librosa
 
 from app.config import ASR_MODEL_SIZE  # usamos "tiny" para validar
+from app.audio.utils import get_audio_duration_sec
+from app.transcript import Transcript
+from app import trace
 
 class ASREngine:
     """
@@ -24,9 +26,11 @@ class ASREngine:
     def instance(cls) -> "ASREngine":
         with cls._lock:
             if cls._instance is None:
-                cls._instance = ASREngine()
+                with trace.span("load.whisper_openai"):
+                    cls._instance = ASREngine()
             return cls._instance
 
+    @trace.timed("asr.transcribe")
     def transcribe(self, audio_path: Path) -> Dict[str, Any]:
         print(f"[ASR-OAI] Transcribe start: {audio_path}")
         # Whisper faz resample internamente; nosso pipeline já entrega 16 kHz mono
@@ -38,10 +42,9 @@ class ASREngine:
         )
         text = (result.get("text") or "").strip()
         lang = result.get("language")
-        # duração só para referência
+        # duração só para referência (metadados; não decodifica de novo)
         try:
-            y, sr = librosa.load(str(audio_path), sr=16000, mono=True)
-            duration = float(len(y) / sr)
+            duration = get_audio_duration_sec(Path(audio_path))
         except Exception:
             duration = 0.0
 
@@ -54,3 +57,26 @@ class ASREngine:
             })
         print(f"[ASR-OAI] Transcribe done. TextLen={len(text)}")
         return {"language": lang, "duration": duration, "segments": segs, "text": text}
+
+    @trace.timed("asr.transcribe")
+    def transcribe_timed(self, audio_path: Path, words: bool = True, vad_filter: bool = True) -> Transcript:
+        """
+        Transcrição com timestamps de segmento (e de palavra, se words=True), em formato
+        colunar (app.transcript.Transcript). vad_filter é ignorado (o whisper não tem VAD).
+        """
+        print(f"[ASR-OAI] Transcribe (timestamps) start: {audio_path}")
+        result = self.model.transcribe(
+            str(audio_path),
+            fp16=False,
+            temperature=0,
+            verbose=False,
+            word_timestamps=words,
+        )
+        try:
+            duration = get_audio_duration_sec(Path(audio_path))
+        except Exception:
+            duration = 0.0
+        tr = Transcript.from_segments(result.get("segments", []), language=result.get("language"),
+                                      duration=duration, meta={"backend": "openai-whisper", "model": ASR_MODEL_SIZE})
+        print(f"[ASR-OAI] Transcribe (timestamps) done. Segments={len(tr)}, Words={len(tr.word_text)}")
+        return tr
@@ -0,0 +1,136 @@
+# app/engines/asr_parallel.py
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional
+import multiprocessing as mp
+
+from app.config import ASR_MODEL_SIZE, ASR_COMPUTE_TYPE, ASR_DEVICE, ASR_WINDOW_SEC
+from app.threads import ThreadBudget, child_thread_env
+from app.audio.stream import open_audio
+from app.audio.utils import split_on_silence
+from app.transcript import Transcript
+from app import trace
+
+# ========= processo filho: uma réplica do modelo por processo =========
+_REPLICA = None
+
+
+def _init_replica(model_size: str, device: str, compute_type: str) -> None:
+    """Carrega o faster-whisper 1x por processo, com 1 thread (o paralelismo é entre processos)."""
+    global _REPLICA
+    from faster_whisper import WhisperModel
+    _REPLICA = WhisperModel(model_size, device=device, compute_type=compute_type,
+                            cpu_threads=1, num_workers=1)
+
+
+def _transcribe_window(src_path: str, start: float, end: float, words: bool) -> Dict[str, Any]:
+    """
+    Transcreve [start, end) da mídia; tempos relativos ao início da janela.
+    Só a janela é decodificada (seek no WAV ou ffmpeg -ss), em 16 kHz mono.
+    """
+    audio = open_audio(Path(src_path), 16000).read(start, end)
+    segments, info = _REPLICA.transcribe(
+        audio,
+        vad_filter=True,
+        vad_parameters=dict(min_silence_duration_ms=400),
+        beam_size=1,
+        condition_on_previous_text=False,
+        chunk_length=15,
+        word_timestamps=words,
+    )
+    segs = [{
+        "start": s.start, "end": s.end, "text": s.text,
+        "words": [{"start": w.start, "end": w.end, "word": w.word, "probability": w.probability}
+                  for w in (s.words or ())],
+    } for s in segments]
+    return {"segments": segs, "language": info.language, "duration": end - start}
+
+
+class ASRReplicaPool:
+    """
+    Transcrição de arquivos longos em paralelo:
+    - corta o áudio em janelas de até ASR_WINDOW_SEC no meio de silêncios;
+    - cada janela vai para um processo com sua réplica do modelo (spawn, 1 thread cada);
+    - junta os resultados com os tempos corrigidos pelo início de cada janela.
+
+    API:
+      ASRReplicaPool.instance().transcribe_long(media, words=True, progress=None) -> Transcript
+    `media` pode ser o WAV 16 kHz ou o arquivo original (mp4, mp3...): nada é
+    decodificado por inteiro, nem para a memória nem para um WAV temporário.
+    """
+    _instance = None
+    _lock = Lock()
+
+    def __init__(self, replicas: Optional[int] = None):
+        self.replicas = max(1, int(replicas or ThreadBudget.instance().asr_replicas()))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._exec_lock = Lock()
+
+    @classmethod
+    def instance(cls) -> "ASRReplicaPool":
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = ASRReplicaPool()
+            return cls._instance
+
+    @classmethod
+    def shutdown_instance(cls) -> None:
+        with cls._lock:
+            if cls._instance is not None:
+                cls._instance.shutdown()
+                cls._instance = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._exec_lock:
+            if self._executor is None:
+                print(f"[ASR-POOL] iniciando {self.replicas} réplicas ({ASR_MODEL_SIZE}, {ASR_COMPUTE_TYPE})")
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.replicas,
+                    mp_context=mp.get_context("spawn"),
+                    initializer=_init_replica,
+                    initargs=(ASR_MODEL_SIZE, ASR_DEVICE, ASR_COMPUTE_TYPE),
+                )
+            return self._executor
+
+    def transcribe_long(self,
+                        media: Path,
+                        words: bool = True,
+                        window_sec: float = ASR_WINDOW_SEC,
+                        progress: Callable[[int, int], None] | None = None) -> Transcript:
+        with trace.span("asr.split") as sp:
+            windows = split_on_silence(media, max_window_sec=window_sec, min_window_sec=window_sec / 6.0)
+            sp["windows"] = len(windows)
+        if not windows:
+            return Transcript(meta={"backend": "faster-whisper", "model": ASR_MODEL_SIZE})
+        print(f"[ASR-POOL] {Path(media).name}: {len(windows)} janelas, {self.replicas} réplicas")
+
+        with trace.span("load.asr_pool", replicas=self.replicas):
+            pool = self._pool()
+        # as réplicas nascem nos primeiros submit() (spawn sob demanda), com 1 thread nativa cada
+        with child_thread_env(1):
+            futs = {pool.submit(_transcribe_window, str(media), s, e, words): i for i, (s, e) in enumerate(windows)}
+        results: List[Optional[Dict[str, Any]]] = [None] * len(windows)
+        try:
+            with trace.span("asr.parallel", windows=len(windows)):
+                for n, fut in enumerate(as_completed(futs), start=1):
+                    results[futs[fut]] = fut.result()
+                    if progress is not None:
+                        progress(n, len(windows))
+        except BaseException:
+            for f in futs:
+                f.cancel()
+            raise
+
+        parts = [Transcript.from_segments(r["segments"], language=r["language"], duration=r["duration"])
+                 for r in results]
+        tr = Transcript.concat(parts, offsets=[s for s, _ in windows], duration=windows[-1][1])
+        tr.meta = {"backend": "faster-whisper", "model": ASR_MODEL_SIZE, "windows": len(windows)}
+        return tr
+
+    def shutdown(self) -> None:
+        with self._exec_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
@@ -1,26 +1,30 @@
 from pathlib import Path
 from threading import Lock
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterator, Tuple
 
 from faster_whisper import WhisperModel  # pip install faster-whisper
-from app.config import ASR_MODEL_SIZE, ASR_COMPUTE_TYPE
+from app.config import ASR_MODEL_SIZE, ASR_COMPUTE_TYPE, ASR_DEVICE
+from app.threads import ThreadBudget
+from app import trace
+from app.transcript import Transcript
 
 class ASREngine:
     """
     Singleton para transcrição local com faster-whisper (CPU).
     - Usa menos threads para não 'engasgar' a UI/CPU.
     - Faz chunking curto para ficar responsivo.
+    - Modelo/compute_type/threads vêm do app/config.py (um só lugar).
     """
     _instance = None
     _lock = Lock()
 
     def __init__(self):
-        # Limite de threads ajuda MUITO em máquinas Intel.
-        cpu_threads = 2  # ajuste se quiser (2-4 geralmente é ótimo)
+        # Fixo ao carregar (ctranslate2): perfil safe = 2; auto = fatia do ASR nos núcleos disponíveis.
+        cpu_threads = ThreadBudget.instance().asr_cpu_threads()
         print(f"[ASR] Loading faster-whisper model={ASR_MODEL_SIZE} compute_type={ASR_COMPUTE_TYPE} cpu_threads={cpu_threads} ...")
         self.model = WhisperModel(
             ASR_MODEL_SIZE,
-            device="cpu",
+            device=ASR_DEVICE,
             compute_type=ASR_COMPUTE_TYPE,
             cpu_threads=cpu_threads,
         )
@@ -30,9 +34,11 @@ class ASREngine:
     def instance(cls) -> "ASREngine":
         with cls._lock:
             if cls._instance is None:
-                cls._instance = ASREngine()
+                with trace.span("load.whisper"):
+                    cls._instance = ASREngine()
             return cls._instance
 
+    @trace.timed("asr.transcribe")
     def transcribe(self, audio_path: Path) -> Dict[str, Any]:
         print(f"[ASR] Transcribe start: {audio_path}")
         # Parâmetros de transcrição para ficar rápido e estável
@@ -57,3 +63,54 @@ class ASREngine:
             "segments": [],             # omitimos detalhes pq without_timestamps=True
             "text": full_text,
         }
+
+    @trace.timed("asr.transcribe")
+    def transcribe_timed(self, audio_path: Path, words: bool = True, vad_filter: bool = True) -> Transcript:
+        """
+        Transcrição com timestamps de segmento (e de palavra, se words=True),
+        em formato colunar (app.transcript.Transcript).
+        """
+        print(f"[ASR] Transcribe (timestamps) start: {audio_path}")
+        segments, info = self.model.transcribe(
+            str(audio_path),
+            vad_filter=vad_filter,
+            vad_parameters=dict(min_silence_duration_ms=400),
+            beam_size=1,
+            condition_on_previous_text=False,
+            chunk_length=15,
+            word_timestamps=words,
+        )
+        segs = []
+        for s in segments:
+            segs.append({
+                "start": s.start, "end": s.end, "text": s.text,
+                "words": [{"start": w.start, "end": w.end, "word": w.word, "probability": w.probability}
+                          for w in (s.words or ())],
+            })
+        tr = Transcript.from_segments(segs, language=info.language, duration=info.duration,
+                                      meta={"backend": "faster-whisper", "model": ASR_MODEL_SIZE})
+        print(f"[ASR] Transcribe (timestamps) done. Segments={len(tr)}, Words={len(tr.word_text)}")
+        return tr
+
+    def iter_segments(self, audio_path: Path, vad_filter: bool = True) -> Iterator[Tuple[float, float, str]]:
+        """
+        Modo com timestamps: gera (start, end, texto) por segmento, à medida que o
+        faster-whisper decodifica. Segmentos vazios ou de duração zero são ignorados.
+        O span "asr.segments" cobre a iteração inteira (inclui o tempo do consumidor entre yields).
+        """
+        print(f"[ASR] Segments start: {audio_path}")
+        with trace.span("asr.segments") as sp:
+            segments, _info = self.model.transcribe(str(audio_path), task="transcribe", vad_filter=vad_filter)
+            n = 0
+            for seg in segments:
+                txt = (seg.text or "").strip()
+                start = float(seg.start)
+                end = float(seg.end)
+                if end > start and txt:
+                    n += 1
+                    sp["segments"] = n
+                    yield start, end, txt
+
+    def transcribe_segments(self, audio_path: Path, vad_filter: bool = True) -> List[Tuple[float, float, str]]:
+        """Igual a iter_segments, mas devolve a lista completa."""
+        return list(self.iter_segments(audio_path, vad_filter=vad_filter))
@@ -0,0 +1,302 @@
+# app/engines/s2s_pool.py
+from __future__ import annotations
+from concurrent.futures import Future
+from contextlib import nullcontext
+from collections import deque
+from pathlib import Path
+from threading import Lock, Thread
+from typing import Callable
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import traceback
+
+from app.config import LOGS_DIR, S2S_WORKERS
+from app.threads import ThreadBudget, child_thread_env
+
+
+# ========= processo filho: carrega os modelos 1x e atende jobs até receber None =========
+def _worker_main(worker_id: int, jobs_q, events_q, cores: int) -> None:
+    """
+    Roda em processo separado (spawn): isola libs nativas e mantém XTTS/Whisper quentes.
+    `jobs_q`: fila só deste processo (o pai manda um job por vez, quando ele está livre).
+    `cores`: fatia da máquina para este processo, dividida entre XTTS e Whisper/DSP.
+    Eventos: (tipo, worker_id, pid, job_id, dados); o pid distingue um worker recriado
+    (mesmo worker_id) de eventos atrasados do processo anterior.
+    """
+    pid = os.getpid()
+    from app.threads import ThreadBudget
+    budget = ThreadBudget.instance()
+    budget.set_cores(cores)
+    budget.rebalance({"xtts": 1, "asr": 1})
+
+    from app import trace
+    from app.engines.vc_s2s import VCEngine
+
+    vc = VCEngine.instance()
+    try:
+        vc.warmup()
+    except Exception:
+        # sem warm-up: o primeiro job carrega os modelos
+        traceback.print_exc()
+    events_q.put(("ready", worker_id, pid, None, None))
+
+    while True:
+        job = jobs_q.get()
+        if job is None:
+            break
+        job_id, kw = job
+        events_q.put(("start", worker_id, pid, job_id, None))
+        try:
+            def progress(done: int, total: int, _jid=job_id):
+                events_q.put(("progress", worker_id, pid, _jid, (done, total)))
+
+            transcript = None
+            if kw.get("transcript_json"):
+                from app.transcript import Transcript
+                transcript = Transcript.load_json(Path(kw["transcript_json"]))
+            # spans do filho vão para o trace.jsonl do job (execução própria, kind "s2s.worker")
+            with (trace.job(Path(kw["trace_dir"]), "s2s.worker", worker=worker_id)
+                  if kw.get("trace_dir") else nullcontext()):
+                out = vc.convert(
+                    src_audio=Path(kw["src"]),
+                    speaker_wav=Path(kw["speaker"]),
+                    out_wav=Path(kw["out_wav"]),
+                    language=kw["language"],
+                    keep_sr=True,
+                    normalize=True,
+                    progress=progress,
+                    transcript=transcript,
+                )
+            events_q.put(("done", worker_id, pid, job_id, str(out)))
+        except Exception as e:
+            # registra stacktrace do filho
+            trace.append_log("s2s_child.log", traceback.format_exc(), worker=worker_id, src=kw.get("src"))
+            events_q.put(("error", worker_id, pid, job_id, f"{e}"))
+
+
+class _PendingJob:
+    def __init__(self, future: Future, on_progress: Callable[[int, int], None] | None):
+        self.future = future
+        self.on_progress = on_progress
+
+
+class S2SWorkerPool:
+    """
+    Pool supervisionado de processos S2S (spawn) com modelos mantidos em memória.
+    - Jobs entram numa fila do pai; o supervisor entrega o próximo a um worker livre
+      (fila própria de cada processo), então sempre sabe qual processo tem qual job;
+    - Progresso/resultados voltam por uma fila de eventos;
+    - Se um worker morre (crash nativo), o job dele falha e o worker é recriado;
+    - Cancelar um job em andamento mata o worker dele (que é recriado, com warm-up).
+
+    API:
+      S2SWorkerPool.instance().submit(src, speaker_wav, out_wav, language, on_progress, transcript_json, trace_dir)
+        -> Future[Path]
+      S2SWorkerPool.instance().cancel(future, exc=None)
+    Se on_progress levantar exceção (ex.: JobCancelled do JobScheduler), o job é cancelado
+    e o futuro falha com ela.
+    """
+    _instance = None
+    _lock = Lock()
+
+    def __init__(self, workers: int = S2S_WORKERS):
+        self._ctx = mp.get_context("spawn")
+        self._events_q = self._ctx.Queue()
+        self._n_workers = max(1, int(workers))
+        self._procs: dict[int, mp.process.BaseProcess] = {}   # worker_id -> processo atual
+        self._jobs_qs: dict[int, object] = {}                 # worker_id -> fila do processo atual
+        self._idle: set[int] = set()                          # pids livres (mandaram "ready"/"done")
+        self._inflight: dict[int, int] = {}                   # pid -> job_id entregue a ele
+        self._stopping: set[int] = set()                      # pids encerrados por cancelamento
+        self._backlog: deque = deque()                        # (job_id, kw) ainda sem worker
+        self._pending: dict[int, _PendingJob] = {}            # job_id -> futuro
+        self._ids = itertools.count(1)
+        self._state_lock = Lock()
+        self._closing = False
+
+        for wid in range(self._n_workers):
+            self._spawn(wid)
+        self._supervisor = Thread(target=self._supervise, daemon=True)
+        self._supervisor.start()
+
+    @classmethod
+    def instance(cls) -> "S2SWorkerPool":
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = S2SWorkerPool()
+            return cls._instance
+
+    @classmethod
+    def shutdown_instance(cls) -> None:
+        with cls._lock:
+            if cls._instance is not None:
+                cls._instance.shutdown()
+                cls._instance = None
+
+    # -------------- API pública --------------
+    def submit(self,
+               src: Path,
+               speaker_wav: Path,
+               out_wav: Path,
+               language: str = "pt",
+               on_progress: Callable[[int, int], None] | None = None,
+               transcript_json: Path | None = None,
+               trace_dir: Path | None = None) -> Future:
+        """
+        transcript_json: transcrição com timestamps já feita (o worker pula o ASR).
+        trace_dir: pasta do job; o worker grava os spans dele no trace.jsonl de lá.
+        """
+        if self._closing:
+            raise RuntimeError("Pool S2S encerrado.")
+        fut: Future = Future()
+        job_id = next(self._ids)
+        kw = {
+            "src": str(src),
+            "speaker": str(speaker_wav),
+            "out_wav": str(out_wav),
+            "language": language,
+            "transcript_json": str(transcript_json) if transcript_json else None,
+            "trace_dir": str(trace_dir) if trace_dir else None,
+        }
+        with self._state_lock:
+            self._pending[job_id] = _PendingJob(fut, on_progress)
+            self._backlog.append((job_id, kw))
+            self._dispatch()
+        return fut
+
+    def cancel(self, fut: Future, exc: BaseException | None = None) -> bool:
+        """
+        Cancela o job do futuro: sai da fila ou, se já está num worker, o processo é
+        encerrado (e recriado pelo supervisor). O futuro falha com `exc`. False se já terminou.
+        """
+        with self._state_lock:
+            job_id = next((jid for jid, job in self._pending.items() if job.future is fut), None)
+            if job_id is None:
+                return False
+            self._pending.pop(job_id)
+            self._backlog = deque(item for item in self._backlog if item[0] != job_id)
+            pid = next((pid for pid, jid in self._inflight.items() if jid == job_id), None)
+            if pid is not None:
+                self._inflight.pop(pid)
+                wid = self._live_wid(pid)
+                if wid is not None:
+                    print(f"[S2S-POOL] job {job_id} cancelado; encerrando worker {wid}.")
+                    self._stopping.add(pid)
+                    self._procs[wid].terminate()
+        if not fut.done():
+            fut.set_exception(exc or RuntimeError("Conversão S2S cancelada."))
+        return True
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        self._closing = True
+        for q in self._jobs_qs.values():
+            q.put(None)
+        for p in self._procs.values():
+            p.join(timeout=timeout)
+            if p.is_alive():
+                p.terminate()
+        with self._state_lock:
+            for job in self._pending.values():
+                if not job.future.done():
+                    job.future.set_exception(RuntimeError("Pool S2S encerrado."))
+            self._pending.clear()
+            self._backlog.clear()
+
+    # -------------- interno --------------
+    def _spawn(self, wid: int) -> None:
+        jobs_q = self._ctx.Queue()   # fila nova: nada do processo anterior fica para o novo
+        cores = ThreadBudget.instance().s2s_worker_cores(self._n_workers)
+        p = self._ctx.Process(
+            target=_worker_main,
+            args=(wid, jobs_q, self._events_q, cores),
+            name=f"s2s-worker-{wid}",
+            daemon=True,
+        )
+        with child_thread_env(cores):
+            p.start()
+        self._procs[wid] = p
+        self._jobs_qs[wid] = jobs_q
+        print(f"[S2S-POOL] worker {wid} iniciado (pid={p.pid})")
+
+    def _live_wid(self, pid: int) -> int | None:
+        """worker_id do processo ATUAL com esse pid (None: processo antigo, já substituído)."""
+        for wid, p in self._procs.items():
+            if p.pid == pid:
+                return wid
+        return None
+
+    def _dispatch(self) -> None:
+        """Entrega jobs da fila aos workers livres. Chamar com _state_lock."""
+        while self._backlog and self._idle:
+            job_id, kw = self._backlog.popleft()
+            job = self._pending.get(job_id)
+            if job is None or not job.future.set_running_or_notify_cancel():
+                self._pending.pop(job_id, None)   # cancelado antes de começar
+                continue
+            pid = self._idle.pop()
+            self._inflight[pid] = job_id
+            self._jobs_qs[self._live_wid(pid)].put((job_id, kw))
+
+    def _supervise(self) -> None:
+        while not self._closing:
+            try:
+                kind, wid, pid, job_id, data = self._events_q.get(timeout=0.5)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            except (EOFError, OSError):
+                break
+            self._handle_event(kind, pid, job_id, data)
+            self._check_workers()
+
+    def _handle_event(self, kind: str, pid: int, job_id: int | None, data) -> None:
+        with self._state_lock:
+            if self._live_wid(pid) is None:
+                return   # evento atrasado de um processo que já morreu (o job dele já falhou)
+            if kind == "ready":
+                if pid not in self._stopping:
+                    self._idle.add(pid)
+                    self._dispatch()
+                return
+            if kind == "start":
+                return   # o pai já marcou o job como deste processo ao entregá-lo
+            job = self._pending.get(job_id) if self._inflight.get(pid) == job_id else None
+            if kind in ("done", "error"):
+                self._inflight.pop(pid, None)
+                self._pending.pop(job_id, None)
+                if pid not in self._stopping:
+                    self._idle.add(pid)
+                    self._dispatch()
+        if job is None:
+            return
+        if kind == "progress":
+            if job.on_progress is not None:
+                try:
+                    job.on_progress(*data)
+                except Exception as e:
+                    # quem chamou não quer mais o job (ex.: JobCancelled): para o worker
+                    self.cancel(job.future, e)
+        elif kind == "done":
+            job.future.set_result(Path(data))
+        elif kind == "error":
+            job.future.set_exception(RuntimeError(f"Conversão S2S falhou: {data}. Veja logs em {LOGS_DIR}."))
+
+    def _check_workers(self) -> None:
+        if self._closing:
+            return
+        for wid, p in list(self._procs.items()):
+            if p.is_alive():
+                continue
+            with self._state_lock:
+                self._idle.discard(p.pid)
+                self._stopping.discard(p.pid)
+                job_id = self._inflight.pop(p.pid, None)
+                job = self._pending.pop(job_id, None) if job_id is not None else None
+                print(f"[S2S-POOL] worker {wid} caiu (exitcode={p.exitcode}); reiniciando.")
+                self._spawn(wid)
+            if job is not None and not job.future.done():
+                job.future.set_exception(RuntimeError(
+                    f"Conversão S2S falhou (exitcode={p.exitcode}). Veja logs em {LOGS_DIR}."
+                ))
@@ -0,0 +1,183 @@
+# app/engines/tts_cache.py
+from __future__ import annotations
+from pathlib import Path
+from threading import Lock
+import hashlib
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+import soundfile as sf
+
+from app.utils.hashing import file_sha1
+
+_WS_RE = re.compile(r"\s+")
+
+
+def _link_or_copy(src: Path, dest: Path) -> bool:
+    if dest.exists():
+        return True
+    tmp = dest.with_name(f"{dest.name}.{os.getpid()}.tmp")
+    try:
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copy2(src, tmp)
+        tmp.replace(dest)
+        return True
+    except OSError as e:
+        tmp.unlink(missing_ok=True)
+        if not isinstance(e, FileNotFoundError):
+            print(f"[TTS-CACHE] Falha ao copiar {src.name}: {e}")
+        return False
+
+
+def normalize_segment_text(text: str) -> str:
+    """Normalização usada na chave: espaços colapsados e sem bordas (o resto conta)."""
+    return _WS_RE.sub(" ", text or "").strip()
+
+
+class SegmentCache:
+    """
+    Cache em disco do áudio de cada segmento sintetizado (endereçado por conteúdo).
+
+    Chave = SHA-1 de (texto normalizado, voz [id + SHA-1 do clean.wav], idioma,
+    modelo + versão, parâmetros de amostragem). Cada entrada é um WAV float32 em
+    <root>/<2 primeiros hex>/<chave>.wav. O mtime do arquivo marca o último uso:
+    ao passar de `max_bytes`, os menos usados recentemente são apagados (LRU).
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = int(max_bytes)
+        self._lock = Lock()
+        self._total: int | None = None            # bytes em disco (calculado sob demanda)
+        self._voice_hash: dict[tuple, str] = {}   # (path, size, mtime_ns) -> sha1
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def key(self, text: str, speaker_wav: Path, language: str, model: str, params: dict) -> str:
+        payload = {
+            "text": normalize_segment_text(text),
+            "voice": self._voice_id(Path(speaker_wav)),
+            "language": language,
+            "model": model,
+            "params": params,
+        }
+        blob = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> tuple[np.ndarray, int] | None:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            wav, sr = sf.read(str(path), dtype="float32", always_2d=False)
+            os.utime(path)   # marca como usado recentemente
+        except (FileNotFoundError, RuntimeError):
+            return None
+        except Exception as e:
+            print(f"[TTS-CACHE] Entrada ignorada ({path.name}): {e}")
+            return None
+        return np.asarray(wav, dtype=np.float32).reshape(-1), int(sr)
+
+    def put(self, key: str, wav: np.ndarray, sr: int) -> None:
+        if not self.enabled:
+            return
+        path = self._path(key)
+        tmp = path.with_name(f"{path.stem}.{os.getpid()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            sf.write(str(tmp), np.asarray(wav, dtype=np.float32).reshape(-1), int(sr),
+                     subtype="FLOAT", format="WAV")
+            tmp.replace(path)
+        except Exception as e:
+            print(f"[TTS-CACHE] Falha ao gravar {path.name}: {e}")
+            tmp.unlink(missing_ok=True)
+            return
+        with self._lock:
+            if self._total is None:
+                self._total = self._scan_total()
+            else:
+                self._total += path.stat().st_size
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def export(self, key: str, dest: Path) -> bool:
+        """
+        Coloca a entrada em `dest` (hardlink: mesmo áudio em disco, sobrevive ao LRU;
+        cópia se o link não for possível). False se a entrada não existe.
+        """
+        if not self.enabled:
+            return False
+        return _link_or_copy(self._path(key), Path(dest))
+
+    def adopt(self, key: str, src: Path) -> bool:
+        """Devolve ao cache uma entrada guardada fora dele (ex.: segmentos de um job)."""
+        if not self.enabled:
+            return False
+        path = self._path(key)
+        if path.exists():
+            return True
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if not _link_or_copy(Path(src), path):
+            return False
+        with self._lock:
+            if self._total is not None:
+                self._total += path.stat().st_size
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            for f in self.root.glob("*/*.wav"):
+                f.unlink(missing_ok=True)
+            self._total = 0
+
+    # -------------- interno --------------
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.wav"
+
+    def _voice_id(self, speaker_wav: Path) -> str:
+        """id da voz-base (nome da pasta, se houver voice.json) + SHA-1 do clean.wav."""
+        speaker_wav = speaker_wav.resolve()
+        st = speaker_wav.stat()
+        skey = (str(speaker_wav), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            digest = self._voice_hash.get(skey)
+        if digest is None:
+            digest = file_sha1(speaker_wav)
+            with self._lock:
+                self._voice_hash[skey] = digest
+        vdir = speaker_wav.parent
+        vid = vdir.name if (vdir / "voice.json").exists() else ""
+        return f"{vid}:{digest}"
+
+    def _scan_total(self) -> int:
+        return sum(f.stat().st_size for f in self.root.glob("*/*.wav"))
+
+    def _evict(self) -> None:
+        """Apaga os menos usados até ficar em 90% do limite."""
+        files = []
+        for f in self.root.glob("*/*.wav"):
+            try:
+                st = f.stat()
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime_ns, st.st_size, f))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        for _, size, f in files:
+            if total <= target:
+                break
+            f.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        self._total = total
+        if removed:
+            print(f"[TTS-CACHE] {removed} entradas antigas removidas ({total / 1e6:.1f} MB em uso)")
@@ -1,21 +1,37 @@
 from pathlib import Path
 from threading import Lock
+from typing import Callable, Iterator
+import json
 import os
 import re
 import shutil
+import sys
 import numpy as np
 import soundfile as sf
 
 import torch
 from TTS.api import TTS  # pip install TTS
 
-from app.config import SAMPLE_RATE
+from app.threads import configure_torch
+from app import trace
+configure_torch()
+
+from app.config import (
+    SAMPLE_RATE, XTTS_LATENT_CACHE_SIZE, XTTS_BATCH_SIZE, TTS_CACHE_DIR, TTS_CACHE_MAX_MB, XTTS_BACKEND
+)
+from app.engines.xtts_latents import SpeakerLatentCache
+from app.engines.tts_cache import SegmentCache
+from app.engines import xtts_batch, xtts_optimize
+from app.audio.stream import StreamingWavWriter
 
 # ---------------- Normalização: "." / "…" -> ";" + divisão em segmentos ----------------
 # Usamos um marcador que o TTS não fala; depois dividimos o áudio nesses pontos.
 _MARK = "[[PAUSE_AFTER_DOT]]"
 _MARK_RE = re.compile(r"\s*" + re.escape(_MARK) + r"\s*")
 
+# Manifesto dos segmentos de um job (re-render incremental)
+SEGMENT_MANIFEST = "manifest.json"
+
 def _normalize_points(text: str) -> str:
     """
     Converte apenas pontos finais em vírgula dupla + marcador:
@@ -76,7 +92,7 @@ class XTTSEngine:
     _instance = None
     _lock = Lock()
 
-    def __init__(self, device: str | None = None):
+    def __init__(self, device: str | None = None, backend: str | None = None):
         forced = os.getenv("DUBBER_TORCH_DEVICE")
         if forced:
             device = forced
@@ -91,11 +107,21 @@ class XTTSEngine:
 
         self.tts = TTS(self.model_name).to(self.device)
 
+        # int8 / ONNX Runtime na CPU (DUBBER_XTTS_BACKEND); "fp32" = modelo como veio
+        self.backend = xtts_optimize.apply_backend(
+            self._model, XTTS_BACKEND if backend is None else backend, self.device)
+
+        # Latentes de condicionamento por voz (calculados 1x por voz, não 1x por frase)
+        self._latents = SpeakerLatentCache(self.model_name, max_items=XTTS_LATENT_CACHE_SIZE)
+        # Áudio por segmento já sintetizado (disco, LRU por tamanho)
+        self.segment_cache = SegmentCache(TTS_CACHE_DIR, max_bytes=TTS_CACHE_MAX_MB * 1024 * 1024)
+
     @classmethod
     def instance(cls):
         with cls._lock:
             if cls._instance is None:
-                cls._instance = XTTSEngine()
+                with trace.span("load.xtts"):
+                    cls._instance = XTTSEngine()
             return cls._instance
 
     # ====== Importante: redirecionar o modo simples para o "smart" ======
@@ -106,16 +132,91 @@ class XTTSEngine:
         """
         return self.synthesize_smart_to_file(text, speaker_wav, language, out_path, pause_ms=120)
 
+    # ====== Latentes da voz (cache) ======
+    @property
+    def _model(self):
+        """Modelo Xtts interno do Coqui (None se a versão não expuser)."""
+        return getattr(getattr(self.tts, "synthesizer", None), "tts_model", None)
+
+    @property
+    def output_sample_rate(self) -> int:
+        return int(getattr(getattr(self.tts, "synthesizer", None), "output_sample_rate", None) or SAMPLE_RATE)
+
+    def _inference_kwargs(self) -> dict:
+        """Parâmetros de amostragem do config do modelo (os mesmos que o tts_to_file usaria)."""
+        cfg = getattr(self._model, "config", None)
+        keys = ("temperature", "length_penalty", "repetition_penalty", "top_k", "top_p")
+        return {k: getattr(cfg, k) for k in keys if hasattr(cfg, k)}
+
+    def speaker_latents(self, speaker_wav: Path):
+        """
+        (gpt_cond_latent, speaker_embedding) da voz, via cache LRU + xtts_latents.pt
+        na pasta da voz. Retorna None se o modelo não suportar latentes.
+        """
+        model = self._model
+        if model is None or not hasattr(model, "get_conditioning_latents"):
+            return None
+        with trace.span("tts.latents"):
+            return self._latents.get(model, Path(speaker_wav), device=self.device)
+
+    # ====== Cache de segmentos ======
+    def _segment_key(self, text: str, speaker_wav: Path, language: str) -> str:
+        import TTS as _coqui
+        model = f"{self.model_name}@{getattr(_coqui, '__version__', '?')}"
+        if self.backend != "fp32":
+            model += f"+{self.backend}"   # int8/onnx não geram o mesmo áudio que o fp32
+        return self.segment_cache.key(text, speaker_wav, language, model, self._inference_kwargs())
+
     # ====== Interno: chamar TTS tentando desativar splits ======
-    def _tts_to_file_nosplit(self, text: str, file_path: Path, speaker_wav: Path, language: str):
+    def _tts_nosplit(self, text: str, speaker_wav: Path, language: str,
+                     cache: SegmentCache | None = None) -> tuple[np.ndarray, int]:
         """
-        Chama o TTS tentando desativar splits/normalização interna.
+        Igual a _tts_model_nosplit, consultando antes o cache de segmentos em disco
+        (`cache`, padrão: o do engine).
+        """
+        cache = cache or self.segment_cache
+        if not cache.enabled:
+            return self._tts_model_nosplit(text, speaker_wav, language)
+        key = self._segment_key(text, speaker_wav, language)
+        hit = cache.get(key)
+        if hit is not None:
+            return hit
+        wav, sr = self._tts_model_nosplit(text, speaker_wav, language)
+        cache.put(key, wav, sr)
+        return wav, sr
+
+    def _tts_model_nosplit(self, text: str, speaker_wav: Path, language: str) -> tuple[np.ndarray, int]:
+        """
+        Sintetiza UM segmento em memória (etapa "tts.segment" do trace).
+        Retorna (wav float32 mono, sr).
+        """
+        with trace.span("tts.segment", chars=len(text or "")) as sp:
+            wav, sr = self._tts_model_call(text, speaker_wav, language)
+            sp["audio_s"] = round(len(wav) / float(sr), 3)
+        return wav, sr
+
+    def _tts_model_call(self, text: str, speaker_wav: Path, language: str) -> tuple[np.ndarray, int]:
+        """
+        Tentando desativar splits/normalização interna do Coqui.
+        Com latentes em cache, chama o modelo direto (sem reanalisar o speaker_wav).
         """
         safe_text = (text or "").strip() + " "  # espaço final ajuda no EOS
+        sr = self.output_sample_rate
+        latents = self.speaker_latents(speaker_wav)
+        if latents is not None:
+            gpt_cond_latent, speaker_embedding = latents
+            out = self._model.inference(
+                text=safe_text,
+                language=language,
+                gpt_cond_latent=gpt_cond_latent,
+                speaker_embedding=speaker_embedding,
+                enable_text_splitting=False,
+                **self._inference_kwargs(),
+            )
+            return np.asarray(out["wav"], dtype=np.float32).reshape(-1), sr
         try:
-            self.tts.tts_to_file(
+            wav = self.tts.tts(
                 text=safe_text,
-                file_path=str(file_path),
                 speaker_wav=str(speaker_wav),
                 language=language,
                 split_sentences=False,
@@ -123,69 +224,263 @@ class XTTSEngine:
             )
         except TypeError:
             # versões que não aceitam os kwargs acima
-            self.tts.tts_to_file(
+            wav = self.tts.tts(
                 text=safe_text,
-                file_path=str(file_path),
                 speaker_wav=str(speaker_wav),
                 language=language
             )
+        return np.asarray(wav, dtype=np.float32).reshape(-1), sr
 
-    def synthesize_smart_to_file(
+    def _tts_batched(self, segments: list[str], speaker_wav: Path, language: str,
+                     batch_size: int,
+                     on_segment: Callable[[int, int], None] | None = None,
+                     cache: SegmentCache | None = None) -> list[np.ndarray] | None:
+        """
+        Sintetiza os segmentos em lotes de tamanho parecido (em tokens) no decoder do XTTS.
+        Retorna os wavs na ordem ORIGINAL dos segmentos, ou None se o modelo não suportar.
+        """
+        latents = self.speaker_latents(speaker_wav)
+        if latents is None:
+            return None
+        model = self._model
+        gpt_cond_latent, speaker_embedding = latents
+        cache = cache or self.segment_cache
+
+        # segmentos já em cache não entram nos lotes
+        out: list[np.ndarray | None] = [None] * len(segments)
+        keys: list[str | None] = [None] * len(segments)
+        if cache.enabled:
+            for i, seg in enumerate(segments):
+                keys[i] = self._segment_key(seg, speaker_wav, language)
+                hit = cache.get(keys[i])
+                if hit is not None:
+                    out[i] = hit[0]
+        todo = [i for i, w in enumerate(out) if w is None]
+        if on_segment is not None and len(todo) < len(segments):
+            on_segment(len(segments) - len(todo), len(segments))
+
+        tokens = {i: xtts_batch.tokenize(model, segments[i], language) for i in todo}
+        for bucket in xtts_batch.bucket_by_length([len(tokens[i]) for i in todo], batch_size):
+            group = [todo[j] for j in bucket]
+            wavs = None
+            if len(group) > 1:
+                try:
+                    with trace.span("tts.batch", size=len(group)):
+                        wavs = xtts_batch.infer_batch(
+                            model, [tokens[i] for i in group],
+                            gpt_cond_latent, speaker_embedding,
+                            **self._inference_kwargs(),
+                        )
+                except Exception as e:
+                    print(f"[TTS-BATCH] Lote de {len(group)} falhou ({e}); seguindo 1 a 1.")
+            if wavs is None:
+                wavs = [self._tts_model_nosplit(segments[i], speaker_wav, language)[0] for i in group]
+            for i, wav in zip(group, wavs):
+                out[i] = wav
+                if keys[i] is not None:
+                    cache.put(keys[i], wav, self.output_sample_rate)
+            if on_segment is not None:
+                on_segment(sum(w is not None for w in out), len(segments))
+        return out
+
+    @trace.timed("tts.synthesize")
+    def synthesize_smart_to_array(
         self,
         text: str,
         speaker_wav: Path,
         language: str,
-        out_path: Path,
-        pause_ms: int = 120
-    ) -> Path:
+        pause_ms: int = 120,
+        batch_size: int | None = None,
+        on_segment: Callable[[int, int], None] | None = None,
+        cache: SegmentCache | None = None
+    ) -> tuple[np.ndarray, int]:
         """
-        Pipeline:
+        Pipeline (tudo em memória, sem WAVs temporários):
         - Converte "."/ "…" finais para ";" + marcador;
         - Divide SOMENTE nesses pontos;
-        - Sintetiza cada parte sem splits internos;
-        - Junta com pausa curta entre as partes.
+        - Sintetiza cada parte sem splits internos (em lotes se batch_size > 1);
+        - Junta com pausa curta entre as partes, na ordem do texto.
+        on_segment(feitos, total) é chamado após cada segmento (ou lote); se levantar
+        exceção, a síntese é interrompida (útil para cancelamento).
+        cache: cache de segmentos a usar (padrão: o do engine).
+        Retorna (wav float32 mono, sr).
         """
-        out_path.parent.mkdir(parents=True, exist_ok=True)
-
         segments: list[str] = _split_segments(text)
         if not segments:
-            sf.write(str(out_path), np.zeros(1, dtype=np.float32), SAMPLE_RATE, subtype="PCM_16")
-            return out_path
+            return np.zeros(1, dtype=np.float32), SAMPLE_RATE
+
+        # debug: o que vai para o TTS (já com ";" no lugar dos ".")
+        print(f"[TTS-SMART] {len(segments)} segmentos:", segments)
 
-        tmp_dir = out_path.parent / "_tmp_xtts"
-        tmp_dir.mkdir(parents=True, exist_ok=True)
+        if batch_size is None:
+            batch_size = XTTS_BATCH_SIZE
 
         chunks: list[np.ndarray] = []
         sr_seen = None
-        try:
-            # debug: o que vai para o TTS (já com ";" no lugar dos ".")
-            print(f"[TTS-SMART] {len(segments)} segmentos:", segments)
-
-            for i, seg_text in enumerate(segments):
-                seg_file = tmp_dir / f"seg_{i:03d}.wav"
-                self._tts_to_file_nosplit(seg_text, seg_file, speaker_wav, language)
-
-                wav, sr = sf.read(str(seg_file), dtype="float32", always_2d=False)
+        batched = None
+        if batch_size > 1 and len(segments) > 1:
+            batched = self._tts_batched(segments, speaker_wav, language, batch_size,
+                                        on_segment=on_segment, cache=cache)
+        if batched is not None:
+            chunks = batched
+            sr_seen = self.output_sample_rate
+        else:
+            for seg_text in segments:
+                wav, sr = self._tts_nosplit(seg_text, speaker_wav, language, cache=cache)
                 if sr_seen is None:
                     sr_seen = sr
                 elif sr != sr_seen:
                     raise RuntimeError(f"SR inconsistente: {sr} vs {sr_seen}")
-                if isinstance(wav, np.ndarray) and wav.ndim > 1:
-                    wav = wav[:, 0]
-                chunks.append(wav.astype(np.float32))
+                chunks.append(wav)
+                if on_segment is not None:
+                    on_segment(len(chunks), len(segments))
+
+        joined = _join_with_silence(chunks, sr_seen or SAMPLE_RATE, pause_ms=pause_ms)
+
+        # normalização leve
+        if joined.size > 0:
+            peak = float(np.max(np.abs(joined)))
+            if peak > 0.99:
+                joined = 0.99 * joined / peak
+
+        return joined, sr_seen or SAMPLE_RATE
+
+    def synthesize_smart_to_file(
+        self,
+        text: str,
+        speaker_wav: Path,
+        language: str,
+        out_path: Path,
+        pause_ms: int = 120,
+        batch_size: int | None = None
+    ) -> Path:
+        """
+        Igual a synthesize_smart_to_array, gravando o resultado em out_path (PCM 16-bit).
+        """
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        joined, sr = self.synthesize_smart_to_array(text, speaker_wav, language,
+                                                    pause_ms=pause_ms, batch_size=batch_size)
+        with trace.span("write.wav"):
+            sf.write(str(out_path), joined, sr, subtype="PCM_16")
+        return out_path
+
+    # ====== Re-render incremental (manifesto de segmentos na pasta do job) ======
+    def synthesize_incremental_to_array(
+        self,
+        text: str,
+        speaker_wav: Path,
+        language: str,
+        seg_dir: Path,
+        pause_ms: int = 120,
+        on_segment: Callable[[int, int], None] | None = None
+    ) -> tuple[np.ndarray, int]:
+        """
+        Igual a synthesize_smart_to_array (em lotes, com cache), guardando os segmentos
+        do job em seg_dir com manifest.json (texto -> chave do cache + arquivo).
+        Numa nova geração do mesmo job, o manifesto anterior é comparado por chave: as
+        frases que não mudaram vêm de seg_dir (mesmo se o LRU do cache global já as
+        apagou) e só as novas/alteradas vão ao modelo.
+        Os arquivos de seg_dir são hardlinks das entradas do SegmentCache (o áudio é
+        gravado uma vez só); sem hardlink (outro disco), cópia.
+        """
+        segments: list[str] = _split_segments(text)
+        if not segments:
+            return np.zeros(1, dtype=np.float32), SAMPLE_RATE
+
+        seg_dir = Path(seg_dir)
+        seg_dir.mkdir(parents=True, exist_ok=True)
+        manifest_path = seg_dir / SEGMENT_MANIFEST
+        try:
+            old = json.loads(manifest_path.read_text(encoding="utf-8")).get("segments", [])
+        except (FileNotFoundError, ValueError):
+            old = []
+        pinned = {e["hash"]: seg_dir / e["file"] for e in old
+                  if e.get("file") and (seg_dir / e["file"]).exists()}
+
+        # cache global desligado: um cache temporário só para esta geração
+        local = not self.segment_cache.enabled
+        cache = SegmentCache(seg_dir / ".cache", max_bytes=sys.maxsize) if local else self.segment_cache
 
-            joined = _join_with_silence(chunks, sr_seen or SAMPLE_RATE, pause_ms=pause_ms)
+        keys = [self._segment_key(seg, speaker_wav, language) for seg in segments]
+        reused = 0
+        for k in keys:
+            if k in pinned:
+                cache.adopt(k, pinned[k])   # volta para o cache se o LRU apagou
+                reused += 1
+        print(f"[TTS-INCR] {len(segments)} segmentos: {reused} iguais à geração anterior, "
+              f"{len(segments) - reused} novos/alterados")
+        joined, sr = self.synthesize_smart_to_array(text, speaker_wav, language, pause_ms=pause_ms,
+                                                    on_segment=on_segment, cache=cache)
 
-            # normalização leve
-            if joined.size > 0:
-                peak = float(np.max(np.abs(joined)))
-                if peak > 0.99:
-                    joined = 0.99 * joined / peak
+        entries = []
+        for seg, k in zip(segments, keys):
+            fname = f"{k}.wav"
+            if k not in pinned:
+                cache.export(k, seg_dir / fname)
+            entries.append({"text": seg, "hash": k, "file": fname})
+        tmp = manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"segments": entries}, ensure_ascii=False, indent=1), encoding="utf-8")
+        tmp.replace(manifest_path)
+        # só apaga o que o manifesto anterior listava e saiu do texto
+        keep = set(keys)
+        for k, path in pinned.items():
+            if k not in keep:
+                path.unlink(missing_ok=True)
+        if local:
+            shutil.rmtree(seg_dir / ".cache", ignore_errors=True)
+        return joined, sr
 
-            sf.write(str(out_path), joined, sr_seen or SAMPLE_RATE, subtype="PCM_16")
-            return out_path
+    # ====== Streaming: entrega cada segmento assim que fica pronto ======
+    def iter_synthesize_smart(
+        self,
+        text: str,
+        speaker_wav: Path,
+        language: str,
+        pause_ms: int = 120
+    ) -> Iterator[tuple[np.ndarray, int]]:
+        """
+        Mesmo pipeline do modo smart, mas gera (wav, sr) por segmento, na ordem,
+        com a pausa já anexada ao final (exceto no último).
+        Como o áudio total ainda não existe, a normalização de pico é por segmento.
+        """
+        segments: list[str] = _split_segments(text)
+        if not segments:
+            yield np.zeros(1, dtype=np.float32), SAMPLE_RATE
+            return
+
+        print(f"[TTS-STREAM] {len(segments)} segmentos:", segments)
+        for i, seg_text in enumerate(segments):
+            wav, sr = self._tts_nosplit(seg_text, speaker_wav, language)
+            peak = float(np.max(np.abs(wav))) if wav.size else 0.0
+            if peak > 0.99:
+                wav = 0.99 * wav / peak
+            if pause_ms > 0 and i < len(segments) - 1:
+                gap = np.zeros(int(sr * (pause_ms / 1000.0)), dtype=np.float32)
+                wav = np.concatenate([wav, gap])
+            yield wav.astype(np.float32), sr
+
+    def synthesize_smart_stream_to_file(
+        self,
+        text: str,
+        speaker_wav: Path,
+        language: str,
+        out_path: Path,
+        pause_ms: int = 120,
+        on_chunk: Callable[[np.ndarray, int, int], None] | None = None
+    ) -> Path:
+        """
+        Grava out_path progressivamente (o WAV é válido a cada segmento) e chama
+        on_chunk(wav, sr, indice) logo que cada segmento fica pronto.
+        """
+        writer = None
+        try:
+            for i, (wav, sr) in enumerate(self.iter_synthesize_smart(text, speaker_wav, language, pause_ms)):
+                if writer is None:
+                    writer = StreamingWavWriter(out_path, sr)
+                writer.append(wav)
+                if on_chunk is not None:
+                    on_chunk(wav, sr, i)
         finally:
-            try:
-                shutil.rmtree(tmp_dir, ignore_errors=True)
-            except Exception:
-                pass
+            if writer is not None:
+                writer.close()
+        return out_path
@@ -1,20 +1,27 @@
 # app/engines/vc_s2s.py
 from __future__ import annotations
 from pathlib import Path
-from threading import Lock
-import subprocess
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Event, Lock, Thread
+from typing import TYPE_CHECKING, Callable
+import queue
 import tempfile
 import shutil
-import math
 
 import numpy as np
-import soundfile as sf
 
-from app.audio.utils import ensure_wav_mono_16000
+from app.audio.utils import ensure_wav_mono_16000, probe
+from app.audio.stretch import time_stretch, resample
 from app.audio.post import wav_to_mp3  # pode ser útil externamente
+from app.audio.stream import StreamingWavWriter
 from app.config import SAMPLE_RATE_TTS, SAMPLE_RATE, DATA_ROOT
+from app.threads import ThreadBudget
+from app import trace
 from app.engines.tts_xtts import XTTSEngine
 
+if TYPE_CHECKING:
+    from app.transcript import Transcript
+
 # (Opcional futuro) placeholder para backend OpenVoice
 _HAS_OPENVOICE = False
 try:
@@ -25,60 +32,48 @@ except Exception:
     _HAS_OPENVOICE = False
 
 
-def _ffmpeg_atempo(in_wav: Path, out_wav: Path, speed_factor: float) -> None:
-    """
-    Ajusta o tempo (duração) preservando o pitch via ffmpeg atempo.
-    speed_factor: >1 acelera (encurta), <1 desacelera (alongar).
-    """
-    # ffmpeg atempo aceita 0.5..2.0 – encadeamos se necessário
-    f = float(max(0.1, min(10.0, speed_factor)))
-    filters = []
-    while f > 2.0:
-        filters.append("atempo=2.0")
-        f /= 2.0
-    while f < 0.5:
-        filters.append("atempo=0.5")
-        f *= 2.0
-    filters.append(f"atempo={f:.6f}")
-    flt = ",".join(filters)
-
-    cmd = [
-        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
-        "-i", str(in_wav),
-        "-filter:a", flt,
-        str(out_wav)
-    ]
-    subprocess.run(cmd, check=True)
-
-
-def _read_duration(wav_path: Path) -> float:
-    with sf.SoundFile(str(wav_path), "r") as f:
-        return f.frames / float(f.samplerate)
+def _asr_engine():
+    """ASREngine (faster-whisper) compartilhado: carregado 1x por processo, config do app."""
+    try:
+        from app.engines.asr_whisper import ASREngine
+    except Exception as e:
+        raise RuntimeError("Instale 'faster-whisper' para S2S (pip install faster-whisper).") from e
+    return ASREngine.instance()
 
 
 def _resample_to(data: np.ndarray, sr_in: int, sr_out: int) -> np.ndarray:
-    if sr_in == sr_out:
-        return data.astype(np.float32, copy=False)
-    try:
-        import librosa
-        y = librosa.resample(data.astype(np.float32), orig_sr=sr_in, target_sr=sr_out, res_type="soxr_hq")
-        return y.astype(np.float32)
-    except Exception:
-        # fallback linear simples
-        import numpy as np
-        duration = len(data) / sr_in
-        n_out = int(round(duration * sr_out))
-        return np.interp(np.linspace(0, len(data)-1, n_out), np.arange(len(data)), data).astype(np.float32)
+    return resample(data, sr_in, sr_out)
+
+
+def _fit_segment(wav: np.ndarray, sr: int, target_sec: float, sr_out: int, normalize: bool) -> np.ndarray:
+    """
+    Ajusta um trecho sintetizado para caber em target_sec (time-stretch em memória,
+    preservando o pitch), converte para sr_out e limita o pico.
+    """
+    tts_dur = len(wav) / float(sr)
+    target = max(0.06, target_sec)  # não deixar alvo < 60 ms
+    factor = max(0.25, min(4.0, tts_dur / target))  # >1 acelera, <1 alonga (como o atempo)
+    if abs(factor - 1.0) >= 0.03:
+        wav = time_stretch(wav, sr, factor)
+
+    # garantir SR unificado
+    wav = _resample_to(wav, sr, sr_out)
+    # normalizar leve por segurança (evita clipping acumulado)
+    peak = float(np.max(np.abs(wav))) if wav.size else 0.0
+    if normalize and peak > 0.99:
+        wav = 0.99 * wav / peak
+    return wav.astype(np.float32)
 
 
 class VCEngine:
     """
     S2S (speech-to-speech) engine com dois backends:
       - 'openvoice' (opcional, zero-shot VC real)  -> TODO vendor
-      - 'prosody'   (padrão) usa ASR+TTS+atempo por trecho para casar tempos/pausas.
+      - 'prosody'   (padrão) usa ASR+TTS+time-stretch por trecho para casar tempos/pausas.
 
     API:
-      convert(src_audio, speaker_wav, out_wav, keep_sr=True, normalize=True) -> Path
+      convert(src_audio, speaker_wav, out_wav, keep_sr=True, normalize=True, progress=None) -> Path
+      progress(feitos, total) é chamado a cada trecho sintetizado (total = 0 enquanto o ASR roda).
     """
     _instance = None
     _lock = Lock()
@@ -96,19 +91,28 @@ class VCEngine:
             return cls._instance
 
     # -------------- API pública --------------
+    def warmup(self) -> None:
+        """Carrega os modelos usados pelo backend (útil em workers de longa duração)."""
+        XTTSEngine.instance()
+        _asr_engine()
+
     def convert(self,
                 src_audio: Path,
                 speaker_wav: Path,
                 out_wav: Path,
                 language: str = "pt",
                 keep_sr: bool = True,
-                normalize: bool = True) -> Path:
+                normalize: bool = True,
+                progress: Callable[[int, int], None] | None = None,
+                transcript: "Transcript | None" = None) -> Path:
+        """transcript: transcrição com timestamps já feita (pula o ASR e usa seus segmentos)."""
         out_wav.parent.mkdir(parents=True, exist_ok=True)
         if self.backend == "openvoice" and _HAS_OPENVOICE:
             # placeholder – deixamos hookado para quando vendorizar o OpenVoice
             return self._convert_openvoice_placeholder(src_audio, speaker_wav, out_wav)
         else:
-            return self._convert_prosody_match(src_audio, speaker_wav, out_wav, language, keep_sr, normalize)
+            return self._convert_prosody_match(src_audio, speaker_wav, out_wav, language, keep_sr, normalize,
+                                               progress, transcript)
 
     # -------------- Backend B (prosódia forçada) --------------
     def _convert_prosody_match(self,
@@ -117,113 +121,117 @@ class VCEngine:
                                out_wav: Path,
                                language: str,
                                keep_sr: bool,
-                               normalize: bool) -> Path:
+                               normalize: bool,
+                               progress: Callable[[int, int], None] | None = None,
+                               transcript: "Transcript | None" = None) -> Path:
         """
-        1) ASR com timestamps (faster-whisper) -> segmentos (start,end,text)
-        2) TTS XTTS por segmento (com sua voz-base) -> seg_tts.wav
-        3) Ajuste com ffmpeg atempo para cada segmento caber no intervalo original
-        4) Inserir silenços medidos entre segmentos
-        5) Concatenar tudo e ressamplar (opcional) para SR original
+        Pipeline em estágios sobrepostos:
+        1) ASR com timestamps (faster-whisper) numa thread produtora -> segmentos (start,end,text)
+           chegam numa fila à medida que são decodificados;
+        2) TTS XTTS por segmento (com sua voz-base), em memória, assim que cada um chega;
+        3) Time-stretch (WSOLA) + resample num pool de threads, enquanto o próximo segmento
+           é sintetizado;
+        4) Inserir silenços medidos entre segmentos e concatenar NA ORDEM no final.
+        progress(feitos, total): total = 0 enquanto o ASR ainda não terminou.
+        Com `transcript`, os segmentos vêm dele e o ASR não roda.
         """
         # a) preparar ASR: 16 kHz mono
         tmp_dir = Path(tempfile.mkdtemp(prefix="vc_s2s_"))
         try:
             src_16k = tmp_dir / "src16k.wav"
-            ensure_wav_mono_16000(src_audio, src_16k)
-
-            # b) rodar ASR com timestamps
-            try:
-                from faster_whisper import WhisperModel
-            except Exception as e:
-                raise RuntimeError("Instale 'faster-whisper' para S2S (pip install faster-whisper).") from e
-
-            model = WhisperModel("tiny", device="cpu", compute_type="int8")
-            segments, _info = model.transcribe(str(src_16k), task="transcribe", vad_filter=True)
-            segs = []
-            for seg in segments:
-                txt = (seg.text or "").strip()
-                start = float(seg.start)
-                end = float(seg.end)
-                if end > start and txt:
-                    segs.append((start, end, txt))
-
-            if not segs:
-                raise RuntimeError("ASR não retornou segmentos com texto. Tente um áudio mais limpo.")
-
-            # c) gerar TTS por segmento
-            xtts = XTTSEngine.instance()
-            seg_files_fit: list[Path] = []
+            if transcript is None:
+                ensure_wav_mono_16000(src_audio, src_16k)
 
             # SR de saída alvo
             if keep_sr:
-                # ler SR do original
-                with sf.SoundFile(str(src_audio), "r") as f:
-                    sr_out = int(f.samplerate)
+                # SR do original (metadados; funciona também com mp4/mov)
+                sr_out = probe(src_audio).sample_rate or SAMPLE_RATE
             else:
                 sr_out = SAMPLE_RATE  # 22050 (XTTS)
 
-            for i, (start, end, txt) in enumerate(segs):
-                # limpeza leve para evitar falar "ponto"
-                # usamos o caminho "inteligente" do XTTS que já trata pontuação final
-                seg_raw = tmp_dir / f"seg_raw_{i:03d}.wav"
-                seg_fit = tmp_dir / f"seg_fit_{i:03d}.wav"
-
-                # gerar com XTTS (usa sua voz-base) – pausa interna já é curta
-                xtts.synthesize_smart_to_file(
-                    text=txt,
-                    speaker_wav=speaker_wav,
-                    language=language,
-                    out_path=seg_raw,
-                    pause_ms=120
-                )
-
-                # d) forçar duração do segmento para caber em (end-start)
-                tts_dur = _read_duration(seg_raw)
-                target = max(0.06, end - start)  # não deixar alvo < 60 ms
-                factor = max(0.25, min(4.0, tts_dur / target))  # atempo factor
-
-                if abs(factor - 1.0) < 0.03:
-                    # quase igual: só copiar
-                    shutil.copyfile(seg_raw, seg_fit)
-                else:
-                    _ffmpeg_atempo(seg_raw, seg_fit, speed_factor=factor)
-
-                # garantir SR unificado
-                wav, sr = sf.read(str(seg_fit), dtype="float32")
-                if wav.ndim > 1:
-                    wav = wav[:, 0]
-                wav = _resample_to(wav, sr, sr_out)
-                # normalizar leve por segurança (evita clipping acumulado)
-                peak = float(np.max(np.abs(wav))) if wav.size else 0.0
-                if normalize and peak > 0.99:
-                    wav = 0.99 * wav / peak
-                # escrever de volta padronizado
-                sf.write(str(seg_fit), wav.astype(np.float32), sr_out, subtype="PCM_16")
-                seg_files_fit.append(seg_fit)
-
-            # e) concatenar com silenços medidos
-            # gaps: (start_next - end_current)
-            out_wave = []
-            for i, seg_path in enumerate(seg_files_fit):
-                wav, sr = sf.read(str(seg_path), dtype="float32")
-                if wav.ndim > 1:
-                    wav = wav[:, 0]
-                out_wave.append(wav.astype(np.float32))
-
-                if i < len(segs) - 1:
-                    gap = max(0.0, segs[i+1][0] - segs[i][1])
-                    if gap > 1e-3:
-                        gap_len = int(round(gap * sr_out))
-                        out_wave.append(np.zeros(gap_len, dtype=np.float32))
-
-            out_arr = np.concatenate(out_wave) if out_wave else np.zeros(1, dtype=np.float32)
-            # normalização de saída (-1 dBFS aprox)
-            if normalize and out_arr.size:
-                peak = float(np.max(np.abs(out_arr)))
-                if peak > 0.99:
-                    out_arr = 0.99 * out_arr / peak
-
-            sf.write(str(out_wav), out_arr.astype(np.float32), sr_out, subtype="PCM_16")
+            xtts = XTTSEngine.instance()
+            # latentes da voz calculados (ou lidos do disco) 1x para todos os segmentos
+            xtts.speaker_latents(speaker_wav)
+
+            # b) ASR em background (mesmo modelo/config do app, carregado 1x por processo)
+            seg_q: "queue.Queue[tuple[float, float, str] | None]" = queue.Queue()
+            asr_errors: list[BaseException] = []
+            asr_stop = Event()   # TTS/DSP falhou: o ASR para no próximo segmento
+
+            def asr_producer():
+                try:
+                    if transcript is not None:
+                        segments = ((s, e, t) for s, e, t in transcript.segments() if e > s and t)
+                    else:
+                        segments = _asr_engine().iter_segments(src_16k, vad_filter=True)
+                    for seg in segments:
+                        if asr_stop.is_set():
+                            break
+                        seg_q.put(seg)
+                except BaseException as e:
+                    asr_errors.append(e)
+                finally:
+                    seg_q.put(None)
+
+            # trace.bind: o ASR e o DSP (outras threads) entram no trace do job
+            producer = Thread(target=trace.bind(asr_producer), name="s2s-asr", daemon=True)
+            producer.start()
+
+            # c) TTS conforme os segmentos chegam; d) ajuste de duração no pool de DSP;
+            # e) cada trecho pronto (na ordem) é gravado direto no WAV de saída, com o
+            #    silêncio medido antes dele: a saída nunca fica inteira em memória
+            segs: list[tuple[float, float, str]] = []
+            futures: list[Future] = []
+            part_wav = tmp_dir / "out.wav"
+            writer = StreamingWavWriter(part_wav, sr_out)
+            written = 0
+
+            def flush(wait: bool) -> None:
+                nonlocal written
+                while written < len(futures) and (wait or futures[written].done()):
+                    if written > 0:
+                        gap = max(0.0, segs[written][0] - segs[written - 1][1])
+                        if gap > 1e-3:
+                            writer.append(np.zeros(int(round(gap * sr_out)), dtype=np.float32))
+                    writer.append(futures[written].result())
+                    futures[written] = None  # libera o trecho
+                    written += 1
+
+            try:
+                with ThreadPoolExecutor(max_workers=ThreadBudget.instance().dsp_threads(), thread_name_prefix="s2s-dsp") as dsp:
+                    while True:
+                        item = seg_q.get()
+                        if item is None:
+                            break
+                        start, end, txt = item
+                        # caminho "inteligente" do XTTS já trata pontuação final; pausa interna curta
+                        wav, sr = xtts.synthesize_smart_to_array(
+                            text=txt,
+                            speaker_wav=speaker_wav,
+                            language=language,
+                            pause_ms=120
+                        )
+                        segs.append(item)
+                        futures.append(dsp.submit(trace.bind(_fit_segment), wav, sr, end - start, sr_out, normalize))
+                        flush(wait=False)
+                        if progress is not None:
+                            progress(len(segs), 0)   # total só é conhecido quando o ASR termina
+
+                    if asr_errors:
+                        raise asr_errors[0]
+                    if not segs:
+                        raise RuntimeError("ASR não retornou segmentos com texto. Tente um áudio mais limpo.")
+                    flush(wait=True)
+                    if progress is not None:
+                        progress(len(segs), len(segs))
+            finally:
+                writer.close()
+                # o worker do pool vive muito: não deixa o ASR rodando depois de um erro
+                asr_stop.set()
+                producer.join()
+
+            # com normalize, cada trecho já sai com pico <= 0.99 (_fit_segment)
+            shutil.move(str(part_wav), str(out_wav))
             return out_wav
 
         finally:
@@ -0,0 +1,115 @@
+# app/engines/xtts_batch.py
+from __future__ import annotations
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+
+def bucket_by_length(lengths: list[int], batch_size: int) -> list[list[int]]:
+    """
+    Agrupa índices de segmentos com tamanho (em tokens) parecido, até batch_size por grupo.
+    Ordena por comprimento para minimizar o padding dentro de cada lote.
+    """
+    batch_size = max(1, int(batch_size))
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def tokenize(model, text: str, language: str) -> list[int]:
+    """Mesma tokenização que o Xtts.inference faz por sentença."""
+    lang = (language or "").split("-")[0]
+    return list(model.tokenizer.encode((text or "").strip().lower(), lang=lang))
+
+
+@torch.inference_mode()
+def infer_batch(
+    model,
+    token_lists: list[list[int]],
+    gpt_cond_latent: torch.Tensor,
+    speaker_embedding: torch.Tensor,
+    temperature: float = 0.75,
+    length_penalty: float = 1.0,
+    repetition_penalty: float = 10.0,
+    top_k: int = 50,
+    top_p: float = 0.85,
+) -> list[np.ndarray]:
+    """
+    Roda VÁRIOS segmentos juntos no decoder autoregressivo do GPT do XTTS.
+
+    - Prefixo de cada item: [latentes da voz | <start> texto <stop>] com padding À ESQUERDA
+      e attention_mask zerando o padding (o GPT do XTTS não usa embedding posicional
+      no transformer, então o deslocamento do padding não altera o resultado);
+    - A geração de códigos (parte cara) é feita em lote;
+    - O passe de latentes e o HiFi-GAN rodam por item (um forward só, barato),
+      cortando cada sequência no primeiro token de parada.
+    Retorna um wav float32 por item, na mesma ordem de token_lists.
+    """
+    gpt = model.gpt
+    device = gpt_cond_latent.device
+    n = len(token_lists)
+
+    # 1) embeddings de texto por item (start/stop + posição aprendida do texto)
+    text_embs = []
+    for toks in token_lists:
+        t = torch.tensor(toks, dtype=torch.long, device=device).unsqueeze(0)
+        t = F.pad(t, (0, 1), value=gpt.stop_text_token)
+        t = F.pad(t, (1, 0), value=gpt.start_text_token)
+        text_embs.append(gpt.text_embedding(t) + gpt.text_pos_embedding(t))
+
+    cond = gpt_cond_latent.to(device)
+    max_text = max(e.shape[1] for e in text_embs)
+    prefix_len = cond.shape[1] + max_text
+    dim = cond.shape[-1]
+
+    prefix = torch.zeros((n, prefix_len, dim), dtype=cond.dtype, device=device)
+    attn = torch.ones((n, prefix_len + 1), dtype=torch.long, device=device)
+    for i, emb in enumerate(text_embs):
+        pad = max_text - emb.shape[1]
+        prefix[i, pad:] = torch.cat([cond[0], emb[0]], dim=0)
+        attn[i, :pad] = 0
+
+    # 2) geração autoregressiva em lote
+    gpt.gpt_inference.store_prefix_emb(prefix)
+    gpt_inputs = torch.full((n, prefix_len + 1), fill_value=1, dtype=torch.long, device=device)
+    gpt_inputs[:, -1] = gpt.start_audio_token
+    gen = gpt.gpt_inference.generate(
+        gpt_inputs,
+        attention_mask=attn,
+        bos_token_id=gpt.start_audio_token,
+        pad_token_id=gpt.stop_audio_token,
+        eos_token_id=gpt.stop_audio_token,
+        max_length=gpt.max_gen_mel_tokens + gpt_inputs.shape[-1],
+        do_sample=True,
+        top_p=top_p,
+        top_k=top_k,
+        temperature=temperature,
+        num_return_sequences=1,
+        num_beams=1,
+        length_penalty=length_penalty,
+        repetition_penalty=repetition_penalty,
+        output_attentions=False,
+    )
+    codes = gen[:, gpt_inputs.shape[1]:]
+
+    # 3) latentes + vocoder por item (mantém o token de parada, como o Xtts.inference)
+    wavs: list[np.ndarray] = []
+    for i, toks in enumerate(token_lists):
+        row = codes[i]
+        stops = (row == gpt.stop_audio_token).nonzero()
+        n_codes = int(stops[0]) + 1 if len(stops) else int(row.shape[0])
+        item_codes = row[:n_codes].unsqueeze(0)
+
+        text_tokens = torch.tensor(toks, dtype=torch.int32, device=device).unsqueeze(0)
+        latents = gpt(
+            text_tokens,
+            torch.tensor([text_tokens.shape[-1]], device=device),
+            item_codes,
+            torch.tensor([item_codes.shape[-1] * gpt.code_stride_len], device=device),
+            cond_latents=cond,
+            return_attentions=False,
+            return_latent=True,
+        )
+        wav = model.hifigan_decoder(latents, g=speaker_embedding.to(device))
+        wavs.append(wav.detach().cpu().squeeze().numpy().astype(np.float32).reshape(-1))
+    return wavs
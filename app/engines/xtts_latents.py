@@ -0,0 +1,132 @@
+# app/engines/xtts_latents.py
+from __future__ import annotations
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+
+import torch
+
+from app.utils.hashing import file_sha1
+
+# Arquivo salvo ao lado do voice.json (data/voices/<id>/)
+LATENTS_FILENAME = "xtts_latents.pt"
+
+
+def _stat_key(path: Path) -> tuple[int, int]:
+    st = path.stat()
+    return int(st.st_size), int(st.st_mtime_ns)
+
+
+def _voice_dir_of(speaker_wav: Path) -> Path | None:
+    """
+    Se o speaker_wav é o clean.wav de uma voz-base (existe voice.json ao lado),
+    retorna a pasta da voz; senão None (cache só em memória).
+    """
+    vdir = speaker_wav.parent
+    return vdir if (vdir / "voice.json").exists() else None
+
+
+class SpeakerLatentCache:
+    """
+    Cache dos latentes de condicionamento do XTTS (gpt_cond_latent + speaker_embedding).
+    - Em memória: LRU com até `max_items` vozes;
+    - Em disco: `xtts_latents.pt` na pasta da voz (ao lado do voice.json);
+    - Invalidação: se o clean.wav mudar (tamanho/mtime e, na dúvida, SHA-1).
+    """
+
+    def __init__(self, model_name: str, max_items: int = 8):
+        self.model_name = model_name
+        self.max_items = max(1, int(max_items))
+        self._mem: "OrderedDict[tuple, tuple[torch.Tensor, torch.Tensor]]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, model, speaker_wav: Path, device: str = "cpu") -> tuple[torch.Tensor, torch.Tensor]:
+        speaker_wav = Path(speaker_wav).resolve()
+        size, mtime_ns = _stat_key(speaker_wav)
+        key = (str(speaker_wav), size, mtime_ns)
+
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None:
+                self._mem.move_to_end(key)
+                return hit
+
+            latents = self._load_from_disk(speaker_wav, size, mtime_ns, device)
+            if latents is None:
+                latents = self._compute(model, speaker_wav)
+                self._save_to_disk(speaker_wav, size, mtime_ns, latents)
+
+            # descarta entradas antigas do mesmo arquivo (clean.wav mudou)
+            for old in [k for k in self._mem if k[0] == key[0]]:
+                del self._mem[old]
+            self._mem[key] = latents
+            while len(self._mem) > self.max_items:
+                self._mem.popitem(last=False)
+            return latents
+
+    def invalidate(self, speaker_wav: Path) -> None:
+        """Remove a voz do cache (memória e disco)."""
+        speaker_wav = Path(speaker_wav).resolve()
+        with self._lock:
+            for old in [k for k in self._mem if k[0] == str(speaker_wav)]:
+                del self._mem[old]
+            vdir = _voice_dir_of(speaker_wav)
+            if vdir is not None:
+                try:
+                    (vdir / LATENTS_FILENAME).unlink()
+                except FileNotFoundError:
+                    pass
+
+    # -------------- interno --------------
+    def _compute(self, model, speaker_wav: Path) -> tuple[torch.Tensor, torch.Tensor]:
+        cfg = getattr(model, "config", None)
+        print(f"[XTTS] Calculando latentes da voz: {speaker_wav}")
+        gpt_cond_latent, speaker_embedding = model.get_conditioning_latents(
+            audio_path=[str(speaker_wav)],
+            gpt_cond_len=getattr(cfg, "gpt_cond_len", 30),
+            gpt_cond_chunk_len=getattr(cfg, "gpt_cond_chunk_len", 4),
+            max_ref_length=getattr(cfg, "max_ref_len", 30),
+            sound_norm_refs=getattr(cfg, "sound_norm_refs", False),
+        )
+        return gpt_cond_latent, speaker_embedding
+
+    def _load_from_disk(self, speaker_wav: Path, size: int, mtime_ns: int, device: str):
+        vdir = _voice_dir_of(speaker_wav)
+        if vdir is None:
+            return None
+        path = vdir / LATENTS_FILENAME
+        if not path.exists():
+            return None
+        try:
+            rec = torch.load(str(path), map_location="cpu")
+            if rec.get("model") != self.model_name:
+                return None
+            src = rec.get("source") or {}
+            if (src.get("size"), src.get("mtime_ns")) != (size, mtime_ns):
+                # mtime mudou (cópia/restauração?) – confere pelo conteúdo
+                if src.get("sha1") != file_sha1(speaker_wav):
+                    return None
+                self._save_to_disk(speaker_wav, size, mtime_ns,
+                                   (rec["gpt_cond_latent"], rec["speaker_embedding"]))
+            return rec["gpt_cond_latent"].to(device), rec["speaker_embedding"].to(device)
+        except Exception as e:
+            print(f"[XTTS] Cache de latentes ignorado ({path}): {e}")
+            return None
+
+    def _save_to_disk(self, speaker_wav: Path, size: int, mtime_ns: int, latents) -> None:
+        vdir = _voice_dir_of(speaker_wav)
+        if vdir is None:
+            return
+        gpt_cond_latent, speaker_embedding = latents
+        rec = {
+            "model": self.model_name,
+            "source": {"size": size, "mtime_ns": mtime_ns, "sha1": file_sha1(speaker_wav)},
+            "gpt_cond_latent": gpt_cond_latent.detach().cpu(),
+            "speaker_embedding": speaker_embedding.detach().cpu(),
+        }
+        tmp = vdir / (LATENTS_FILENAME + ".tmp")
+        try:
+            torch.save(rec, str(tmp))
+            tmp.replace(vdir / LATENTS_FILENAME)
+        except Exception as e:
+            print(f"[XTTS] Falha ao salvar latentes em {vdir}: {e}")
@@ -0,0 +1,209 @@
+# app/engines/xtts_optimize.py
+"""
+Backends otimizados do XTTS-v2 para CPU (DUBBER_XTTS_BACKEND):
+
+- "int8": quantização dinâmica int8 (pesos int8, ativações quantizadas por lote) das
+  camadas lineares do transformer GPT e da cabeça de mel, que geram os códigos token a
+  token e dominam o tempo por frase. O condicionamento da voz (perceiver/encoder) fica
+  em fp32, então os latentes salvos em xtts_latents.pt continuam válidos.
+- "onnx": o gerador HiFi-GAN (hifigan_decoder.waveform_decoder: latentes -> onda)
+  exportado 1x para ONNX e executado no ONNX Runtime (pip install onnxruntime). O resto
+  do hifigan_decoder fica no torch, inclusive o speaker_encoder que o Coqui usa em
+  get_conditioning_latents() para vozes ainda sem latentes em cache.
+
+Tudo é aplicado no lugar, no modelo já carregado. Se um passo falhar, o modelo segue
+como estava (fp32) para aquele passo. A qualidade é medida por bench/xtts_quality.py.
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import Set
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from app.config import XTTS_ONNX_DIR
+
+BACKENDS = ("int8", "onnx")
+
+
+def parse_backend(spec: str) -> Set[str]:
+    """'int8+onnx' -> {'int8', 'onnx'}; 'fp32'/'' -> set(). ValueError se desconhecido."""
+    parts = {p.strip() for p in (spec or "").replace(",", "+").split("+")} - {"", "fp32"}
+    unknown = parts - set(BACKENDS)
+    if unknown:
+        raise ValueError(f"Backend do XTTS desconhecido: {', '.join(sorted(unknown))} "
+                         f"(use fp32, int8, onnx ou int8+onnx)")
+    return parts
+
+
+def _model_tag() -> str:
+    """Nome do .onnx exportado: muda junto com a versão do Coqui (pesos/grafo podem mudar)."""
+    import TTS as _coqui
+    return f"xtts_v2-{getattr(_coqui, '__version__', '0')}"
+
+
+def apply_backend(model, spec: str, device: str) -> str:
+    """Aplica o backend pedido ao modelo Xtts. Retorna o que foi de fato aplicado ('fp32' se nada)."""
+    parts = parse_backend(spec)
+    if not parts:
+        return "fp32"
+    if model is None or not hasattr(model, "gpt"):
+        print("[XTTS-OPT] Modelo sem GPT exposto nesta versão do Coqui; seguindo em fp32.")
+        return "fp32"
+    if device != "cpu":
+        print(f"[XTTS-OPT] Backend '{spec}' é só para CPU (device={device}); ignorado.")
+        return "fp32"
+
+    applied = []
+    if "int8" in parts:
+        try:
+            n = quantize_gpt_int8(model)
+            applied.append("int8")
+            print(f"[XTTS-OPT] GPT quantizado em int8 ({n} camadas lineares).")
+        except Exception as e:
+            print(f"[XTTS-OPT] Quantização int8 falhou ({e}); GPT segue em fp32.")
+    if "onnx" in parts:
+        try:
+            path = use_onnx_decoder(model, XTTS_ONNX_DIR / f"{_model_tag()}-hifigan-waveform.onnx")
+            applied.append("onnx")
+            print(f"[XTTS-OPT] Decoder no ONNX Runtime ({path.name}).")
+        except Exception as e:
+            print(f"[XTTS-OPT] Decoder ONNX indisponível ({e}); segue no PyTorch.")
+    return "+".join(applied) or "fp32"
+
+
+# ---------------- int8 dinâmico ----------------
+
+def _conv1d_to_linear(module: nn.Module) -> int:
+    """
+    O GPT-2 do transformers usa `Conv1D` (peso [in, out]) em vez de nn.Linear; a
+    quantização dinâmica só reconhece nn.Linear. Troca no lugar, mesmo cálculo.
+    """
+    n = 0
+    for name, child in list(module.named_children()):
+        if type(child).__name__ == "Conv1D" and hasattr(child, "nf"):
+            lin = nn.Linear(child.weight.shape[0], child.nf, bias=child.bias is not None)
+            with torch.no_grad():
+                lin.weight.copy_(child.weight.t())
+                if child.bias is not None:
+                    lin.bias.copy_(child.bias)
+            setattr(module, name, lin)
+            n += 1
+        else:
+            n += _conv1d_to_linear(child)
+    return n
+
+
+def _select_quant_engine() -> None:
+    """fbgemm (x86) quando existe; senão qnnpack (ARM, ex.: Apple Silicon)."""
+    engines = torch.backends.quantized.supported_engines
+    if "fbgemm" in engines:
+        torch.backends.quantized.engine = "fbgemm"
+    elif "qnnpack" in engines:
+        torch.backends.quantized.engine = "qnnpack"
+
+
+def quantize_gpt_int8(model) -> int:
+    """
+    Quantiza o transformer do GPT (compartilhado com o gpt_inference usado na geração)
+    e a lm_head da geração. Retorna quantas nn.Linear foram quantizadas.
+    """
+    from torch.ao.quantization import quantize_dynamic
+
+    _select_quant_engine()
+    gpt = model.gpt
+    _conv1d_to_linear(gpt.gpt)
+    targets = [gpt.gpt]
+    lm_head = getattr(getattr(gpt, "gpt_inference", None), "lm_head", None)
+    if lm_head is not None:
+        targets.append(lm_head)
+    n = sum(1 for t in targets for m in t.modules() if type(m) is nn.Linear)
+    for t in targets:
+        quantize_dynamic(t, {nn.Linear}, dtype=torch.qint8, inplace=True)
+    return n
+
+
+# ---------------- decoder no ONNX Runtime ----------------
+
+class _DecoderExport(nn.Module):
+    """Assinatura fixa (latents, g) para o export."""
+
+    def __init__(self, decoder: nn.Module):
+        super().__init__()
+        self.decoder = decoder
+
+    def forward(self, latents: torch.Tensor, g: torch.Tensor) -> torch.Tensor:
+        return self.decoder(latents, g=g)
+
+
+class OrtHifiDecoder(nn.Module):
+    """
+    Substituto do hifigan_decoder.waveform_decoder: mesma chamada (z, g=...), roda no
+    ONNX Runtime. É um nn.Module só para poder ocupar o lugar do submódulo original.
+    """
+
+    def __init__(self, onnx_path: Path, threads: int = 1):
+        super().__init__()
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = max(1, int(threads))
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(onnx_path), opts, providers=["CPUExecutionProvider"])
+        self.onnx_path = Path(onnx_path)
+
+    def forward(self, latents: torch.Tensor, g: torch.Tensor | None = None) -> torch.Tensor:
+        if g is None:
+            # o grafo exportado sempre recebe o embedding do locutor
+            raise ValueError("OrtHifiDecoder precisa do embedding do locutor (g).")
+        feeds = {
+            "latents": latents.detach().float().cpu().numpy(),
+            "g": g.detach().float().cpu().numpy(),
+        }
+        wav = self.session.run(["wav"], feeds)[0]
+        return torch.from_numpy(np.ascontiguousarray(wav))
+
+
+def export_hifigan_onnx(model, onnx_path: Path) -> Path:
+    """
+    Exporta hifigan_decoder.waveform_decoder (eixos de lote e de tempo dinâmicos). Grava atômico.
+    A entrada é a do gerador: latentes já interpolados pelo HifiDecoder, (lote, canais, quadros).
+    """
+    dec = model.hifigan_decoder.waveform_decoder
+    args = getattr(model, "args", None)
+    channels = int(getattr(args, "gpt_n_model_channels", 1024))
+    d_vector = int(getattr(args, "d_vector_dim", 512))
+    latents = torch.randn(1, channels, 256)
+    g = torch.randn(1, d_vector, 1)
+
+    onnx_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = onnx_path.with_suffix(".tmp")
+    with torch.no_grad():   # (o trace do export não funciona sob inference_mode)
+        torch.onnx.export(
+            _DecoderExport(dec).eval(), (latents, g), str(tmp),
+            input_names=["latents", "g"], output_names=["wav"],
+            dynamic_axes={"latents": {0: "batch", 2: "frames"}, "g": {0: "batch"},
+                          "wav": {0: "batch", 2: "samples"}},
+            opset_version=17,
+        )
+    tmp.replace(onnx_path)
+    return onnx_path
+
+
+def use_onnx_decoder(model, onnx_path: Path) -> Path:
+    """
+    Exporta (se ainda não existir) e troca o gerador do decoder pelo do ONNX Runtime.
+    Só o waveform_decoder é trocado: hifigan_decoder.speaker_encoder continua no torch.
+    """
+    import onnxruntime  # noqa: F401  (falha cedo, antes de exportar, se não estiver instalado)
+    from app.threads import ThreadBudget
+
+    dec = model.hifigan_decoder
+    if isinstance(dec.waveform_decoder, OrtHifiDecoder):
+        return dec.waveform_decoder.onnx_path
+    if not onnx_path.exists():
+        print(f"[XTTS-OPT] Exportando decoder para ONNX (1x): {onnx_path}")
+        export_hifigan_onnx(model, onnx_path)
+    dec.waveform_decoder = OrtHifiDecoder(onnx_path, threads=ThreadBudget.instance().torch_threads())
+    return onnx_path
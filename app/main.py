@@ -1,5 +1,7 @@
 import threading
-import multiprocessing as mp
+import queue
+import shutil
+import sys
 from pathlib import Path
 import tkinter as tk
 import customtkinter as ctk
@@ -7,43 +9,54 @@ from tkinter import filedialog, messagebox, simpledialog
 import subprocess
 
 from app.config import (
-    VOICES_DIR, LANG_DEFAULT, LOGS_DIR,
-    EXPORT_MP3_DEFAULT, MP3_BITRATE
+    VOICES_DIR, LANG_DEFAULT,
+    EXPORT_MP3_DEFAULT, MP3_BITRATE, WARMUP, METRICS_PORT
 )
 from app.voice_manager import VoiceManager, BaseVoice
-from app.engines.tts_xtts import XTTSEngine
-# ASR (estável em mac Intel): Whisper PyTorch
-from app.engines.asr_openai import ASREngine
 
 from app.utils.projects import new_job_dir
-from app.audio.utils import ensure_wav_mono_16000
-from app.audio.post import apply_speed_pitch, wav_to_mp3  # sem stretch_to_duration
-from app.engines.vc_s2s import VCEngine
-
-
-# ========= subprocesso para S2S (isola libs nativas e evita crash no processo principal) =========
-def _vc_convert_child(src: str, speaker: str, out_wav: str, language: str):
-    """Roda a conversão voz->voz em outro processo (spawn)."""
-    try:
-        from pathlib import Path as _Path
-        from app.engines.vc_s2s import VCEngine as _VCEngine
-        vc = _VCEngine.instance()
-        vc.convert(
-            src_audio=_Path(src),
-            speaker_wav=_Path(speaker),
-            out_wav=_Path(out_wav),
-            language=language,
-            keep_sr=True,
-            normalize=True
-        )
-    except Exception as e:
-        # registra stacktrace do filho
-        try:
-            LOGS_DIR.mkdir(parents=True, exist_ok=True)
-            (_Path(LOGS_DIR) / "s2s_child.log").write_text(str(e), encoding="utf-8")
-        except Exception:
-            pass
-        raise
+from app.audio.stream import StreamingWavWriter
+from app.engines.asr_parallel import ASRReplicaPool
+from app.engines.s2s_pool import S2SWorkerPool
+from app.scheduler import JobScheduler
+from app import trace, warmup
+
+# prioridade dos cliques na GUI (jobs do CLI/retomados entram com 0)
+_GUI_PRIORITY = 10
+
+
+# ========= preview progressivo: toca cada segmento enquanto os próximos são gerados =========
+class _ChunkPreviewPlayer:
+    """Fila de segmentos tocados em sequência (afplay) numa thread própria."""
+
+    def __init__(self, tmp_dir: Path):
+        self.tmp_dir = tmp_dir
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self._q: "queue.Queue[Path | None]" = queue.Queue()
+        self._n = 0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def play(self, wav, sr: int):
+        f = self.tmp_dir / f"chunk_{self._n:03d}.wav"
+        self._n += 1
+        with StreamingWavWriter(f, sr) as w:
+            w.append(wav)
+        self._q.put(f)
+
+    def finish(self):
+        """Sem mais segmentos: termina de tocar o que está na fila e limpa a pasta."""
+        self._q.put(None)
+
+    def _run(self):
+        while True:
+            f = self._q.get()
+            if f is None:
+                break
+            try:
+                subprocess.run(["afplay", str(f)], check=False)
+            except Exception:
+                pass
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
 
 
 class DubberApp(ctk.CTk):
@@ -56,8 +69,6 @@ class DubberApp(ctk.CTk):
         ctk.set_default_color_theme("green")
 
         self.vm = VoiceManager()
-        self.xtts = None   # carregado sob demanda
-        self.asr = None    # carregado sob demanda
 
         # Guarda o último job da aba Áudio→Voz (para reaproveitar pasta)
         self.asr_current_job_dir = None
@@ -69,9 +80,19 @@ class DubberApp(ctk.CTk):
         self.last_out = None
         self.last_dir = None
 
+        # engines carregam no 1º uso; o provável próximo é pré-carregado depois que a janela aparece
+        self.after(300, self._start_warmup)
+
+        # GET /metrics local (opcional, DUBBER_METRICS_PORT)
+        if METRICS_PORT:
+            try:
+                trace.serve_metrics(METRICS_PORT)
+            except OSError as e:
+                print(f"[TRACE] porta {METRICS_PORT} indisponível para /metrics: {e}")
+
     # =============== UI ===============
     def _build_ui(self):
-        self.tabs = ctk.CTkTabview(self)
+        self.tabs = ctk.CTkTabview(self, command=self._on_tab_changed)
         self.tabs.pack(fill="both", expand=True, padx=12, pady=12)
 
         self.tab_voices = self.tabs.add("Vozes")
@@ -127,7 +148,10 @@ class DubberApp(ctk.CTk):
         ctk.CTkEntry(row1b, textvariable=self.pitch_var_tts, width=70).pack(side="left", padx=(0, 20))
 
         self.mp3_var_tts = tk.BooleanVar(value=EXPORT_MP3_DEFAULT)
-        ctk.CTkCheckBox(row1b, text=f"Salvar MP3 ({MP3_BITRATE})", variable=self.mp3_var_tts).pack(side="left")
+        ctk.CTkCheckBox(row1b, text=f"Salvar MP3 ({MP3_BITRATE})", variable=self.mp3_var_tts).pack(side="left", padx=(0, 20))
+
+        self.stream_var_tts = tk.BooleanVar(value=False)
+        ctk.CTkCheckBox(row1b, text="Preview durante a geração", variable=self.stream_var_tts).pack(side="left")
 
         # texto
         row2 = ctk.CTkFrame(wrap)
@@ -219,6 +243,22 @@ class DubberApp(ctk.CTk):
         else:
             self._on_generate_from_text()
 
+    # =============== Warm-up dos engines ===============
+    def _start_warmup(self):
+        for target, backend in warmup.guess_next(asr_backend="openai"):
+            warmup.warm(target, backend)
+
+    def _on_tab_changed(self):
+        """Em DUBBER_WARMUP=auto, abrir uma aba de dublagem pré-carrega o engine dela."""
+        if WARMUP != "auto":
+            return
+        tab = self.tabs.get()
+        if tab == "Dublagem (Texto → Voz)":
+            warmup.warm("xtts")
+        elif tab == "Dublagem (Áudio → Voz)":
+            mode = (self.mode_var.get() or "").lower()
+            warmup.warm("s2s" if mode.startswith("s2s") else "xtts")
+
     # =============== Vozes ===============
     def _refresh_voice_list(self):
         for w in self.list_container.winfo_children():
@@ -262,24 +302,22 @@ class DubberApp(ctk.CTk):
         ctk.CTkLabel(card, text=f"Arquivos: raw={voice.raw_path}  |  clean={voice.clean_wav}").pack(anchor="w", padx=10, pady=(0, 10))
 
     def _refresh_voice_dropdowns(self):
-        def make_choices():
-            mapping = {}
-            vals = []
-            for v in self.vm.list_voices():
-                label = f"{v.name} ({v.id})"
-                mapping[label] = v.id
-                vals.append(label)
-            if not vals:
-                vals = ["— sem vozes —"]
-            return mapping, vals
-
-        self.voice_name_by_id_tts, choices1 = make_choices()
-        self.voice_select_tts.configure(values=choices1)
-        self.voice_choice_tts.set(choices1[0])
-
-        self.voice_name_by_id_asr, choices2 = make_choices()
-        self.voice_select_asr.configure(values=choices2)
-        self.voice_choice_asr.set(choices2[0])
+        mapping = {}
+        vals = []
+        for v in self.vm.list_voices():
+            label = f"{v.name} ({v.id})"
+            mapping[label] = v.id
+            vals.append(label)
+        if not vals:
+            vals = ["— sem vozes —"]
+
+        self.voice_name_by_id_tts = dict(mapping)
+        self.voice_select_tts.configure(values=vals)
+        self.voice_choice_tts.set(vals[0])
+
+        self.voice_name_by_id_asr = dict(mapping)
+        self.voice_select_asr.configure(values=vals)
+        self.voice_choice_asr.set(vals[0])
 
     def _on_add_voice(self):
         fpath = filedialog.askopenfilename(
@@ -293,27 +331,42 @@ class DubberApp(ctk.CTk):
         if not name:
             name = "Voz"
 
-        def worker():
-            try:
-                voice = self.vm.add_voice_from_file(Path(fpath), display_name=name)
-                self.after(0, lambda: (
-                    messagebox.showinfo("OK", f"Voz adicionada: {voice.name}"),
-                    self._refresh_voice_list(),
-                    self._refresh_voice_dropdowns()
-                ))
-            except Exception as e:
-                import traceback, sys
-                tb = traceback.format_exc(); print(tb, file=sys.stderr)
-                try:
-                    LOGS_DIR.mkdir(parents=True, exist_ok=True)
-                    (LOGS_DIR / "runtime.log").write_text(tb, encoding="utf-8")
-                except Exception:
-                    pass
-                self.after(0, lambda err=e: messagebox.showerror("Erro", str(err)))
-
-        threading.Thread(target=worker, daemon=True).start()
+        def done(res):
+            self._refresh_voice_list()
+            self._refresh_voice_dropdowns()
+            messagebox.showinfo("OK", f"Voz adicionada: {res.get('name')}")
+
+        self._submit_job("voice_add", {"src": str(fpath), "name": name},
+                         on_done=done,
+                         on_error=lambda err: messagebox.showerror("Erro", err))
 
     # =============== Helpers ===============
+    def _submit_job(self, kind: str, payload: dict, on_done, on_error, on_progress=None, hooks=None) -> int:
+        """
+        Enfileira no JobScheduler (1 job por engine de cada vez; sobrevive a reinícios).
+        Callbacks rodam na thread da UI; erros vão para logs/runtime.log.
+        """
+        sched = JobScheduler.instance()
+        job_id = None
+
+        def _err(msg):
+            job = sched.get(job_id) if job_id is not None else None
+            tb = (job.error if job else None) or msg
+            print(tb, file=sys.stderr)
+            trace.append_log("runtime.log", tb, job=job_id, kind=kind)
+            self.after(0, lambda: on_error(msg))
+
+        job_id = sched.submit(
+            kind, payload, priority=_GUI_PRIORITY,
+            on_done=lambda res: self.after(0, lambda: on_done(res)),
+            on_error=_err,
+            on_progress=(lambda d, t: self.after(0, lambda: on_progress(d, t))) if on_progress else None,
+            hooks=hooks,
+        )
+        if sched.active_engines():
+            print(f"[JOBS] #{job_id} {kind} na fila (ativos: {sched.active_engines()})")
+        return job_id
+
     def _parse_speed_pitch(self, speed_str: str, pitch_str: str):
         # speed em [0.5, 1.5], pitch em [-12, +12] (usaremos -6..+6 na UI)
         try:
@@ -350,60 +403,56 @@ class DubberApp(ctk.CTk):
         lang = self.lang_var_tts.get().strip() or LANG_DEFAULT
         speed, semitones = self._parse_speed_pitch(self.speed_var_tts.get(), self.pitch_var_tts.get())
         save_mp3 = bool(self.mp3_var_tts.get())
+        stream_preview = bool(self.stream_var_tts.get())
 
         self.btn_gen.configure(state="disabled")
         self.status_var.set("Gerando áudio...")
 
-        def worker():
+        job_dir = new_job_dir(prefix="tts")
+        hooks = {}
+        player = None
+        if stream_preview:
+            # toca cada segmento (sem speed/pitch) assim que fica pronto
+            player = _ChunkPreviewPlayer(job_dir / "_preview")
+
+            def on_chunk(wav, sr, i):
+                player.play(wav, sr)
+                if i == 0:
+                    self.after(0, lambda: self.status_var.set("Tocando prévia enquanto gera o restante..."))
+            hooks["on_chunk"] = on_chunk
+
+        def on_progress(done_n, total):
+            if total:
+                self.status_var.set(f"Gerando áudio... {done_n}/{total} trechos")
+
+        def done(res):
+            if player is not None:
+                player.finish()
+            final_wav = Path(res["wav"])
+            self.last_out = final_wav
+            self.last_dir = job_dir
+            self.btn_play.configure(state="normal")
+            self.btn_open.configure(state="normal")
+            self.btn_gen.configure(state="normal")
+            self.status_var.set(f"Áudio gerado: {final_wav.name}{' (+ MP3)' if save_mp3 else ''}")
+            if stream_preview:
+                return  # já foi ouvido durante a geração
             try:
-                if self.xtts is None:
-                    self.xtts = XTTSEngine.instance()
-
-                job_dir = new_job_dir(prefix="tts")
-                raw_path = job_dir / "raw.wav"
-                final_wav = job_dir / "tts.wav"
-
-                # 1) síntese base (modo 'smart' que limpa pontuação final)
-                self.xtts.synthesize_smart_to_file(text, Path(voice.clean_wav), lang, raw_path, pause_ms=180)
-
-                # 2) pós-processamento (speed/pitch — opcional)
-                if abs(speed - 1.0) > 1e-6 or semitones != 0:
-                    apply_speed_pitch(raw_path, final_wav, speed=speed, semitones=semitones)
-                else:
-                    raw_path.rename(final_wav)
-
-                # 3) MP3 opcional
-                if save_mp3:
-                    wav_to_mp3(final_wav, job_dir / "tts.mp3")
-
-                def done():
-                    self.last_out = final_wav
-                    self.last_dir = job_dir
-                    self.btn_play.configure(state="normal")
-                    self.btn_open.configure(state="normal")
-                    self.btn_gen.configure(state="normal")
-                    self.status_var.set(f"Áudio gerado: {final_wav.name}{' (+ MP3)' if save_mp3 else ''}")
-                    try:
-                        subprocess.Popen(["afplay", str(final_wav)])
-                    except Exception:
-                        pass
-                self.after(0, done)
-
-            except Exception as e:
-                import traceback, sys
-                tb = traceback.format_exc(); print(tb, file=sys.stderr)
-                try:
-                    LOGS_DIR.mkdir(parents=True, exist_ok=True)
-                    (LOGS_DIR / "runtime.log").write_text(tb, encoding="utf-8")
-                except Exception:
-                    pass
-                self.after(0, lambda err=e: (
-                    self.btn_gen.configure(state="normal"),
-                    self.status_var.set("Erro ao gerar."),
-                    messagebox.showerror("Erro", str(err))
-                ))
-
-        threading.Thread(target=worker, daemon=True).start()
+                subprocess.Popen(["afplay", str(final_wav)])
+            except Exception:
+                pass
+
+        def failed(err):
+            if player is not None:
+                player.finish()
+            self.btn_gen.configure(state="normal")
+            self.status_var.set("Erro ao gerar.")
+            messagebox.showerror("Erro", err)
+
+        self._submit_job("tts", {
+            "text": text, "voice": voice.id, "language": lang, "out_dir": str(job_dir),
+            "speed": speed, "semitones": semitones, "mp3": save_mp3, "pause_ms": 180,
+        }, on_done=done, on_error=failed, on_progress=on_progress, hooks=hooks)
 
     # =============== Áudio→Voz: Transcrever / Gerar ===============
     def _on_pick_asr_file(self):
@@ -422,51 +471,26 @@ class DubberApp(ctk.CTk):
 
         self.btn_transcribe.configure(state="disabled")
         self.btn_generate_from_text.configure(state="disabled")
-        self.status_var2.set("Carregando modelo ASR (pode demorar na primeira vez)...")
-
-        def worker():
-            try:
-                if self.asr is None:
-                    self.asr = ASREngine.instance()
-
-                # prepara job e converte p/ 16 kHz mono (padrão bom p/ ASR)
-                src_path = Path(src)
-                job_dir = new_job_dir(prefix="asr-tts")
-                tmp_src = job_dir / "source.wav"
-
-                self.after(0, lambda: self.status_var2.set("Preparando áudio (16 kHz, mono)..."))
-                ensure_wav_mono_16000(src_path, tmp_src)
-
-                # transcrever
-                self.after(0, lambda: self.status_var2.set("Transcrevendo..."))
-                result = self.asr.transcribe(tmp_src)
-                text = (result.get("text") or "").strip()
-
-                def done_tx():
-                    self.asr_current_job_dir = job_dir
-                    self.asr_text_box.delete("1.0", "end")
-                    self.asr_text_box.insert("1.0", text)
-                    self.btn_transcribe.configure(state="normal")
-                    self.btn_generate_from_text.configure(state="normal" if text else "disabled")
-                    self.status_var2.set("Transcrição pronta. Revise/edite o texto e clique em “Gerar dublagem”.")
-                self.after(0, done_tx)
-
-            except Exception as e:
-                import traceback, sys
-                tb = traceback.format_exc(); print(tb, file=sys.stderr)
-                try:
-                    LOGS_DIR.mkdir(parents=True, exist_ok=True)
-                    (LOGS_DIR / "runtime.log").write_text(tb, encoding="utf-8")
-                except Exception:
-                    pass
-                self.after(0, lambda err=e: (
-                    self.btn_transcribe.configure(state="normal"),
-                    self.btn_generate_from_text.configure(state="disabled"),
-                    self.status_var2.set("Erro ao transcrever."),
-                    messagebox.showerror("Erro", str(err))
-                ))
-
-        threading.Thread(target=worker, daemon=True).start()
+        self.status_var2.set("Transcrevendo (o modelo ASR pode demorar na primeira vez)...")
+
+        def done_tx(res):
+            text = res.get("text") or ""
+            self.asr_current_job_dir = Path(res["job_dir"])
+            self.asr_text_box.delete("1.0", "end")
+            self.asr_text_box.insert("1.0", text)
+            self.btn_transcribe.configure(state="normal")
+            self.btn_generate_from_text.configure(state="normal" if text else "disabled")
+            self.status_var2.set("Transcrição pronta. Revise/edite o texto e clique em “Gerar dublagem”.")
+
+        def failed(err):
+            self.btn_transcribe.configure(state="normal")
+            self.btn_generate_from_text.configure(state="disabled")
+            self.status_var2.set("Erro ao transcrever.")
+            messagebox.showerror("Erro", err)
+
+        # ASR (estável em mac Intel): Whisper PyTorch
+        self._submit_job("transcribe", {"src": src, "asr_backend": "openai"},
+                         on_done=done_tx, on_error=failed)
 
     def _on_generate_from_text(self):
         label = self.voice_choice_asr.get()
@@ -492,59 +516,35 @@ class DubberApp(ctk.CTk):
         self.btn_generate_from_text.configure(state="disabled")
         self.status_var2.set("Gerando dublagem com TTS...")
 
-        def worker():
+        job_dir = self.asr_current_job_dir or new_job_dir(prefix="asr-tts")
+
+        def on_progress(done_n, total):
+            if total:
+                self.status_var2.set(f"Gerando dublagem com TTS... {done_n}/{total} trechos")
+
+        def done(res):
+            final_wav = Path(res["wav"])
+            self.last_out = final_wav
+            self.last_dir = job_dir
+            self.btn_play2.configure(state="normal"); self.btn_open2.configure(state="normal")
+            self.btn_play.configure(state="normal");  self.btn_open.configure(state="normal")
+            self.btn_generate_from_text.configure(state="normal")
+            self.status_var2.set(f"Dublagem gerada: {final_wav.name}{' (+ MP3)' if save_mp3 else ''}")
             try:
-                if self.xtts is None:
-                    self.xtts = XTTSEngine.instance()
-
-                job_dir = self.asr_current_job_dir or new_job_dir(prefix="asr-tts")
-                raw_path = job_dir / "raw.wav"
-                final_wav = job_dir / "dubbing.wav"
-
-                # 1) síntese base (modo smart recomendado)
-                self.xtts.synthesize_smart_to_file(text, Path(voice.clean_wav), lang_tts, raw_path, pause_ms=180)
-
-                # 2) pós-processamento
-                if abs(speed - 1.0) > 1e-6 or semitones != 0:
-                    apply_speed_pitch(raw_path, final_wav, speed=speed, semitones=semitones)
-                else:
-                    raw_path.rename(final_wav)
-
-                # 3) MP3 opcional
-                if save_mp3:
-                    wav_to_mp3(final_wav, job_dir / "dubbing.mp3")
-
-                # 4) salva texto
-                (job_dir / "transcript.txt").write_text(text, encoding="utf-8")
-
-                def done():
-                    self.last_out = final_wav
-                    self.last_dir = job_dir
-                    self.btn_play2.configure(state="normal"); self.btn_open2.configure(state="normal")
-                    self.btn_play.configure(state="normal");  self.btn_open.configure(state="normal")
-                    self.btn_generate_from_text.configure(state="normal")
-                    self.status_var2.set(f"Dublagem gerada: {final_wav.name}{' (+ MP3)' if save_mp3 else ''}")
-                    try:
-                        subprocess.Popen(["afplay", str(final_wav)])
-                    except Exception:
-                        pass
-                self.after(0, done)
-
-            except Exception as e:
-                import traceback, sys
-                tb = traceback.format_exc(); print(tb, file=sys.stderr)
-                try:
-                    LOGS_DIR.mkdir(parents=True, exist_ok=True)
-                    (LOGS_DIR / "runtime.log").write_text(tb, encoding="utf-8")
-                except Exception:
-                    pass
-                self.after(0, lambda err=e: (
-                    self.btn_generate_from_text.configure(state="normal"),
-                    self.status_var2.set("Erro ao gerar."),
-                    messagebox.showerror("Erro", str(err))
-                ))
-
-        threading.Thread(target=worker, daemon=True).start()
+                subprocess.Popen(["afplay", str(final_wav)])
+            except Exception:
+                pass
+
+        def failed(err):
+            self.btn_generate_from_text.configure(state="normal")
+            self.status_var2.set("Erro ao gerar.")
+            messagebox.showerror("Erro", err)
+
+        self._submit_job("tts", {
+            "text": text, "voice": voice.id, "language": lang_tts, "out_dir": str(job_dir),
+            "out_name": "dubbing", "save_text": True, "incremental": True,
+            "speed": speed, "semitones": semitones, "mp3": save_mp3, "pause_ms": 180,
+        }, on_done=done, on_error=failed, on_progress=on_progress)
 
     def _on_convert_s2s(self):
         # usa o arquivo de origem e a voz-base selecionada; ignora texto
@@ -569,56 +569,35 @@ class DubberApp(ctk.CTk):
         self.btn_generate_from_text.configure(state="disabled")
         self.status_var2.set("Convertendo voz (S2S)…")
 
-        def worker():
+        job_dir = self.asr_current_job_dir or new_job_dir(prefix="asr-tts")
+
+        # roda a conversão no pool de processos (modelos já carregados após o 1º job)
+        def on_progress(done_n, total):
+            count = f"{done_n}/{total}" if total else f"{done_n}"
+            self.status_var2.set(f"Convertendo voz (S2S)… {count} trechos")
+
+        def done(res):
+            final_wav = Path(res["wav"])
+            self.last_out = final_wav
+            self.last_dir = job_dir
+            self.btn_play2.configure(state="normal"); self.btn_open2.configure(state="normal")
+            self.btn_play.configure(state="normal");  self.btn_open.configure(state="normal")
+            self.btn_generate_from_text.configure(state="normal")
+            self.status_var2.set(f"Dublagem S2S gerada: {final_wav.name}{' (+ MP3)' if save_mp3 else ''}")
             try:
-                job_dir = self.asr_current_job_dir or new_job_dir(prefix="asr-tts")
-                final_wav = job_dir / "dubbing.wav"
-
-                # roda a conversão em subprocesso "spawn"
-                ctx = mp.get_context("spawn")
-                p = ctx.Process(
-                    target=_vc_convert_child,
-                    args=(str(src), str(voice.clean_wav), str(final_wav), lang_tts),
-                    daemon=False,
-                )
-                p.start()
-                p.join()
-
-                if p.exitcode != 0:
-                    raise RuntimeError(f"Conversão S2S falhou (exitcode={p.exitcode}). Veja logs em {LOGS_DIR}.")
-
-                # MP3 opcional
-                if save_mp3:
-                    wav_to_mp3(final_wav, job_dir / "dubbing.mp3")
-
-                def done():
-                    self.last_out = final_wav
-                    self.last_dir = job_dir
-                    self.btn_play2.configure(state="normal"); self.btn_open2.configure(state="normal")
-                    self.btn_play.configure(state="normal");  self.btn_open.configure(state="normal")
-                    self.btn_generate_from_text.configure(state="normal")
-                    self.status_var2.set(f"Dublagem S2S gerada: {final_wav.name}{' (+ MP3)' if save_mp3 else ''}")
-                    try:
-                        subprocess.Popen(["afplay", str(final_wav)])
-                    except Exception:
-                        pass
-                self.after(0, done)
-
-            except Exception as e:
-                import traceback, sys
-                tb = traceback.format_exc(); print(tb, file=sys.stderr)
-                try:
-                    LOGS_DIR.mkdir(parents=True, exist_ok=True)
-                    (LOGS_DIR / "runtime.log").write_text(tb, encoding="utf-8")
-                except Exception:
-                    pass
-                self.after(0, lambda err=e: (
-                    self.btn_generate_from_text.configure(state="normal"),
-                    self.status_var2.set("Erro na conversão S2S."),
-                    messagebox.showerror("Erro", str(err))
-                ))
-
-        threading.Thread(target=worker, daemon=True).start()
+                subprocess.Popen(["afplay", str(final_wav)])
+            except Exception:
+                pass
+
+        def failed(err):
+            self.btn_generate_from_text.configure(state="normal")
+            self.status_var2.set("Erro na conversão S2S.")
+            messagebox.showerror("Erro", err)
+
+        self._submit_job("s2s", {
+            "src": src, "voice": voice.id, "language": lang_tts, "out_dir": str(job_dir),
+            "mp3": save_mp3,
+        }, on_done=done, on_error=failed, on_progress=on_progress)
 
     # =============== Utilidades comuns ===============
     def _on_play_last(self):
@@ -639,7 +618,12 @@ class DubberApp(ctk.CTk):
 
 def main():
     app = DubberApp()
-    app.mainloop()
+    try:
+        app.mainloop()
+    finally:
+        JobScheduler.shutdown_instance()
+        S2SWorkerPool.shutdown_instance()
+        ASRReplicaPool.shutdown_instance()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,360 @@
+# app/pipeline.py
+"""
+Jobs "headless" (sem Tk): TTS, transcrição, S2S e cadastro de voz.
+Cada função carrega os engines via singletons (modelo carregado 1x por processo)
+e devolve um dict JSON-serializável com os caminhos gerados.
+"""
+from __future__ import annotations
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from app import trace
+from app.config import LANG_DEFAULT
+from app.utils.projects import new_job_dir
+
+# saídas da transcrição (run_transcribe / --formats)
+DEFAULT_FORMATS = ("txt", "json", "srt", "vtt")
+
+
+def resolve_voice(voice: str):
+    """Aceita id da voz ou nome (case-insensitive). Lança ValueError se não achar."""
+    from app.voice_manager import VoiceManager
+
+    vm = VoiceManager()
+    v = vm.get_voice(voice)
+    if v is not None:
+        return v
+    matches = vm.find_by_name(voice)
+    if len(matches) == 1:
+        return matches[0]
+    if len(matches) > 1:
+        raise ValueError(f"Nome de voz ambíguo: '{voice}' ({', '.join(m.id for m in matches)})")
+    raise ValueError(f"Voz não encontrada: '{voice}'")
+
+
+def _asr_engine(backend: str):
+    if backend == "openai":
+        from app.engines.asr_openai import ASREngine
+    elif backend == "whisper":
+        from app.engines.asr_whisper import ASREngine
+    else:
+        raise ValueError(f"Backend de ASR desconhecido: '{backend}' (use 'whisper' ou 'openai')")
+    return ASREngine.instance()
+
+
+def run_tts(text: str,
+            voice: str,
+            language: str = LANG_DEFAULT,
+            out_dir: Optional[Path] = None,
+            speed: float = 1.0,
+            semitones: int = 0,
+            mp3: bool = False,
+            pause_ms: int = 180,
+            out_name: str = "tts",
+            save_text: bool = False,
+            incremental: bool = False,
+            progress: Optional[Callable[[int, int], None]] = None,
+            on_chunk: Optional[Callable[[Any, int, int], None]] = None) -> Dict[str, Any]:
+    """
+    Texto -> voz (mesmo fluxo da aba Texto→Voz): <out_name>.wav (+ .mp3).
+    progress(feitos, total) a cada segmento; on_chunk(wav, sr, i) liga o modo
+    streaming (cada segmento sai assim que fica pronto, p/ prévia).
+    incremental=True registra as frases em <job>/segments/manifest.json (áudio no cache
+    de segmentos) e, ao gerar de novo na mesma pasta, só sintetiza as que mudaram.
+    """
+    text = (text or "").strip()
+    if not text:
+        raise ValueError("Texto vazio.")
+    v = resolve_voice(voice)
+
+    from app.engines.tts_xtts import XTTSEngine
+    from app.audio.post import export_audio
+
+    job_dir = Path(out_dir) if out_dir else new_job_dir(prefix="tts")
+    job_dir.mkdir(parents=True, exist_ok=True)
+    final_wav = job_dir / f"{out_name}.wav"
+    final_mp3 = (job_dir / f"{out_name}.mp3") if mp3 else None
+
+    with trace.job(job_dir, "tts", chars=len(text), voice=v.id):
+        xtts = XTTSEngine.instance()
+        if on_chunk is not None:
+            raw_path = job_dir / "raw.wav"
+
+            def _chunk(wav, sr, i):
+                on_chunk(wav, sr, i)
+                if progress is not None:
+                    progress(i + 1, 0)
+
+            xtts.synthesize_smart_stream_to_file(text, Path(v.clean_wav), language, raw_path,
+                                                 pause_ms=pause_ms, on_chunk=_chunk)
+            source, sr = raw_path, None
+        elif incremental:
+            source, sr = xtts.synthesize_incremental_to_array(text, Path(v.clean_wav), language,
+                                                              job_dir / "segments",
+                                                              pause_ms=pause_ms, on_segment=progress)
+        else:
+            source, sr = xtts.synthesize_smart_to_array(text, Path(v.clean_wav), language,
+                                                        pause_ms=pause_ms, on_segment=progress)
+        needs_post = abs(speed - 1.0) > 1e-6 or semitones != 0
+        export_audio(source, sr=sr, wav_out=final_wav, mp3_out=final_mp3,
+                     speed=speed, semitones=semitones, sample_rate=44100 if needs_post else None)
+        if isinstance(source, Path):
+            source.unlink(missing_ok=True)
+        if save_text:
+            (job_dir / "transcript.txt").write_text(text, encoding="utf-8")
+        return {
+            "job_dir": str(job_dir),
+            "voice_id": v.id,
+            "wav": str(final_wav),
+            "mp3": str(final_mp3) if final_mp3 else None,
+        }
+
+
+def _source_meta(src: Path) -> Dict[str, Any]:
+    st = Path(src).stat()
+    return {"path": str(Path(src).resolve()), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def reusable_transcript(job_dir: Path, src: Path):
+    """transcript.json do job, se foi gerado a partir deste mesmo arquivo (senão None)."""
+    from app.transcript import Transcript, TRANSCRIPT_JSON
+
+    path = Path(job_dir) / TRANSCRIPT_JSON
+    if not path.exists():
+        return None
+    try:
+        tr = Transcript.load_json(path)
+    except Exception as e:
+        print(f"[PIPELINE] {path} ignorado: {e}")
+        return None
+    if tr.meta.get("source") != _source_meta(src) or not len(tr):
+        return None
+    return tr
+
+
+def run_transcribe(src: Path,
+                   out_dir: Optional[Path] = None,
+                   asr_backend: str = "whisper",
+                   words: bool = True,
+                   formats: tuple = DEFAULT_FORMATS,
+                   parallel: Optional[bool] = None,
+                   progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+    """
+    Áudio/vídeo -> texto com timestamps: transcript.txt/.json/.srt/.vtt
+    (+ source.wav 16 kHz mono, exceto no modo paralelo, que lê a mídia em streaming).
+    O transcript.json é reaproveitado pelo S2S do mesmo job (sem rodar o ASR de novo).
+    parallel: None = automático (faster-whisper, mais de 1 réplica e áudio >= ASR_LONG_MIN_SEC);
+    nesse modo o arquivo é cortado em janelas transcritas em paralelo (progress por janela).
+    """
+    from app.audio.utils import ensure_wav_mono_16000, require_audio
+    from app.config import ASR_LONG_MIN_SEC
+    from app.threads import ThreadBudget
+    from app.transcript import export_transcript
+
+    src = Path(src)
+    if not src.exists():
+        raise FileNotFoundError(str(src))
+    info = require_audio(src)   # vídeo sem áudio falha aqui, antes de carregar o modelo
+    job_dir = Path(out_dir) if out_dir else new_job_dir(prefix="asr-tts")
+    job_dir.mkdir(parents=True, exist_ok=True)
+
+    with trace.job(job_dir, "transcribe", src=src.name, duration_s=round(info.duration, 3)):
+        if parallel is None:
+            # duração pelos metadados do container (não decodifica)
+            parallel = (asr_backend == "whisper" and ThreadBudget.instance().asr_replicas() > 1
+                        and info.duration >= ASR_LONG_MIN_SEC)
+        if parallel:
+            # janelas lidas direto da mídia original: sem source.wav do arquivo inteiro
+            from app.engines.asr_parallel import ASRReplicaPool
+            tr = ASRReplicaPool.instance().transcribe_long(src, words=words, progress=progress)
+        else:
+            tmp_src = job_dir / "source.wav"
+            ensure_wav_mono_16000(src, tmp_src)
+            tr = _asr_engine(asr_backend).transcribe_timed(tmp_src, words=words)
+        tr.meta["source"] = _source_meta(src)
+        files = export_transcript(tr, job_dir, formats=formats)
+        return {
+            "job_dir": str(job_dir),
+            "language": tr.language,
+            "duration": tr.duration,
+            "text": tr.text,
+            "transcript": files.get("txt"),
+            "files": files,
+        }
+
+
+def run_s2s(src: Path,
+            voice: str,
+            language: str = LANG_DEFAULT,
+            out_dir: Optional[Path] = None,
+            mp3: bool = False,
+            use_pool: bool = False,
+            progress: Optional[Callable[[int, int], None]] = None,
+            check_cancelled: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """
+    Voz -> voz com tempo idêntico ao original: dubbing.wav (+ dubbing.mp3).
+    use_pool=True roda no S2SWorkerPool (processo isolado, usado pela GUI).
+    check_cancelled: levanta se o job foi cancelado; no pool é consultado enquanto
+    o job espera um worker (depois disso, o `progress` que levanta já cancela).
+    """
+    src = Path(src)
+    if not src.exists():
+        raise FileNotFoundError(str(src))
+    v = resolve_voice(voice)
+
+    from app.audio.post import wav_to_mp3
+    from app.audio.utils import require_audio
+    require_audio(src)
+
+    job_dir = Path(out_dir) if out_dir else new_job_dir(prefix="asr-tts")
+    job_dir.mkdir(parents=True, exist_ok=True)
+    final_wav = job_dir / "dubbing.wav"
+
+    with trace.job(job_dir, "s2s", src=src.name, voice=v.id, pool=use_pool):
+        # transcrição com timestamps já feita neste job para este arquivo? usa em vez de outro ASR
+        transcript = reusable_transcript(job_dir, src)
+        if transcript is not None:
+            print(f"[PIPELINE] S2S reaproveitando {len(transcript)} segmentos de transcript.json")
+
+        if use_pool:
+            from app.engines.s2s_pool import S2SWorkerPool
+            from app.transcript import TRANSCRIPT_JSON
+            pool = S2SWorkerPool.instance()
+            fut = pool.submit(
+                src, Path(v.clean_wav), final_wav, language, on_progress=progress,
+                transcript_json=(job_dir / TRANSCRIPT_JSON) if transcript is not None else None,
+                trace_dir=job_dir,
+            )
+            while True:
+                try:
+                    fut.result(timeout=0.5)
+                    break
+                except FutureTimeout:
+                    if check_cancelled is None:
+                        continue
+                    try:
+                        check_cancelled()
+                    except Exception as e:
+                        pool.cancel(fut, e)
+                        raise
+        else:
+            from app.engines.vc_s2s import VCEngine
+            VCEngine.instance().convert(
+                src_audio=src,
+                speaker_wav=Path(v.clean_wav),
+                out_wav=final_wav,
+                language=language,
+                keep_sr=True,
+                normalize=True,
+                progress=progress,
+                transcript=transcript,
+            )
+        final_mp3 = None
+        if mp3:
+            final_mp3 = job_dir / "dubbing.mp3"
+            wav_to_mp3(final_wav, final_mp3)
+        return {
+            "job_dir": str(job_dir),
+            "voice_id": v.id,
+            "wav": str(final_wav),
+            "mp3": str(final_mp3) if final_mp3 else None,
+        }
+
+
+def add_voice(src: Path, name: Optional[str] = None) -> Dict[str, Any]:
+    """Cadastra uma voz-base (padroniza para clean.wav e valida)."""
+    from app.voice_manager import VoiceManager
+
+    voice = VoiceManager().add_voice_from_file(Path(src), display_name=name)
+    return asdict(voice)
+
+
+# ---------------- handlers da fila de jobs (app/scheduler.py) ----------------
+# Payloads vêm da GUI (tipos Python), do CLI e de manifestos CSV (tudo string):
+# os handlers normalizam cada campo aqui, uma vez, para todos se comportarem igual.
+
+_TRUE = {"1", "true", "yes", "y", "sim", "s", "on"}
+
+
+def _as_bool(v: Any) -> bool:
+    if isinstance(v, bool):
+        return v
+    return str(v).strip().lower() in _TRUE
+
+
+def _as_formats(v: Any) -> tuple:
+    """["srt", "txt"] ou "srt,txt" -> ("srt", "txt"); vazio = todos."""
+    items = v if isinstance(v, (list, tuple)) else str(v or "").split(",")
+    return tuple(f.strip() for f in items if str(f).strip()) or DEFAULT_FORMATS
+
+
+def _opt_path(p: Dict[str, Any], key: str) -> Optional[Path]:
+    return Path(p[key]) if p.get(key) else None
+
+
+def _opt_bool(p: Dict[str, Any], key: str) -> Optional[bool]:
+    """None (automático) se ausente/vazio/"auto"."""
+    v = p.get(key)
+    if v is None or str(v).strip().lower() in ("", "auto"):
+        return None
+    return _as_bool(v)
+
+
+def _handle_tts(p: Dict[str, Any], ctx) -> Dict[str, Any]:
+    return run_tts(
+        text=p.get("text") or "",
+        voice=str(p.get("voice") or ""),
+        language=p.get("language") or LANG_DEFAULT,
+        out_dir=_opt_path(p, "out_dir"),
+        speed=float(p.get("speed", 1.0)),
+        semitones=int(p.get("semitones", 0)),
+        mp3=_as_bool(p.get("mp3", False)),
+        pause_ms=int(p.get("pause_ms", 180)),
+        out_name=p.get("out_name") or "tts",
+        save_text=_as_bool(p.get("save_text", False)),
+        incremental=_as_bool(p.get("incremental", False)),
+        progress=ctx.progress,
+        on_chunk=ctx.hooks.get("on_chunk"),
+    )
+
+
+def _handle_transcribe(p: Dict[str, Any], ctx) -> Dict[str, Any]:
+    ctx.check_cancelled()
+    return run_transcribe(
+        src=Path(p["src"]),
+        out_dir=_opt_path(p, "out_dir"),
+        asr_backend=p.get("asr_backend") or "whisper",
+        words=_as_bool(p.get("words", True)),
+        formats=_as_formats(p.get("formats")),
+        parallel=_opt_bool(p, "parallel"),
+        progress=ctx.progress,
+    )
+
+
+def _handle_s2s(p: Dict[str, Any], ctx) -> Dict[str, Any]:
+    return run_s2s(
+        src=Path(p["src"]),
+        voice=str(p.get("voice") or ""),
+        language=p.get("language") or LANG_DEFAULT,
+        out_dir=_opt_path(p, "out_dir"),
+        mp3=_as_bool(p.get("mp3", False)),
+        # sempre no pool: em processo, o S2S usaria os mesmos XTTSEngine/ASREngine dos jobs
+        # "xtts"/"asr" sem ocupar as vagas deles; o limite "s2s" já é o nº de workers do pool
+        use_pool=True,
+        progress=ctx.progress,
+        check_cancelled=ctx.check_cancelled,
+    )
+
+
+def _handle_voice_add(p: Dict[str, Any], ctx) -> Dict[str, Any]:
+    return add_voice(Path(p["src"]), name=p.get("name") or None)
+
+
+def register_default_handlers(scheduler) -> None:
+    """Tipos de job padrão e o engine de cada um (limites em config.JOB_LIMITS)."""
+    scheduler.register("tts", _handle_tts, engine="xtts")
+    scheduler.register("transcribe", _handle_transcribe, engine="asr")
+    scheduler.register("s2s", _handle_s2s, engine="s2s")
+    scheduler.register("voice_add", _handle_voice_add, engine="ffmpeg")
@@ -0,0 +1,445 @@
+# app/scheduler.py
+"""
+Fila de jobs persistente (SQLite em DATA_ROOT) com prioridades, cancelamento
+e limite de concorrência por engine (ex.: 1 job XTTS por vez, para dois cliques
+não disputarem o mesmo modelo nem o mesmo raw.wav).
+
+- Jobs pendentes sobrevivem a reinícios; um job "running" tem dono (host:pid) e um
+  lease renovado pelo dono. Só volta para "pending" se o dono morreu (mesmo host) ou
+  o lease venceu: vários processos (GUI + `cli jobs run`) podem usar o mesmo banco;
+- Handlers são registrados por tipo (kind): handler(payload: dict, ctx: JobContext) -> dict;
+- Callbacks (on_done/on_error/on_progress) e hooks ficam só em memória: jobs retomados
+  após reinício rodam sem eles.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from pathlib import Path
+from threading import Condition, Event, Lock, Thread
+from typing import Any, Callable, Dict, List, Optional
+import json
+import os
+import socket
+import sqlite3
+import time
+import traceback
+
+from app.config import JOBS_DB, JOB_LIMITS, JOB_LEASE_SEC
+from app.threads import ThreadBudget
+from app import trace
+
+PENDING, RUNNING, DONE, FAILED, CANCELLED = "pending", "running", "done", "failed", "cancelled"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind        TEXT    NOT NULL,
+    engine      TEXT    NOT NULL,
+    priority    INTEGER NOT NULL DEFAULT 0,
+    status      TEXT    NOT NULL,
+    payload     TEXT    NOT NULL,
+    result      TEXT,
+    error       TEXT,
+    created_at  REAL    NOT NULL,
+    started_at  REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, priority DESC, id);
+"""
+
+# colunas acrescentadas depois (bancos antigos recebem via ALTER TABLE)
+_MIGRATIONS = {
+    "owner": "ALTER TABLE jobs ADD COLUMN owner TEXT",            # "host:pid" de quem está rodando
+    "lease_until": "ALTER TABLE jobs ADD COLUMN lease_until REAL",
+    # cancelamento pedido por outro processo (ex.: `cli jobs cancel` com o job na GUI)
+    "cancel_requested": "ALTER TABLE jobs ADD COLUMN cancel_requested INTEGER NOT NULL DEFAULT 0",
+}
+
+
+def _owner_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_alive(owner: Optional[str]) -> Optional[bool]:
+    """True/False se o dono é deste host (dá para checar o pid); None se é de outro host."""
+    host, _, pid = (owner or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return None
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return None
+    return True
+
+
+class JobCancelled(Exception):
+    """Levantada dentro do handler quando o job foi cancelado."""
+
+
+@dataclass
+class Job:
+    id: int
+    kind: str
+    engine: str
+    priority: int
+    status: str
+    payload: Dict[str, Any]
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+
+@dataclass
+class _Callbacks:
+    on_done: Optional[Callable[[Dict[str, Any]], None]] = None
+    on_error: Optional[Callable[[str], None]] = None
+    on_progress: Optional[Callable[[int, int], None]] = None
+    hooks: Dict[str, Any] = field(default_factory=dict)
+
+
+class JobContext:
+    """Passado ao handler: cancelamento cooperativo, progresso e hooks em memória."""
+
+    def __init__(self, job_id: int, cancel_event: Event, callbacks: _Callbacks):
+        self.job_id = job_id
+        self._cancel = cancel_event
+        self._cb = callbacks
+        self.hooks = callbacks.hooks
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def check_cancelled(self) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled(f"Job {self.job_id} cancelado.")
+
+    def progress(self, done: int, total: int) -> None:
+        """Reporta progresso (e aproveita para checar cancelamento)."""
+        self.check_cancelled()
+        if self._cb.on_progress is not None:
+            try:
+                self._cb.on_progress(done, total)
+            except Exception:
+                pass
+
+
+def _safe_call(fn: Optional[Callable], *args) -> None:
+    """Callbacks de UI não podem derrubar a thread do job."""
+    if fn is None:
+        return
+    try:
+        fn(*args)
+    except Exception:
+        traceback.print_exc()
+
+
+def _row_to_job(row: sqlite3.Row) -> Job:
+    return Job(
+        id=row["id"], kind=row["kind"], engine=row["engine"], priority=row["priority"],
+        status=row["status"], payload=json.loads(row["payload"]),
+        result=json.loads(row["result"]) if row["result"] else None,
+        error=row["error"], created_at=row["created_at"],
+        started_at=row["started_at"], finished_at=row["finished_at"],
+    )
+
+
+class JobScheduler:
+    """
+    Singleton (JobScheduler.instance()) com uma thread despachante:
+    pega o pendente de maior prioridade (mais antigo primeiro) cujo engine ainda
+    tem vaga e roda o handler numa thread própria.
+    """
+    _instance = None
+    _lock = Lock()
+
+    def __init__(self, db_path: Path = JOBS_DB, limits: Optional[Dict[str, int]] = None):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.limits: Dict[str, int] = {**JOB_LIMITS, **(limits or {})}
+        self._db = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db_lock = Lock()
+        with self._db_lock:
+            self._db.executescript(_SCHEMA)
+            cols = {r["name"] for r in self._db.execute("PRAGMA table_info(jobs)")}
+            for col, ddl in _MIGRATIONS.items():
+                if col not in cols:
+                    self._db.execute(ddl)
+        self.owner = _owner_id()
+        self._last_renew = 0.0
+
+        self._handlers: Dict[str, tuple[str, Callable[[Dict[str, Any], JobContext], Dict[str, Any]]]] = {}
+        self._callbacks: Dict[int, _Callbacks] = {}
+        self._cancel_events: Dict[int, Event] = {}
+        self._running: Dict[str, int] = {}      # engine -> jobs rodando
+        self._cond = Condition()
+        self._closing = False
+        self._dispatcher: Optional[Thread] = None
+
+    @classmethod
+    def instance(cls) -> "JobScheduler":
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = JobScheduler()
+                from app.pipeline import register_default_handlers
+                register_default_handlers(cls._instance)
+                cls._instance.start()
+            return cls._instance
+
+    @classmethod
+    def shutdown_instance(cls) -> None:
+        with cls._lock:
+            if cls._instance is not None:
+                cls._instance.shutdown()
+                cls._instance = None
+
+    # -------------- API pública --------------
+    def register(self, kind: str, handler: Callable[[Dict[str, Any], JobContext], Dict[str, Any]],
+                 engine: str) -> None:
+        self._handlers[kind] = (engine, handler)
+        self._wake()
+
+    def submit(self, kind: str, payload: Dict[str, Any], priority: int = 0,
+               on_done: Optional[Callable[[Dict[str, Any]], None]] = None,
+               on_error: Optional[Callable[[str], None]] = None,
+               on_progress: Optional[Callable[[int, int], None]] = None,
+               hooks: Optional[Dict[str, Any]] = None) -> int:
+        """Enfileira um job (payload precisa ser JSON-serializável). Retorna o id."""
+        if kind not in self._handlers:
+            raise ValueError(f"Tipo de job desconhecido: '{kind}'")
+        engine = self._handlers[kind][0]
+        with self._db_lock:
+            cur = self._db.execute(
+                "INSERT INTO jobs (kind, engine, priority, status, payload, created_at) VALUES (?,?,?,?,?,?)",
+                (kind, engine, int(priority), PENDING, json.dumps(payload, ensure_ascii=False), time.time()),
+            )
+            job_id = int(cur.lastrowid)
+        self._callbacks[job_id] = _Callbacks(on_done, on_error, on_progress, dict(hooks or {}))
+        self._wake()
+        return job_id
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        Pendente: cancela na hora. Rodando: sinaliza (o handler para no próximo checkpoint).
+        O pedido fica gravado no banco: se o job roda em outro processo, o dono o vê em ~1 s.
+        """
+        with self._db_lock:
+            cur = self._db.execute(
+                "UPDATE jobs SET status=?, finished_at=? WHERE id=? AND status=?",
+                (CANCELLED, time.time(), job_id, PENDING),
+            )
+            if cur.rowcount:
+                self._callbacks.pop(job_id, None)
+                return True
+            cur = self._db.execute("UPDATE jobs SET cancel_requested=1 WHERE id=? AND status=?",
+                                   (job_id, RUNNING))
+            requested = cur.rowcount > 0
+        ev = self._cancel_events.get(job_id)
+        if ev is not None:
+            ev.set()
+            return True
+        return requested
+
+    def get(self, job_id: int) -> Optional[Job]:
+        with self._db_lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def list(self, status: Optional[str] = None, limit: int = 200) -> List[Job]:
+        with self._db_lock:
+            if status:
+                rows = self._db.execute("SELECT * FROM jobs WHERE status=? ORDER BY id DESC LIMIT ?",
+                                        (status, limit)).fetchall()
+            else:
+                rows = self._db.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [_row_to_job(r) for r in rows]
+
+    def active_engines(self) -> Dict[str, int]:
+        """Quantos jobs rodam agora por engine (mix ativo)."""
+        with self._cond:
+            return {k: v for k, v in self._running.items() if v}
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Bloqueia até não haver jobs pendentes (de tipos registrados) nem rodando."""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while self._has_work():
+                left = None if deadline is None else deadline - time.time()
+                if left is not None and left <= 0:
+                    return False
+                self._cond.wait(timeout=min(0.5, left) if left is not None else 0.5)
+        return True
+
+    def start(self) -> None:
+        """Começa a despachar. Sem start() a instância só consulta/enfileira (ex.: CLI)."""
+        if self._dispatcher is None:
+            self._reclaim_orphans()
+            self._dispatcher = Thread(target=self._dispatch_loop, name="job-dispatcher", daemon=True)
+            self._dispatcher.start()
+
+    def shutdown(self) -> None:
+        """Para de despachar e sinaliza cancelamento aos jobs rodando (voltam a pendentes no próximo início)."""
+        self._closing = True
+        for ev in list(self._cancel_events.values()):
+            ev.set()
+        self._wake()
+
+    # -------------- interno --------------
+    def _reclaim_orphans(self) -> int:
+        """
+        Jobs "running" cujo dono morreu (mesmo host) ou cujo lease venceu voltam para a fila.
+        Jobs de outro processo vivo (ex.: a GUI, enquanto roda `cli jobs run`) ficam com ele.
+        """
+        now = time.time()
+        with self._db_lock:
+            rows = self._db.execute("SELECT id, owner, lease_until FROM jobs WHERE status=?", (RUNNING,)).fetchall()
+            orphans = []
+            for r in rows:
+                if r["owner"] == self.owner:
+                    continue   # nossos (rodando agora)
+                alive = _owner_alive(r["owner"])
+                expired = r["lease_until"] is None or r["lease_until"] < now
+                if alive is False or (alive is None and expired):
+                    orphans.append(r["id"])
+            for job_id in orphans:
+                self._release(job_id)
+        if orphans:
+            print(f"[JOBS] retomando jobs órfãos: {orphans}")
+            self._wake()
+        return len(orphans)
+
+    def _release(self, job_id: int) -> None:
+        """Job "running" volta para a fila (ou vira cancelado, se pedido). Chamar com _db_lock."""
+        self._db.execute(
+            "UPDATE jobs SET status=CASE WHEN cancel_requested=1 THEN ? ELSE ? END, "
+            "finished_at=CASE WHEN cancel_requested=1 THEN ? END, "
+            "started_at=NULL, owner=NULL, lease_until=NULL WHERE id=? AND status=?",
+            (CANCELLED, PENDING, time.time(), job_id, RUNNING))
+
+    def _poll_cancels(self) -> None:
+        """Pedidos de cancelamento gravados por outros processos -> evento local do job."""
+        if not self._cancel_events:
+            return
+        with self._db_lock:
+            rows = self._db.execute("SELECT id FROM jobs WHERE status=? AND owner=? AND cancel_requested=1",
+                                    (RUNNING, self.owner)).fetchall()
+        for r in rows:
+            ev = self._cancel_events.get(r["id"])
+            if ev is not None and not ev.is_set():
+                print(f"[JOBS] #{r['id']} cancelamento pedido por outro processo")
+                ev.set()
+
+    def _renew_leases(self) -> None:
+        """Renova o lease dos nossos jobs rodando (a cada ~1/3 do lease) e recolhe órfãos de outros."""
+        now = time.time()
+        if now - self._last_renew < JOB_LEASE_SEC / 3.0:
+            return
+        self._last_renew = now
+        with self._db_lock:
+            self._db.execute("UPDATE jobs SET lease_until=? WHERE status=? AND owner=?",
+                             (now + JOB_LEASE_SEC, RUNNING, self.owner))
+        self._reclaim_orphans()
+
+    def _wake(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+    def _has_work(self) -> bool:
+        if any(self._running.values()):
+            return True
+        kinds = list(self._handlers)
+        if not kinds:
+            return False
+        with self._db_lock:
+            q = "SELECT 1 FROM jobs WHERE status=? AND kind IN (%s) LIMIT 1" % ",".join("?" * len(kinds))
+            return self._db.execute(q, (PENDING, *kinds)).fetchone() is not None
+
+    def _next_job(self) -> Optional[Job]:
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT * FROM jobs WHERE status=? ORDER BY priority DESC, id ASC", (PENDING,)
+            ).fetchall()
+            for row in rows:
+                if row["kind"] not in self._handlers:
+                    continue
+                engine = self._handlers[row["kind"]][0]
+                if self._running.get(engine, 0) >= max(1, int(self.limits.get(engine, 1))):
+                    continue
+                now = time.time()
+                cur = self._db.execute(
+                    "UPDATE jobs SET status=?, started_at=?, owner=?, lease_until=? WHERE id=? AND status=?",
+                    (RUNNING, now, self.owner, now + JOB_LEASE_SEC, row["id"], PENDING))
+                if not cur.rowcount:
+                    continue  # outro processo pegou antes
+                job = _row_to_job(row)
+                job.engine = engine
+                return job
+        return None
+
+    def _dispatch_loop(self) -> None:
+        while not self._closing:
+            self._renew_leases()
+            self._poll_cancels()
+            with self._cond:
+                job = self._next_job()
+                if job is None:
+                    self._cond.wait(timeout=1.0)
+                    continue
+                self._running[job.engine] = self._running.get(job.engine, 0) + 1
+                mix = dict(self._running)
+            ThreadBudget.instance().rebalance(mix)
+            Thread(target=self._run_job, args=(job,), name=f"job-{job.id}", daemon=True).start()
+
+    def _finish(self, job: Job, status: str, result=None, error: Optional[str] = None) -> None:
+        with self._db_lock:
+            self._db.execute(
+                "UPDATE jobs SET status=?, result=?, error=?, finished_at=? WHERE id=?",
+                (status, json.dumps(result, ensure_ascii=False) if result is not None else None,
+                 error, time.time(), job.id),
+            )
+        trace.job_finished(job.kind, status)
+
+    def _run_job(self, job: Job) -> None:
+        engine, handler = self._handlers[job.kind]
+        ev = Event()
+        self._cancel_events[job.id] = ev
+        cb = self._callbacks.get(job.id) or _Callbacks()
+        ctx = JobContext(job.id, ev, cb)
+        print(f"[JOBS] #{job.id} {job.kind} (engine={engine}, prio={job.priority}) iniciado")
+        try:
+            ctx.check_cancelled()
+            # job_id/prioridade vão no job_start do trace.jsonl que o handler abrir
+            with trace.labels(job_id=job.id, priority=job.priority):
+                result = handler(job.payload, ctx) or {}
+            ctx.check_cancelled()
+            self._finish(job, DONE, result=result)
+            _safe_call(cb.on_done, result)
+        except Exception as e:
+            if self._closing:
+                # encerramento do app (cancelado ou engine derrubado): volta para a fila
+                with self._db_lock:
+                    self._release(job.id)
+                return
+            if isinstance(e, JobCancelled):
+                self._finish(job, CANCELLED, error=str(e))
+                _safe_call(cb.on_error, str(e))
+                return
+            tb = traceback.format_exc()
+            print(tb)
+            self._finish(job, FAILED, error=tb)
+            _safe_call(cb.on_error, str(e))
+        finally:
+            self._cancel_events.pop(job.id, None)
+            self._callbacks.pop(job.id, None)
+            with self._cond:
+                self._running[engine] = max(0, self._running.get(engine, 0) - 1)
+                mix = dict(self._running)
+                self._cond.notify_all()
+            ThreadBudget.instance().rebalance(mix)
+            print(f"[JOBS] #{job.id} {job.kind} finalizado")
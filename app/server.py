@@ -0,0 +1,385 @@
+# app/server.py
+"""
+Serviço HTTP local (stdlib, sem dependências extras) com os modelos mantidos quentes:
+XTTS e ASR são carregados 1x no início e atendem todas as requisições.
+
+  python -m app.server [--host 127.0.0.1] [--port 8765] [--asr whisper|openai] [--no-warmup]
+
+Endpoints:
+  GET  /health                 -> {"ok": true, "warm": {...}}
+  GET  /metrics                -> métricas por etapa (texto do Prometheus, app/trace.py)
+  GET  /voices[?q=nome]        -> lista de vozes-base (filtro por parte do nome)
+  POST /tts        (JSON)      {"text", "voice", "language"?, "speed"?, "semitones"?, "pause_ms"?, "stream"?}
+                               -> audio/wav; com "stream": true a resposta é chunked e cada
+                                  segmento sai assim que fica pronto
+  POST /transcribe (JSON)      {"path", "asr"?, "format"?}  -> {"text", "language", "duration"}
+                   (binário)   corpo = arquivo de áudio/vídeo; ?asr=whisper&filename=x.mp4
+                               format=json (timestamps de segmento/palavra, colunar), srt ou vtt
+  POST /s2s        (JSON)      {"path", "voice", "language"?} -> audio/wav
+                   (binário)   corpo = arquivo; ?voice=...&language=pt&filename=x.mp4
+
+Cada modelo atende uma requisição por vez (lock por engine); requisições a engines
+diferentes rodam em paralelo.
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Iterator, Optional
+from urllib.parse import parse_qs, urlparse
+import argparse
+import json
+import sys
+import tempfile
+import time
+import traceback
+
+import numpy as np
+
+from app.config import LANG_DEFAULT, SERVER_HOST, SERVER_PORT
+from app.audio.stream import pcm16_bytes, wav_header
+from app.audio.utils import require_audio
+from app import trace
+
+# uploads maiores que isso são recusados
+MAX_BODY_BYTES = 1024 * 1024 * 1024
+# uploads vão para o arquivo temporário em blocos deste tamanho (nunca inteiros na memória)
+BODY_CHUNK_BYTES = 1024 * 1024
+
+_XTTS_LOCK = Lock()
+_ASR_LOCK = Lock()
+
+
+class _BadRequest(Exception):
+    """Erro do cliente (vira HTTP 400)."""
+
+
+@contextmanager
+def _client_input():
+    """ValueError da validação da entrada do cliente (voz, áudio, backend) -> 400."""
+    try:
+        yield
+    except ValueError as e:
+        raise _BadRequest(str(e)) from e
+
+
+def _wav_bytes(wav: np.ndarray, sr: int) -> bytes:
+    wav = np.asarray(wav, dtype=np.float32).reshape(-1)
+    return wav_header(sr, 1, n_frames=len(wav)) + pcm16_bytes(wav)
+
+
+def _post_fx(wav: np.ndarray, sr: int, speed: float, semitones: int) -> np.ndarray:
+    if abs(speed - 1.0) < 1e-6 and semitones == 0:
+        return wav
+    from app.audio.post import apply_speed_pitch_array
+    return apply_speed_pitch_array(wav, sr, speed=speed, semitones=semitones)
+
+
+def warmup(asr_backend: str = "whisper") -> Dict[str, float]:
+    """Carrega XTTS + ASR e pré-calcula os latentes de todas as vozes. Retorna os tempos (s)."""
+    from app.engines.tts_xtts import XTTSEngine
+    from app.pipeline import _asr_engine
+    from app.voice_manager import VoiceManager
+
+    times: Dict[str, float] = {}
+    t0 = time.time()
+    xtts = XTTSEngine.instance()
+    times["xtts"] = round(time.time() - t0, 3)
+
+    t0 = time.time()
+    for v in VoiceManager().list_voices():
+        try:
+            xtts.speaker_latents(Path(v.clean_wav))
+        except Exception as e:
+            print(f"[SERVER] latentes da voz {v.id} falharam: {e}")
+    times["latents"] = round(time.time() - t0, 3)
+
+    t0 = time.time()
+    _asr_engine(asr_backend)
+    times["asr"] = round(time.time() - t0, 3)
+    return times
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 para permitir Transfer-Encoding: chunked no /tts
+    protocol_version = "HTTP/1.1"
+    server_version = "DubberServer/1.0"
+
+    # -------------- roteamento --------------
+    def do_GET(self):
+        route = urlparse(self.path).path.rstrip("/")
+        if route == "/health":
+            return self._json(200, {"ok": True, "warm": self.server.warm})
+        if route == "/metrics":
+            return self._send(200, "text/plain; version=0.0.4; charset=utf-8", trace.render_metrics().encode("utf-8"))
+        if route == "/voices":
+            from app.voice_manager import VoiceManager
+            q = (parse_qs(urlparse(self.path).query).get("q") or [""])[-1]
+            return self._json(200, [asdict(v) for v in VoiceManager().find_voices(q)])
+        self._json(404, {"error": f"rota desconhecida: {route}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        route = url.path.rstrip("/")
+        self._body_left: Optional[int] = None   # None = corpo ainda não lido
+        handler = {"/tts": self._tts, "/transcribe": self._transcribe, "/s2s": self._s2s}.get(route)
+        if handler is None:
+            self._discard_body()
+            return self._json(404, {"error": f"rota desconhecida: {route}"})
+        t0 = time.time()
+        try:
+            with trace.span(f"http{route}"):
+                handler(url)
+        except _BadRequest as e:
+            self._discard_body()
+            self._json(400, {"error": str(e)})
+        except (BrokenPipeError, ConnectionResetError):
+            print(f"[SERVER] cliente desconectou em {route}")
+        except Exception as e:
+            tb = traceback.format_exc()
+            print(tb, file=sys.stderr)
+            trace.append_log("server.log", tb, route=route)
+            self._discard_body()
+            self._json(500, {"error": str(e)})
+        finally:
+            print(f"[SERVER] {route} {time.time() - t0:.3f}s")
+
+    # -------------- endpoints --------------
+    def _tts(self, url) -> None:
+        body = self._read_json()
+        text = (body.get("text") or "").strip()
+        if not text:
+            raise _BadRequest("Campo 'text' vazio.")
+        from app.pipeline import resolve_voice
+
+        with _client_input():
+            v = resolve_voice(str(body.get("voice") or ""))
+        from app.engines.tts_xtts import XTTSEngine
+
+        language = body.get("language") or LANG_DEFAULT
+        try:
+            pause_ms = int(body.get("pause_ms", 180))
+            speed = float(body.get("speed", 1.0))
+            semitones = int(body.get("semitones", 0))
+        except (TypeError, ValueError) as e:
+            raise _BadRequest(f"pause_ms/speed/semitones inválido: {e}") from e
+        xtts = XTTSEngine.instance()
+
+        if not body.get("stream"):
+            with _XTTS_LOCK:
+                wav, sr = xtts.synthesize_smart_to_array(text, Path(v.clean_wav), language, pause_ms=pause_ms)
+            return self._send(200, "audio/wav", _wav_bytes(_post_fx(wav, sr, speed, semitones), sr))
+
+        with _XTTS_LOCK:
+            chunks = xtts.iter_synthesize_smart(text, Path(v.clean_wav), language, pause_ms=pause_ms)
+            try:
+                started = False
+                for wav, sr in chunks:
+                    if not started:
+                        self.send_response(200)
+                        self.send_header("Content-Type", "audio/wav")
+                        self.send_header("Transfer-Encoding", "chunked")
+                        self.end_headers()
+                        self._chunk(wav_header(sr, 1))
+                        started = True
+                    self._chunk(pcm16_bytes(_post_fx(wav, sr, speed, semitones)))
+                self._chunk(b"")
+            except (BrokenPipeError, ConnectionResetError):
+                raise
+            except Exception:
+                if not started:
+                    raise
+                # cabeçalho já foi enviado: sem o chunk final o cliente percebe o corte
+                traceback.print_exc()
+                self.close_connection = True
+            finally:
+                chunks.close()
+
+    def _transcribe(self, url) -> None:
+        from app.pipeline import _asr_engine
+        from app.audio.utils import ensure_wav_mono_16000
+
+        query = parse_qs(url.query)
+        with tempfile.TemporaryDirectory(prefix="dubber-srv-") as td:
+            src, opts = self._source(query, Path(td))
+            tmp_src = Path(td) / "source.wav"
+            ensure_wav_mono_16000(src, tmp_src)
+            fmt = str(opts.get("format") or "text")
+            if fmt not in ("text", "json", "srt", "vtt"):
+                raise _BadRequest(f"format desconhecido: '{fmt}' (text, json, srt ou vtt)")
+            with _client_input():
+                asr = _asr_engine(opts.get("asr") or self.server.asr_backend)
+            with _ASR_LOCK:
+                if fmt == "text":
+                    result = asr.transcribe(tmp_src)
+                else:
+                    tr = asr.transcribe_timed(tmp_src, words=True)
+        if fmt == "json":
+            return self._json(200, tr.to_dict())
+        if fmt in ("srt", "vtt"):
+            body = tr.to_srt() if fmt == "srt" else tr.to_vtt()
+            return self._send(200, f"text/{'vtt' if fmt == 'vtt' else 'plain'}; charset=utf-8", body.encode("utf-8"))
+        self._json(200, {
+            "text": (result.get("text") or "").strip(),
+            "language": result.get("language"),
+            "duration": result.get("duration"),
+        })
+
+    def _s2s(self, url) -> None:
+        from app.pipeline import resolve_voice
+        from app.engines.vc_s2s import VCEngine
+
+        query = parse_qs(url.query)
+        with tempfile.TemporaryDirectory(prefix="dubber-srv-") as td:
+            src, opts = self._source(query, Path(td))
+            with _client_input():
+                v = resolve_voice(str(opts.get("voice") or ""))
+            out_wav = Path(td) / "dubbing.wav"
+            # S2S usa XTTS e ASR: pega os dois (sempre nessa ordem)
+            with _XTTS_LOCK, _ASR_LOCK:
+                VCEngine.instance().convert(
+                    src_audio=src,
+                    speaker_wav=Path(v.clean_wav),
+                    out_wav=out_wav,
+                    language=opts.get("language") or LANG_DEFAULT,
+                    keep_sr=True,
+                    normalize=True,
+                )
+            data = out_wav.read_bytes()
+        self._send(200, "audio/wav", data)
+
+    # -------------- helpers --------------
+    def _source(self, query: Dict[str, list], tmp_dir: Path) -> tuple[Path, Dict[str, Any]]:
+        """Arquivo de entrada: JSON {"path": ...} ou o próprio corpo (upload binário)."""
+        opts: Dict[str, Any] = {k: v[-1] for k, v in query.items()}
+        if (self.headers.get("Content-Type") or "").startswith("application/json"):
+            opts.update(self._read_json())
+            if not opts.get("path"):
+                raise _BadRequest("Informe 'path' (JSON) ou envie o arquivo no corpo.")
+            src = Path(opts["path"])
+            if not src.exists():
+                raise _BadRequest(f"Arquivo não encontrado: {src}")
+        else:
+            suffix = Path(opts.get("filename") or "upload.bin").suffix or ".bin"
+            src = tmp_dir / f"upload{suffix}"
+            if not self._save_body(src):
+                raise _BadRequest("Corpo vazio.")
+        with _client_input():
+            require_audio(src)   # 400 para vídeo sem áudio / arquivo ilegível, antes do modelo
+        return src, opts
+
+    def _body_length(self) -> int:
+        try:
+            n = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise _BadRequest("Content-Length inválido.") from None
+        if n > MAX_BODY_BYTES:
+            raise _BadRequest(f"Arquivo grande demais ({n} bytes).")
+        return max(0, n)
+
+    def _read_body(self) -> bytes:
+        return b"".join(self._body_chunks())
+
+    def _body_chunks(self) -> Iterator[bytes]:
+        """Corpo em blocos de BODY_CHUNK_BYTES (para uploads grandes)."""
+        self._body_left = left = self._body_length()
+        while left > 0:
+            chunk = self.rfile.read(min(BODY_CHUNK_BYTES, left))
+            if not chunk:
+                raise _BadRequest(f"Corpo incompleto (faltaram {left} bytes).")
+            left -= len(chunk)
+            self._body_left = left
+            yield chunk
+
+    def _save_body(self, dest: Path) -> int:
+        """Grava o corpo em `dest` bloco a bloco. Retorna o nº de bytes."""
+        size = 0
+        with open(dest, "wb") as f:
+            for chunk in self._body_chunks():
+                f.write(chunk)
+                size += len(chunk)
+        return size
+
+    def _read_json(self) -> Dict[str, Any]:
+        raw = self._read_body()
+        try:
+            body = json.loads(raw.decode("utf-8") or "{}")
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise _BadRequest(f"JSON inválido: {e}") from e
+        if not isinstance(body, dict):
+            raise _BadRequest("JSON precisa ser um objeto.")
+        return body
+
+    def _drain(self) -> None:
+        try:
+            for _ in self._body_chunks():
+                pass
+        except _BadRequest:
+            self.close_connection = True
+
+    def _discard_body(self) -> None:
+        """Antes de responder erro: o corpo não lido viraria a "próxima requisição" do keep-alive."""
+        if self._body_left is None:
+            self._drain()           # acima de MAX_BODY_BYTES o _drain fecha a conexão
+        elif self._body_left:
+            self.close_connection = True   # lido pela metade: não dá para ressincronizar
+
+    def _send(self, code: int, content_type: str, data: bytes) -> None:
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _json(self, code: int, obj: Any) -> None:
+        self._send(code, "application/json; charset=utf-8", json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+
+    def _chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, fmt, *args):
+        print(f"[SERVER] {self.address_string()} {fmt % args}")
+
+
+class DubberServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr: tuple[str, int], asr_backend: str = "whisper"):
+        super().__init__(addr, _Handler)
+        self.asr_backend = asr_backend
+        self.warm: Dict[str, Any] = {}
+
+
+def main(argv: Optional[list] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m app.server", description="Dublador/Transcritor – serviço HTTP local")
+    ap.add_argument("--host", default=SERVER_HOST)
+    ap.add_argument("--port", type=int, default=SERVER_PORT)
+    ap.add_argument("--asr", choices=["whisper", "openai"], default="whisper")
+    ap.add_argument("--no-warmup", dest="warmup", action="store_false",
+                    help="não carregar os modelos antes de aceitar requisições")
+    args = ap.parse_args(argv)
+
+    srv = DubberServer((args.host, args.port), asr_backend=args.asr)
+    if args.warmup:
+        print("[SERVER] carregando modelos...")
+        srv.warm = warmup(args.asr)
+        print(f"[SERVER] modelos prontos: {srv.warm}")
+    print(f"[SERVER] ouvindo em http://{args.host}:{srv.server_address[1]}")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        from app.engines.asr_parallel import ASRReplicaPool
+        srv.server_close()
+        ASRReplicaPool.shutdown_instance()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+# app/threads.py
+"""
+Orçamento de threads de CPU entre os engines (torch/XTTS, ctranslate2/Whisper, ffmpeg, DSP do S2S).
+
+- Núcleos disponíveis = afinidade do processo, limitada pela cota do cgroup
+  (v2: cpu.max; v1: cpu.cfs_quota_us/cpu.cfs_period_us), ou DUBBER_CPU_CORES.
+- Perfil "safe" (padrão no macOS): os valores de sempre (torch com 1 thread,
+  OpenMP/MKL = 1, Whisper com 2), que evitam crashes de OpenMP/Accelerate com a GUI.
+- Perfil "auto" (padrão no resto): os núcleos são divididos entre os engines
+  com jobs ativos no JobScheduler, por peso (DUBBER_THREAD_WEIGHTS).
+- Valores explícitos (DUBBER_TORCH_THREADS, DUBBER_ASR_CPU_THREADS, ...) sempre ganham.
+
+O torch muda de nº de threads a qualquer momento (rebalance() a cada início/fim de job);
+o ctranslate2 (Whisper) e os pools de processos fixam o valor ao carregar, então usam
+a fatia "estática" (todos os engines ocupados ao mesmo tempo).
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterable, Iterator, List, Optional
+import math
+import os
+import sys
+
+from app.config import (
+    CPU_CORES, THREAD_PROFILE, THREAD_WEIGHTS, TORCH_THREADS, FFMPEG_THREADS,
+    ASR_CPU_THREADS, ASR_REPLICAS, S2S_DSP_THREADS
+)
+
+# variáveis lidas pelas libs nativas ao carregar (precisam estar no ambiente antes do import)
+NATIVE_THREAD_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+# perfil "safe": o comportamento histórico do app
+_SAFE = {"torch": 1, "interop": 1, "asr": 2, "dsp": 2}
+
+# variáveis que apply_env_defaults() definiu (as que o usuário definiu não são tocadas)
+_DEFAULTED: set = set()
+_env_lock = Lock()
+
+
+# ---------------- detecção de núcleos ----------------
+
+def _cgroup_quota() -> Optional[float]:
+    """Cota de CPU do cgroup em núcleos (ex.: 2.5), ou None se não houver limite."""
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()[:2]   # cgroup v2
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text())     # cgroup v1
+        period = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text())
+        return quota / period if quota > 0 and period > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def available_cores() -> int:
+    """Núcleos que este processo pode usar de fato (afinidade + cota do cgroup)."""
+    if CPU_CORES > 0:
+        return CPU_CORES
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        cores = os.cpu_count() or 1
+    quota = _cgroup_quota()
+    if quota is not None:
+        cores = min(cores, max(1, math.ceil(quota)))
+    return max(1, cores)
+
+
+def apply_env_defaults(profile: str = THREAD_PROFILE) -> None:
+    """
+    Chamado por app/__init__ antes de qualquer lib nativa: no perfil safe, OpenMP/MKL
+    com 1 thread; no auto, o total de núcleos (o torch é ajustado por job depois).
+    Nunca sobrescreve o que já estiver no ambiente.
+    """
+    n = "1" if profile == "safe" else str(available_cores())
+    for var in NATIVE_THREAD_VARS:
+        if var not in os.environ:
+            os.environ[var] = n
+            _DEFAULTED.add(var)
+
+
+@contextmanager
+def child_thread_env(threads: int) -> Iterator[None]:
+    """
+    Enquanto ativo, OpenMP/MKL = `threads` no ambiente: processos filhos (spawn) criados
+    dentro do bloco herdam a fatia deles, e não os núcleos todos do pai (N filhos x núcleos).
+    Só mexe no que apply_env_defaults() definiu; no perfil safe continua 1.
+    """
+    n = "1" if THREAD_PROFILE == "safe" else str(max(1, int(threads)))
+    with _env_lock:
+        saved = {var: os.environ[var] for var in _DEFAULTED if var in os.environ}
+        os.environ.update({var: n for var in saved})
+        try:
+            yield
+        finally:
+            os.environ.update(saved)
+
+
+# ---------------- orçamento ----------------
+
+class ThreadBudget:
+    """
+    Divide `cores` entre engines por peso. Singleton por processo:
+      ThreadBudget.instance().torch_threads() / asr_cpu_threads() / ffmpeg_args() ...
+    Processos filhos (pool S2S) recebem a sua fatia com set_cores().
+    """
+    _instance = None
+    _lock = Lock()
+
+    def __init__(self, cores: Optional[int] = None, profile: str = THREAD_PROFILE,
+                 weights: Optional[Dict[str, int]] = None):
+        self.cores = int(cores or available_cores())
+        self.profile = profile
+        self.weights = dict(weights or THREAD_WEIGHTS)
+        self._active: Dict[str, int] = {}
+        self._mix_lock = Lock()
+
+    @classmethod
+    def instance(cls) -> "ThreadBudget":
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = ThreadBudget()
+            return cls._instance
+
+    @property
+    def safe(self) -> bool:
+        return self.profile == "safe"
+
+    def set_cores(self, cores: int) -> None:
+        self.cores = max(1, int(cores))
+        self.rebalance(self._active)
+
+    # -------------- divisão --------------
+    def split(self, engines: Iterable[str]) -> Dict[str, int]:
+        """{engine: threads} dividindo os núcleos entre `engines` por peso (mínimo 1 cada)."""
+        names: List[str] = sorted(set(engines))
+        if not names:
+            return {}
+        total = sum(self.weights.get(e, 1) for e in names)
+        return {e: max(1, self.cores * self.weights.get(e, 1) // total) for e in names}
+
+    def threads_for(self, engine: str, active: Optional[Iterable[str]] = None) -> int:
+        """Fatia de `engine` no mix ativo (padrão: jobs rodando agora + ele mesmo)."""
+        with self._mix_lock:
+            mix = set(self._active if active is None else active)
+        mix.add(engine)
+        return self.split(mix)[engine]
+
+    def static(self, engine: str) -> int:
+        """Fatia para o que é fixado ao carregar: pior caso, todos os engines ocupados."""
+        return self.split(set(self.weights) | {engine})[engine]
+
+    def rebalance(self, active: Dict[str, int]) -> None:
+        """Novo mix de jobs ativos (o JobScheduler chama a cada início/fim de job)."""
+        with self._mix_lock:
+            self._active = {k: v for k, v in active.items() if v}
+        if "torch" in sys.modules:   # nunca importa o torch só para isso
+            configure_torch(self)
+
+    # -------------- por engine --------------
+    def torch_threads(self) -> int:
+        if TORCH_THREADS:
+            return TORCH_THREADS
+        return _SAFE["torch"] if self.safe else self.threads_for("xtts")
+
+    def interop_threads(self) -> int:
+        return _SAFE["interop"] if self.safe else min(4, max(1, self.torch_threads() // 4))
+
+    def asr_cpu_threads(self) -> int:
+        if ASR_CPU_THREADS:
+            return ASR_CPU_THREADS
+        return _SAFE["asr"] if self.safe else self.static("asr")
+
+    def asr_replicas(self) -> int:
+        """Processos do ASR paralelo (1 thread cada)."""
+        if ASR_REPLICAS:
+            return ASR_REPLICAS
+        return min(self.cores, 4) if self.safe else max(1, min(8, self.static("asr")))
+
+    def dsp_threads(self) -> int:
+        if S2S_DSP_THREADS:
+            return S2S_DSP_THREADS
+        return _SAFE["dsp"] if self.safe else max(2, self.threads_for("asr"))
+
+    def s2s_worker_cores(self, workers: int) -> int:
+        """Núcleos de cada processo do pool S2S (XTTS + Whisper + DSP dentro dele)."""
+        return max(1, self.static("s2s") // max(1, int(workers)))
+
+    def ffmpeg_args(self) -> List[str]:
+        """['-threads', N] para o ffmpeg; vazio no perfil safe (ffmpeg decide, como antes)."""
+        if FFMPEG_THREADS:
+            return ["-threads", str(FFMPEG_THREADS)]
+        return [] if self.safe else ["-threads", str(self.threads_for("ffmpeg"))]
+
+
+def configure_torch(budget: Optional[ThreadBudget] = None) -> None:
+    """Aplica o orçamento ao torch (os engines chamam logo depois de importá-lo)."""
+    import torch
+    budget = budget or ThreadBudget.instance()
+    n = budget.torch_threads()
+    if torch.get_num_threads() != n:
+        torch.set_num_threads(n)
+    try:
+        # só pode ser definido 1x, antes do primeiro trabalho paralelo
+        torch.set_num_interop_threads(budget.interop_threads())
+    except RuntimeError:
+        pass
+
+
+def ffmpeg_thread_args() -> List[str]:
+    return ThreadBudget.instance().ffmpeg_args()
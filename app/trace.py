@@ -0,0 +1,390 @@
+# app/trace.py
+"""
+Instrumentação leve do pipeline: spans (trechos cronometrados) por etapa.
+
+- span("tts.segment", chars=42): mede o bloco. Sempre alimenta as métricas do processo
+  (contagem/soma/histograma por etapa, em memória), exportadas em texto do Prometheus
+  por GET /metrics no app/server.py (ou em DUBBER_METRICS_PORT na GUI);
+- job(job_dir, "tts"): dentro dele, cada span também vira uma linha em <job>/trace.jsonl
+  (id/pai, thread, início relativo, atributos) e o fim grava o resumo por etapa.
+  Rodar de novo na mesma pasta acrescenta outra execução (campo "run");
+- contextvars não passam sozinhos para Thread/ThreadPoolExecutor: quem cria threads
+  dentro de um job usa bind(fn) para o trabalho delas entrar no mesmo trace.
+
+DUBBER_TRACE=0 desliga o trace.jsonl (as métricas continuam).
+Etapas: load.<engine>, asr.*, tts.*, dsp.*, ffmpeg, write.*.
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Lock, Thread, current_thread
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import functools
+import itertools
+import json
+import math
+import time
+import uuid
+
+from app.config import TRACE_ENABLED
+
+TRACE_JSONL = "trace.jsonl"
+
+# limites (s) dos histogramas: de um resample curto a um job longo
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0)
+
+_HELP = {
+    "dubber_stage_seconds": ("histogram", "Duração de cada etapa do pipeline (spans)."),
+    "dubber_stage_errors_total": ("counter", "Spans que terminaram em exceção, por etapa."),
+    "dubber_job_seconds": ("histogram", "Duração dos jobs com trace, por tipo."),
+    "dubber_jobs_total": ("counter", "Jobs da fila finalizados, por tipo e status."),
+}
+
+_job: ContextVar[Optional["JobTrace"]] = ContextVar("dubber_job_trace", default=None)
+_span: ContextVar[Optional[int]] = ContextVar("dubber_span", default=None)
+_labels: ContextVar[Dict[str, Any]] = ContextVar("dubber_trace_labels", default={})
+_ids = itertools.count(1)
+
+
+# ---------------- métricas do processo ----------------
+
+class Metrics:
+    """Contadores e histogramas em memória (por processo). Singleton: Metrics.instance()."""
+    _instance = None
+    _lock = Lock()
+
+    def __init__(self, buckets: Tuple[float, ...] = DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._mu = Lock()
+        self._counters: Dict[Tuple[str, tuple], float] = {}
+        # (nome, labels) -> [contagens por bucket (não acumuladas) + +Inf, soma, total]
+        self._hists: Dict[Tuple[str, tuple], list] = {}
+
+    @classmethod
+    def instance(cls) -> "Metrics":
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = Metrics()
+            return cls._instance
+
+    def inc(self, name: str, value: float = 1.0, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._mu:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        i = next((k for k, b in enumerate(self.buckets) if value <= b), len(self.buckets))
+        with self._mu:
+            h = self._hists.get(key)
+            if h is None:
+                h = self._hists[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            h[0][i] += 1
+            h[1] += value
+            h[2] += 1
+
+    def reset(self) -> None:
+        with self._mu:
+            self._counters.clear()
+            self._hists.clear()
+
+    def render(self) -> str:
+        """Formato texto do Prometheus (exposition format 0.0.4)."""
+        with self._mu:
+            counters = dict(self._counters)
+            hists = {k: (list(v[0]), v[1], v[2]) for k, v in self._hists.items()}
+        lines: List[str] = []
+        for name in sorted({k[0] for k in counters} | {k[0] for k in hists}):
+            kind, help_ = _HELP.get(name, ("counter" if name in {k[0] for k in counters} else "histogram", ""))
+            if help_:
+                lines.append(f"# HELP {name} {help_}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (n, labels), v in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{name}{_fmt_labels(labels)} {_fmt_num(v)}")
+            for (n, labels), (counts, total, count) in sorted(hists.items()):
+                if n != name:
+                    continue
+                acc = 0
+                for b, c in zip(self.buckets + (math.inf,), counts):
+                    acc += c
+                    le = "+Inf" if b == math.inf else _fmt_num(b)
+                    lines.append(f"{name}_bucket{_fmt_labels(labels + (('le', le),))} {acc}")
+                lines.append(f"{name}_sum{_fmt_labels(labels)} {_fmt_num(total)}")
+                lines.append(f"{name}_count{_fmt_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _fmt_num(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def _fmt_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    esc = lambda s: str(s).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in labels) + "}"
+
+
+def render_metrics() -> str:
+    return Metrics.instance().render()
+
+
+# ---------------- trace por job ----------------
+
+class JobTrace:
+    """Um job em andamento: grava os spans em <job_dir>/trace.jsonl e soma o tempo por etapa."""
+
+    def __init__(self, job_dir: Path, kind: str, labels: Optional[Dict[str, Any]] = None):
+        self.path = Path(job_dir) / TRACE_JSONL
+        self.kind = kind
+        self.labels = dict(labels or {})
+        self.run = uuid.uuid4().hex[:12]
+        self.t0 = time.perf_counter()
+        self.started_at = time.time()
+        self.stages: Dict[str, List[float]] = {}   # etapa -> [segundos, chamadas]
+        self._mu = Lock()
+        self._fh = None
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fh = self.path.open("a", encoding="utf-8")
+        except OSError as e:
+            print(f"[TRACE] sem trace.jsonl em {self.path.parent}: {e}")
+
+    def _write(self, rec: Dict[str, Any]) -> None:
+        if self._fh is None:
+            return
+        line = json.dumps(rec, ensure_ascii=False, default=str) + "\n"
+        with self._mu:
+            try:
+                self._fh.write(line)
+                self._fh.flush()   # o trace de um job que cair no meio fica legível até ali
+            except (OSError, ValueError):
+                pass
+
+    def start(self) -> None:
+        self._write({"type": "job_start", "run": self.run, "kind": self.kind,
+                     "ts": round(self.started_at, 3), "labels": self.labels})
+
+    def span(self, sid: int, parent: Optional[int], name: str, t_start: float, dur: float,
+             attrs: Dict[str, Any], error: Optional[str]) -> None:
+        with self._mu:
+            st = self.stages.setdefault(name, [0.0, 0])
+            st[0] += dur
+            st[1] += 1
+        rec = {"type": "span", "run": self.run, "id": sid, "parent": parent, "name": name,
+               "start_ms": round((t_start - self.t0) * 1000.0, 3), "dur_ms": round(dur * 1000.0, 3),
+               "thread": current_thread().name}
+        if attrs:
+            rec["attrs"] = attrs
+        if error:
+            rec["error"] = error
+        self._write(rec)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """{etapa: {"ms", "calls"}} do mais caro para o mais barato (inclusivo; threads se sobrepõem)."""
+        with self._mu:
+            items = sorted(self.stages.items(), key=lambda kv: -kv[1][0])
+        return {k: {"ms": round(v[0] * 1000.0, 3), "calls": int(v[1])} for k, v in items}
+
+    def finish(self, status: str, error: Optional[str] = None) -> float:
+        dur = time.perf_counter() - self.t0
+        rec = {"type": "job_end", "run": self.run, "kind": self.kind, "status": status,
+               "dur_ms": round(dur * 1000.0, 3), "stages": self.summary()}
+        if error:
+            rec["error"] = error
+        self._write(rec)
+        if self._fh is not None:
+            with self._mu:
+                self._fh.close()
+                self._fh = None
+        return dur
+
+
+@contextmanager
+def job(job_dir: Path, kind: str, **attrs) -> Iterator[Optional[JobTrace]]:
+    """
+    Trace do job em <job_dir>/trace.jsonl (com DUBBER_TRACE=0 só conta a duração do job).
+    attrs + os labels ambientes (labels()) vão no registro de início.
+    """
+    labels = {**_labels.get(), **attrs}
+    jt = JobTrace(job_dir, kind, labels) if TRACE_ENABLED else None
+    tok = _job.set(jt)
+    t0 = time.perf_counter()
+    if jt is not None:
+        jt.start()
+    try:
+        yield jt
+    except BaseException as e:
+        if jt is not None:
+            jt.finish("failed", error=f"{type(e).__name__}: {e}")
+        Metrics.instance().observe("dubber_job_seconds", time.perf_counter() - t0, kind=kind)
+        raise
+    else:
+        if jt is not None:
+            jt.finish("done")
+        Metrics.instance().observe("dubber_job_seconds", time.perf_counter() - t0, kind=kind)
+    finally:
+        _reset(_job, tok)
+
+
+@contextmanager
+def labels(**kw) -> Iterator[None]:
+    """Labels ambientes (ex.: job_id da fila) copiados para o job_start dos traces abertos dentro."""
+    tok = _labels.set({**_labels.get(), **kw})
+    try:
+        yield
+    finally:
+        _reset(_labels, tok)
+
+
+def _reset(var: ContextVar, tok) -> None:
+    try:
+        var.reset(tok)
+    except ValueError:
+        # gerador retomado em outro contexto: o valor morre com ele
+        pass
+
+
+# ---------------- spans ----------------
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Dict[str, Any]]:
+    """
+    Cronometra o bloco como etapa `name`. Devolve o dict de atributos: o que o bloco
+    acrescentar nele (ex.: s["samples"] = n) vai junto para o trace.jsonl.
+    """
+    jt = _job.get()
+    parent = _span.get()
+    sid = next(_ids)
+    tok = _span.set(sid)
+    error = None
+    t0 = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        dur = time.perf_counter() - t0
+        _reset(_span, tok)
+        m = Metrics.instance()
+        m.observe("dubber_stage_seconds", dur, stage=name)
+        if error:
+            m.inc("dubber_stage_errors_total", stage=name)
+        if jt is not None:
+            jt.span(sid, parent, name, t0, dur, attrs, error)
+
+
+def timed(name: str) -> Callable[[Callable], Callable]:
+    """Decorador: a função inteira vira um span `name`."""
+    def deco(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def bind(fn: Callable) -> Callable:
+    """fn rodando no contexto atual (job/span pai), para passar a Thread/executor. Uma cópia por chamada."""
+    return functools.partial(copy_context().run, fn)
+
+
+def job_finished(kind: str, status: str) -> None:
+    """Chamado pela fila (app/scheduler.py) ao finalizar um job."""
+    Metrics.instance().inc("dubber_jobs_total", kind=kind, status=status)
+
+
+# ---------------- leitura ----------------
+
+def read_trace(path: Path, run: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Lê um trace.jsonl (ou a pasta do job): registros da execução `run` (padrão: a última).
+    Retorna {"run", "start", "end", "spans", "stages"}; sem job_end (job que caiu),
+    "stages" é somado a partir dos spans.
+    """
+    path = Path(path)
+    if path.is_dir():
+        path = path / TRACE_JSONL
+    runs: Dict[str, Dict[str, Any]] = {}
+    order: List[str] = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        try:
+            rec = json.loads(line)
+        except json.JSONDecodeError:
+            continue   # última linha cortada
+        rid = rec.get("run")
+        if rid not in runs:
+            runs[rid] = {"run": rid, "start": None, "end": None, "spans": []}
+            order.append(rid)
+        if rec.get("type") == "job_start":
+            runs[rid]["start"] = rec
+        elif rec.get("type") == "job_end":
+            runs[rid]["end"] = rec
+        elif rec.get("type") == "span":
+            runs[rid]["spans"].append(rec)
+    if not order:
+        raise ValueError(f"Trace vazio: {path}")
+    if run is not None and run not in runs:
+        raise ValueError(f"Execução '{run}' não está em {path}")
+    out = runs[run or order[-1]]
+    if out["end"] is not None:
+        out["stages"] = out["end"]["stages"]
+    else:
+        acc: Dict[str, List[float]] = {}
+        for s in out["spans"]:
+            st = acc.setdefault(s["name"], [0.0, 0])
+            st[0] += s["dur_ms"]
+            st[1] += 1
+        out["stages"] = {k: {"ms": round(v[0], 3), "calls": v[1]}
+                         for k, v in sorted(acc.items(), key=lambda kv: -kv[1][0])}
+    return out
+
+
+# ---------------- logs de erro ----------------
+
+def append_log(name: str, text: str, **context) -> None:
+    """
+    Acrescenta uma entrada com data/hora (e contexto, ex.: job=12) em LOGS_DIR/<name>.
+    Antes cada erro sobrescrevia o arquivo e só o último ficava. Nunca levanta.
+    """
+    from app.config import LOGS_DIR
+    head = time.strftime("%Y-%m-%d %H:%M:%S") + "".join(f" {k}={v}" for k, v in context.items())
+    try:
+        LOGS_DIR.mkdir(parents=True, exist_ok=True)
+        with (LOGS_DIR / name).open("a", encoding="utf-8") as f:
+            f.write(f"===== {head}\n{text.rstrip()}\n")
+    except Exception:
+        pass
+
+
+# ---------------- endpoint local (GUI) ----------------
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0].rstrip("/") != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        data = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def serve_metrics(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """GET /metrics numa thread daemon (processos sem o app/server.py, ex.: a GUI)."""
+    srv = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+    srv.daemon_threads = True
+    Thread(target=srv.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"[TRACE] métricas em http://{host}:{srv.server_address[1]}/metrics")
+    return srv
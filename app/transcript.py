@@ -0,0 +1,220 @@
+# app/transcript.py
+"""
+Transcrição com timestamps em formato colunar (arrays por campo, não um dict por palavra):
+leve para guardar em JSON, fácil de fatiar/deslocar e de reaproveitar em jobs
+que dependem de tempo (S2S, legendas) sem rodar o ASR de novo.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import json
+
+import numpy as np
+
+from app import trace
+
+TRANSCRIPT_JSON = "transcript.json"
+
+
+def _f64(values: Iterable[float]) -> np.ndarray:
+    return np.asarray(list(values), dtype=np.float64)
+
+
+@dataclass
+class Transcript:
+    language: Optional[str] = None
+    duration: float = 0.0
+    # segmentos
+    seg_start: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    seg_end: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    seg_text: List[str] = field(default_factory=list)
+    # palavras (word_seg = índice do segmento de cada palavra); vazios se sem word timestamps
+    word_start: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    word_end: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    word_text: List[str] = field(default_factory=list)
+    word_prob: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.float32))
+    word_seg: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int32))
+    # metadados livres (ex.: arquivo de origem, backend)
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+    # -------------- construção --------------
+    @classmethod
+    def from_segments(cls, segments: Iterable[Dict[str, Any]], language: Optional[str] = None,
+                      duration: float = 0.0, meta: Optional[Dict[str, Any]] = None) -> "Transcript":
+        """
+        segments: dicts {"start", "end", "text", "words"?: [{"start", "end", "word", "probability"?}]}
+        (formato do whisper; segmentos sem texto são descartados).
+        """
+        ss, se, st = [], [], []
+        ws, we, wt, wp, wg = [], [], [], [], []
+        for seg in segments:
+            text = (seg.get("text") or "").strip()
+            if not text:
+                continue
+            idx = len(st)
+            ss.append(float(seg["start"]))
+            se.append(float(seg["end"]))
+            st.append(text)
+            for w in seg.get("words") or ():
+                ws.append(float(w["start"]))
+                we.append(float(w["end"]))
+                wt.append(str(w.get("word") or w.get("text") or ""))
+                wp.append(float(w.get("probability", 1.0)))
+                wg.append(idx)
+        return cls(
+            language=language, duration=float(duration),
+            seg_start=_f64(ss), seg_end=_f64(se), seg_text=st,
+            word_start=_f64(ws), word_end=_f64(we), word_text=wt,
+            word_prob=np.asarray(wp, dtype=np.float32), word_seg=np.asarray(wg, dtype=np.int32),
+            meta=dict(meta or {}),
+        )
+
+    @classmethod
+    def concat(cls, parts: Sequence["Transcript"], offsets: Sequence[float],
+               duration: Optional[float] = None) -> "Transcript":
+        """Junta transcrições de janelas, somando o offset (s) de cada uma aos tempos."""
+        if not parts:
+            return cls(duration=float(duration or 0.0))
+        seg_base = np.cumsum([0] + [len(p) for p in parts[:-1]])
+        langs = [p.language for p in parts if p.language]
+        return cls(
+            language=max(set(langs), key=langs.count) if langs else None,
+            duration=float(duration if duration is not None else max(o + p.duration for p, o in zip(parts, offsets))),
+            seg_start=np.concatenate([p.seg_start + o for p, o in zip(parts, offsets)]),
+            seg_end=np.concatenate([p.seg_end + o for p, o in zip(parts, offsets)]),
+            seg_text=[t for p in parts for t in p.seg_text],
+            word_start=np.concatenate([p.word_start + o for p, o in zip(parts, offsets)]),
+            word_end=np.concatenate([p.word_end + o for p, o in zip(parts, offsets)]),
+            word_text=[t for p in parts for t in p.word_text],
+            word_prob=np.concatenate([p.word_prob for p in parts]).astype(np.float32),
+            word_seg=np.concatenate([p.word_seg + b for p, b in zip(parts, seg_base)]).astype(np.int32),
+            meta=dict(parts[0].meta),
+        )
+
+    # -------------- leitura --------------
+    def __len__(self) -> int:
+        return len(self.seg_text)
+
+    @property
+    def text(self) -> str:
+        return " ".join(self.seg_text).strip()
+
+    @property
+    def has_words(self) -> bool:
+        return len(self.word_text) > 0
+
+    def segments(self) -> Iterator[Tuple[float, float, str]]:
+        """(start, end, texto) por segmento."""
+        for s, e, t in zip(self.seg_start.tolist(), self.seg_end.tolist(), self.seg_text):
+            yield s, e, t
+
+    def words(self, seg_index: Optional[int] = None) -> Iterator[Tuple[float, float, str, float]]:
+        """(start, end, palavra, probabilidade), de todo o texto ou de um segmento."""
+        idx = range(len(self.word_text)) if seg_index is None else np.flatnonzero(self.word_seg == seg_index)
+        for i in idx:
+            yield float(self.word_start[i]), float(self.word_end[i]), self.word_text[i], float(self.word_prob[i])
+
+    def cues(self, max_chars: int = 84) -> Iterator[Tuple[float, float, str]]:
+        """
+        Blocos de legenda: um por segmento; segmentos longos são quebrados em
+        limites de palavra (quando há word timestamps) para caber em max_chars.
+        """
+        for i, (s, e, text) in enumerate(self.segments()):
+            words = list(self.words(i)) if self.has_words else []
+            if len(text) <= max_chars or not words:
+                yield s, e, text
+                continue
+            cur: List[Tuple[float, float, str, float]] = []
+            for w in words:
+                candidate = "".join(x[2] for x in cur + [w]).strip()
+                if cur and len(candidate) > max_chars:
+                    yield cur[0][0], cur[-1][1], "".join(x[2] for x in cur).strip()
+                    cur = []
+                cur.append(w)
+            if cur:
+                yield cur[0][0], cur[-1][1], "".join(x[2] for x in cur).strip()
+
+    # -------------- exportação --------------
+    def to_dict(self) -> Dict[str, Any]:
+        r = lambda a: [round(float(x), 3) for x in a]  # noqa: E731
+        d: Dict[str, Any] = {
+            "language": self.language,
+            "duration": round(float(self.duration), 3),
+            "text": self.text,
+            "segments": {"start": r(self.seg_start), "end": r(self.seg_end), "text": list(self.seg_text)},
+        }
+        if self.has_words:
+            d["words"] = {
+                "start": r(self.word_start), "end": r(self.word_end), "text": list(self.word_text),
+                "prob": [round(float(x), 3) for x in self.word_prob], "seg": self.word_seg.tolist(),
+            }
+        if self.meta:
+            d["meta"] = self.meta
+        return d
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Transcript":
+        seg = d.get("segments") or {}
+        words = d.get("words") or {}
+        return cls(
+            language=d.get("language"), duration=float(d.get("duration") or 0.0),
+            seg_start=_f64(seg.get("start", [])), seg_end=_f64(seg.get("end", [])),
+            seg_text=list(seg.get("text", [])),
+            word_start=_f64(words.get("start", [])), word_end=_f64(words.get("end", [])),
+            word_text=list(words.get("text", [])),
+            word_prob=np.asarray(words.get("prob", []), dtype=np.float32),
+            word_seg=np.asarray(words.get("seg", []), dtype=np.int32),
+            meta=dict(d.get("meta") or {}),
+        )
+
+    def save_json(self, path: Path) -> Path:
+        Path(path).write_text(json.dumps(self.to_dict(), ensure_ascii=False), encoding="utf-8")
+        return Path(path)
+
+    @classmethod
+    def load_json(cls, path: Path) -> "Transcript":
+        return cls.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
+
+    def to_srt(self, max_chars: int = 84) -> str:
+        blocks = []
+        for n, (s, e, text) in enumerate(self.cues(max_chars), start=1):
+            blocks.append(f"{n}\n{_timestamp(s, ',')} --> {_timestamp(e, ',')}\n{text}\n")
+        return "\n".join(blocks)
+
+    def to_vtt(self, max_chars: int = 84) -> str:
+        blocks = ["WEBVTT\n"]
+        for s, e, text in self.cues(max_chars):
+            blocks.append(f"{_timestamp(s, '.')} --> {_timestamp(e, '.')}\n{text}\n")
+        return "\n".join(blocks)
+
+
+def _timestamp(t: float, ms_sep: str) -> str:
+    ms = max(0, int(round(t * 1000)))
+    h, ms = divmod(ms, 3_600_000)
+    m, ms = divmod(ms, 60_000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}{ms_sep}{ms:03d}"
+
+
+def export_transcript(tr: Transcript, out_dir: Path, stem: str = "transcript",
+                      formats: Iterable[str] = ("txt", "json", "srt", "vtt")) -> Dict[str, str]:
+    """Grava os formatos pedidos em out_dir/<stem>.<ext>. Retorna {formato: caminho}."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    written: Dict[str, str] = {}
+    with trace.span("write.transcript", formats=list(formats)):
+        for fmt in formats:
+            path = out_dir / f"{stem}.{fmt}"
+            if fmt == "txt":
+                path.write_text(tr.text, encoding="utf-8")
+            elif fmt == "json":
+                tr.save_json(path)
+            elif fmt == "srt":
+                path.write_text(tr.to_srt(), encoding="utf-8")
+            elif fmt == "vtt":
+                path.write_text(tr.to_vtt(), encoding="utf-8")
+            else:
+                raise ValueError(f"Formato desconhecido: '{fmt}' (use txt, json, srt ou vtt)")
+            written[fmt] = str(path)
+    return written
@@ -0,0 +1,12 @@
+# app/utils/hashing.py
+from pathlib import Path
+import hashlib
+
+
+def file_sha1(path: Path, chunk_size: int = 1 << 20) -> str:
+    """SHA-1 do conteúdo do arquivo (lido em blocos)."""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
@@ -5,5 +5,12 @@ from app.config import PROJECTS_DIR
 def new_job_dir(prefix: str = "tts") -> Path:
     ts = datetime.now().strftime("%Y%m%d-%H%M%S")
     d = PROJECTS_DIR / f"{prefix}-{ts}"
-    d.mkdir(parents=True, exist_ok=True)
-    return d
+    # jobs em lote podem cair no mesmo segundo: sufixo -2, -3, ...
+    n = 1
+    while True:
+        try:
+            d.mkdir(parents=True, exist_ok=False)
+            return d
+        except FileExistsError:
+            n += 1
+            d = PROJECTS_DIR / f"{prefix}-{ts}-{n}"
@@ -1,10 +1,11 @@
-import json, shutil, uuid, subprocess
+import json, shutil, time, uuid, subprocess
 from dataclasses import dataclass, asdict
 from pathlib import Path
-from typing import List, Dict, Optional
+from threading import Lock
+from typing import List, Dict, Optional, Tuple
 
 from app.config import VOICES_DIR
-from app.audio.utils import sniff_media_type, ensure_wav_mono_22050
+from app.audio.utils import sniff_media_type, ensure_wav_mono_22050, require_audio
 from app.audio.validator import validate_voice_sample
 
 @dataclass
@@ -18,33 +19,124 @@ class BaseVoice:
     validation: Dict
 
 class VoiceManager:
+    """
+    Biblioteca de vozes: uma pasta por voz (<id>/voice.json + áudios) e um índice
+    único (<dir>/index.json) com todas as entradas.
+
+    Listar/buscar lê só o índice, e ele fica em memória (compartilhado entre
+    instâncias) enquanto o mtime da pasta não mudar. Criar/apagar uma pasta de voz
+    muda o mtime -> o índice é reconstruído varrendo os voice.json (O(N), 1x).
+    Edições manuais dentro de um voice.json não mudam o mtime da pasta: use refresh().
+    Uma pasta recente ainda sem voice.json é um cadastro em andamento (talvez de outro
+    processo): o índice dessa varredura não é confiável e a próxima leitura varre de novo.
+    """
+    INDEX_NAME = "index.json"
+    INDEX_VERSION = 1
+    PENDING_MAX_AGE_SEC = 600   # pasta sem voice.json mais velha que isso = cadastro que falhou
+
+    # cache em memória por pasta: path -> (mtime_ns da pasta, {id: BaseVoice})
+    _cache: Dict[str, Tuple[int, Dict[str, BaseVoice]]] = {}
+    _lock = Lock()
+
     def __init__(self, storage_dir: Path = VOICES_DIR):
         self.dir = storage_dir
         self.dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.dir / self.INDEX_NAME
 
     def _voice_dir(self, vid: str) -> Path:
         return self.dir / vid
 
-    def list_voices(self) -> List[BaseVoice]:
-        voices: List[BaseVoice] = []
-        for child in self.dir.iterdir():
-            if not child.is_dir(): 
+    # -------------- índice --------------
+    def _voices(self) -> Dict[str, BaseVoice]:
+        key = str(self.dir.resolve())
+        mtime = self.dir.stat().st_mtime_ns
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None and hit[0] == mtime:
+                return hit[1]
+            voices = self._read_index(mtime)
+            if voices is None:
+                voices, complete = self._scan()
+                mtime = self._write_index(voices, complete)
+            self._cache[key] = (mtime, voices)
+            return voices
+
+    def _read_index(self, mtime: int) -> Optional[Dict[str, BaseVoice]]:
+        """Índice do disco, se foi gravado com a pasta neste mesmo estado."""
+        try:
+            j = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if j.get("version") != self.INDEX_VERSION or j.get("dir_mtime_ns") != mtime:
+            return None
+        try:
+            return {v["id"]: BaseVoice(**v) for v in j.get("voices", [])}
+        except (KeyError, TypeError):
+            return None
+
+    def _scan(self) -> Tuple[Dict[str, BaseVoice], bool]:
+        """(vozes, completa). completa=False se há cadastro em andamento (pasta recente sem voice.json)."""
+        voices: Dict[str, BaseVoice] = {}
+        complete = True
+        for child in sorted(self.dir.iterdir()):
+            if not child.is_dir():
                 continue
             meta = child / "voice.json"
             if meta.exists():
                 try:
                     j = json.loads(meta.read_text(encoding="utf-8"))
-                    voices.append(BaseVoice(**j))
+                    voices[j["id"]] = BaseVoice(**j)
                 except Exception:
                     pass
-        return voices
+            elif time.time() - child.stat().st_mtime < self.PENDING_MAX_AGE_SEC:
+                complete = False
+        return voices, complete
+
+    def _write_index(self, voices: Dict[str, BaseVoice], complete: bool = True) -> Optional[int]:
+        """
+        Grava o índice com o mtime da pasta. O arquivo é criado antes de ler o mtime
+        (criar muda o mtime da pasta; reescrever um arquivo existente, não).
+        Retorna a chave do cache: o mtime, ou None se a varredura estava incompleta
+        (aí nem o índice nem o cache valem, e a próxima leitura varre de novo).
+        """
+        try:
+            self.index_path.touch(exist_ok=True)
+            mtime = self.dir.stat().st_mtime_ns
+            payload = {
+                "version": self.INDEX_VERSION,
+                "dir_mtime_ns": mtime if complete else None,
+                "voices": [asdict(v) for v in voices.values()],
+            }
+            self.index_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        except OSError as e:
+            # pasta somente leitura (ex.: drive compartilhado): segue só com o cache em memória
+            print(f"[VOICES] Não foi possível gravar o índice: {e}")
+            mtime = self.dir.stat().st_mtime_ns
+        return mtime if complete else None
+
+    def refresh(self) -> None:
+        """Descarta o índice e relê todos os voice.json."""
+        with self._lock:
+            voices, complete = self._scan()
+            mtime = self._write_index(voices, complete)
+            self._cache[str(self.dir.resolve())] = (mtime, voices)
+
+    # -------------- consulta --------------
+    def list_voices(self) -> List[BaseVoice]:
+        return list(self._voices().values())
 
     def get_voice(self, vid: str) -> Optional[BaseVoice]:
-        meta = self._voice_dir(vid) / "voice.json"
-        if not meta.exists():
-            return None
-        j = json.loads(meta.read_text(encoding="utf-8"))
-        return BaseVoice(**j)
+        return self._voices().get(vid)
+
+    def find_voices(self, query: str = "") -> List[BaseVoice]:
+        """Vozes cujo nome contém `query` (sem diferenciar maiúsculas); vazio = todas."""
+        q = (query or "").strip().casefold()
+        return [v for v in self._voices().values() if q in v.name.casefold()]
+
+    def find_by_name(self, name: str) -> List[BaseVoice]:
+        """Vozes com exatamente este nome (sem diferenciar maiúsculas/espaços nas bordas)."""
+        n = (name or "").strip().casefold()
+        return [v for v in self._voices().values() if v.name.strip().casefold() == n]
 
     def add_voice_from_file(self, src_path: Path, display_name: Optional[str] = None) -> BaseVoice:
         if not src_path.exists():
@@ -53,21 +145,29 @@ class VoiceManager:
         media = sniff_media_type(src_path)
         if media == "unknown":
             raise ValueError(f"Formato não suportado: {src_path.suffix}")
+        require_audio(src_path)
 
         vid = uuid.uuid4().hex[:8]
         vdir = self._voice_dir(vid)
+        self._voices()   # índice em dia com a pasta antes do mkdir
+        before = self.dir.stat().st_mtime_ns
         vdir.mkdir(parents=True, exist_ok=True)
+        after = self.dir.stat().st_mtime_ns
 
-        # salvar original
-        raw_dst = vdir / f"raw{src_path.suffix.lower()}"
-        shutil.copy2(src_path, raw_dst)
+        try:
+            # salvar original
+            raw_dst = vdir / f"raw{src_path.suffix.lower()}"
+            shutil.copy2(src_path, raw_dst)
 
-        # padronizar para clean.wav
-        clean_wav = vdir / "clean.wav"
-        ensure_wav_mono_22050(raw_dst, clean_wav)
+            # padronizar para clean.wav
+            clean_wav = vdir / "clean.wav"
+            ensure_wav_mono_22050(raw_dst, clean_wav)
 
-        # validar
-        validation = validate_voice_sample(clean_wav)
+            # validar
+            validation = validate_voice_sample(clean_wav)
+        except BaseException:
+            shutil.rmtree(vdir, ignore_errors=True)   # sem pasta órfã (seria "cadastro em andamento")
+            raise
 
         voice = BaseVoice(
             id=vid,
@@ -77,8 +177,26 @@ class VoiceManager:
             validation=validation
         )
         (vdir / "voice.json").write_text(json.dumps(asdict(voice), indent=2, ensure_ascii=False), encoding="utf-8")
+        self._index_add(voice, before, after)
         return voice
 
+    def _index_add(self, voice: BaseVoice, before: int, after: int) -> None:
+        """
+        Acrescenta a voz ao índice sem varrer as outras: relê o index.json sob o lock e
+        só confia nele se estava em dia antes do nosso mkdir (`before`) e se a pasta não
+        mudou depois dele (`after`). Se outro processo mexeu na pasta, varre (_scan).
+        """
+        with self._lock:
+            voices = None
+            if self.dir.stat().st_mtime_ns == after:
+                voices = self._read_index(before)
+            if voices is None:
+                voices, complete = self._scan()
+            else:
+                voices[voice.id] = voice
+                complete = True
+            self._cache[str(self.dir.resolve())] = (self._write_index(voices, complete), voices)
+
     def play_preview(self, vid: str) -> bool:
         voice = self.get_voice(vid)
         if not voice:
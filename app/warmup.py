@@ -0,0 +1,98 @@
+# app/warmup.py
+"""
+Pré-carregamento dos engines em background.
+
+Nada pesado (torch, Coqui TTS, whisper) é importado no startup da GUI: cada engine
+é carregado no primeiro uso. Para esse primeiro uso não esperar o modelo, a GUI
+pede aqui o engine que o usuário provavelmente vai usar em seguida (o do último job
+ou o da aba aberta) e ele é carregado numa thread daemon, 1x por processo.
+
+Alvos:
+  "xtts" -> XTTSEngine.instance()         (Texto -> Voz)
+  "asr"  -> ASREngine.instance() do backend (Transcrever)
+  "s2s"  -> S2SWorkerPool.instance()      (Áudio -> Voz; os processos carregam os modelos)
+"""
+from __future__ import annotations
+from threading import Lock, Thread
+from typing import Callable, List, Optional
+import time
+
+from app.config import WARMUP
+
+TARGETS = ("xtts", "asr", "s2s")
+_OFF = ("", "off", "0", "no", "false")
+
+_started: set = set()
+_lock = Lock()
+
+
+def enabled() -> bool:
+    return WARMUP not in _OFF
+
+
+def _load(target: str, asr_backend: str) -> None:
+    if target == "xtts":
+        from app.engines.tts_xtts import XTTSEngine
+        XTTSEngine.instance()
+    elif target == "asr":
+        from app.pipeline import _asr_engine
+        _asr_engine(asr_backend)
+    elif target == "s2s":
+        from app.engines.s2s_pool import S2SWorkerPool
+        S2SWorkerPool.instance()
+    else:
+        raise ValueError(f"Alvo de warm-up desconhecido: '{target}' (use {', '.join(TARGETS)})")
+
+
+def warm(target: str, asr_backend: str = "whisper",
+         on_done: Optional[Callable[[str, Optional[BaseException]], None]] = None) -> Optional[Thread]:
+    """
+    Carrega `target` numa thread daemon. Não faz nada (retorna None) se o alvo já foi
+    pedido antes neste processo. on_done(target, erro_ou_None) roda na thread do warm-up.
+    """
+    key = f"asr:{asr_backend}" if target == "asr" else target
+    with _lock:
+        if key in _started:
+            return None
+        _started.add(key)
+
+    def _run():
+        t0 = time.time()
+        err: Optional[BaseException] = None
+        try:
+            _load(target, asr_backend)
+            print(f"[WARMUP] {key} pronto em {time.time() - t0:.1f}s")
+        except BaseException as e:  # warm-up nunca derruba o app; o job real mostra o erro
+            err = e
+            print(f"[WARMUP] {key} falhou: {e}")
+        if on_done is not None:
+            try:
+                on_done(target, err)
+            except Exception:
+                pass
+
+    th = Thread(target=_run, name=f"warmup-{key}", daemon=True)
+    th.start()
+    return th
+
+
+def guess_next(asr_backend: str = "whisper") -> List[tuple]:
+    """
+    Alvos do DUBBER_WARMUP como [(alvo, asr_backend)]. Em "auto", o engine do
+    job mais recente da fila (o usuário tende a repetir o que fez por último).
+    asr_backend: backend usado quando o job/lista não diz qual.
+    """
+    if not enabled():
+        return []
+    if WARMUP != "auto":
+        return [(t.strip(), asr_backend) for t in WARMUP.split(",") if t.strip() in TARGETS]
+    try:
+        from app.scheduler import JobScheduler
+        jobs = JobScheduler().list(limit=1)   # só consulta (não inicia o despachante)
+    except Exception:
+        return []
+    if not jobs or jobs[0].engine not in TARGETS:
+        return []
+    job = jobs[0]
+    return [(job.engine, str(job.payload.get("asr_backend") or asr_backend))]
+
@@ -0,0 +1,98 @@
+# bench/fixtures.py
+"""
+Entradas sintéticas e determinísticas para os benchmarks (mesmos parâmetros -> mesmos bytes).
+Os arquivos ficam em cache em bench/.fixtures (ou no diretório passado).
+"""
+from __future__ import annotations
+from pathlib import Path
+import random
+
+import numpy as np
+import soundfile as sf
+
+FIXTURE_DIR = Path(__file__).resolve().parent / ".fixtures"
+
+_WORDS = (
+    "casa tempo vida dia mundo trabalho parte projeto pessoa cidade empresa sistema "
+    "voz áudio gravação reunião equipe cliente produto mercado relatório semana "
+    "rápido claro novo grande importante simples possível final próximo seguinte "
+    "fala mostra precisa começa termina ajuda funciona continua"
+).split()
+
+
+def sentences(n: int, seed: int = 0, min_words: int = 6, max_words: int = 14) -> list[str]:
+    """n frases em português (vocabulário fixo), terminadas em ponto."""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(max(0, int(n))):
+        words = [rng.choice(_WORDS) for _ in range(rng.randint(min_words, max_words))]
+        out.append(" ".join(words).capitalize() + ".")
+    return out
+
+
+def script(n: int, seed: int = 0) -> str:
+    """Texto com n frases (o XTTS divide nos pontos finais)."""
+    return " ".join(sentences(n, seed))
+
+
+# ---------------- sinais ----------------
+
+def sine(seconds: float, sr: int, freq: float = 220.0, amp: float = 0.3) -> np.ndarray:
+    t = np.arange(int(round(seconds * sr)), dtype=np.float64) / sr
+    return (amp * np.sin(2.0 * np.pi * freq * t)).astype(np.float32)
+
+
+def noise(seconds: float, sr: int, seed: int = 0, amp: float = 0.1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return (amp * rng.standard_normal(int(round(seconds * sr)))).astype(np.float32)
+
+
+def speech_like(seconds: float, sr: int, seed: int = 0) -> np.ndarray:
+    """
+    "Fala" sintética: rajadas harmônicas de 0.2-0.6 s (f0 90-220 Hz, envelope de sílaba)
+    com pausas de 0.1-0.8 s e ruído de fundo baixo. Tem silêncios de verdade para o
+    VAD / split_on_silence e energia parecida com voz para loudness/estatísticas.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(round(seconds * sr))
+    out = np.zeros(n, dtype=np.float32)
+    pos = int(0.2 * sr)
+    while pos < n:
+        dur = int(rng.uniform(0.2, 0.6) * sr)
+        seg_n = min(dur, n - pos)
+        t = np.arange(seg_n) / sr
+        f0 = rng.uniform(90.0, 220.0)
+        tone = sum((0.5 / k) * np.sin(2.0 * np.pi * f0 * k * t + rng.uniform(0, 6.28)) for k in range(1, 6))
+        env = np.sin(np.pi * np.arange(seg_n) / max(1, dur)) ** 2
+        out[pos:pos + seg_n] += (0.35 * tone * env).astype(np.float32)
+        pos += dur + int(rng.uniform(0.1, 0.8) * sr)
+    out += noise(seconds, sr, seed + 1, amp=0.003)[:n]
+    return np.clip(out, -1.0, 1.0)
+
+
+# ---------------- arquivos ----------------
+
+def wav(kind: str, seconds: float, sr: int, seed: int = 0, channels: int = 1,
+        root: Path | None = None) -> Path:
+    """WAV PCM 16-bit de `kind` (sine | noise | speech); reaproveita se já existir."""
+    root = Path(root or FIXTURE_DIR)
+    path = root / f"{kind}_{seconds:g}s_{sr}hz_{channels}ch_s{seed}.wav"
+    if path.exists():
+        return path
+    gen = {"sine": lambda: sine(seconds, sr), "noise": lambda: noise(seconds, sr, seed),
+           "speech": lambda: speech_like(seconds, sr, seed)}
+    if kind not in gen:
+        raise ValueError(f"Fixture desconhecida: '{kind}' (use sine, noise ou speech)")
+    y = gen[kind]()
+    if channels > 1:
+        y = np.repeat(y[:, None], channels, axis=1)
+    root.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp.wav")
+    sf.write(str(tmp), y, sr, subtype="PCM_16")
+    tmp.replace(path)
+    return path
+
+
+def voice_sample(root: Path | None = None) -> Path:
+    """Referência de voz para XTTS/S2S: 10 s de "fala" mono 22.05 kHz."""
+    return wav("speech", 10.0, 22050, seed=7, root=root)
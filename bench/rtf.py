@@ -0,0 +1,414 @@
+# bench/rtf.py
+"""
+Fator de tempo real (RTF) de cada engine e de cada etapa de pós-processamento.
+
+Uso:
+  python bench/rtf.py --stub                          # offline: modelos falsos (bench/stubs.py)
+  python bench/rtf.py --only tts --only s2s --sentences 20 --repeat 5
+  python bench/rtf.py --stub --json atual.json --compare base.json
+
+Benchmarks (entradas sintéticas e determinísticas de bench/fixtures.py):
+  tts         XTTSEngine.synthesize_smart_to_file (script de --sentences frases, sem cache de segmentos)
+  asr         ASREngine.transcribe (fala sintética de --seconds)
+  s2s         VCEngine.convert (ASR + TTS + time-stretch por trecho)
+  speed_pitch apply_speed_pitch (ffmpeg e numpy)
+  mp3         wav_to_mp3
+  stats       measure_audio_stats
+
+Para cada um: tempo de parede (mediana de --repeat), RTF = parede / duração do áudio
+(< 1 = mais rápido que tempo real), pico de RSS do processo durante a execução
+(subprocessos do ffmpeg não entram) e o tempo por etapa. As etapas são funções do app
+cronometradas no lugar (inclusivas: uma etapa contém as que ela chama); no s2s elas
+rodam em threads sobrepostas, então a soma pode passar do tempo de parede.
+O carregamento do modelo (load_s) é medido à parte, na 1ª execução, que também serve
+de aquecimento e não entra nas estatísticas.
+
+Com --stub, torch / Coqui TTS / faster-whisper são trocados por geradores de sinal
+baratos: mede só a parte de DSP/E-S do app. Sem --stub, benchmarks cujo modelo não
+puder ser importado aparecem como "skipped"; os que quebram por outro motivo (ex.: sem
+ffmpeg) aparecem como "failed", os demais seguem e o código de saída é 1.
+"""
+from __future__ import annotations
+from pathlib import Path
+from threading import Event, Lock, Thread
+import argparse
+import functools
+import inspect
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+BENCHES = ("tts", "asr", "s2s", "speed_pitch", "mp3", "stats")
+
+
+# ---------------- memória ----------------
+
+def _rss_mb() -> float:
+    """RSS atual (Linux: /proc; senão o pico do getrusage)."""
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+class PeakRSS:
+    """Amostra o RSS numa thread (a cada `interval` s) enquanto o bloco `with` roda."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = Event()
+        self._thread: Thread | None = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "PeakRSS":
+        self.peak = _rss_mb()
+        self._thread = Thread(target=self._run, name="bench-rss", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_mb())
+
+
+# ---------------- etapas ----------------
+
+class StageTimer:
+    """
+    Cronometra funções do app trocando-as no lugar por um wrapper (restaura no __exit__).
+    targets: [(nome_da_etapa, objeto (módulo ou classe), atributo)].
+    Geradores são cronometrados a cada next() (o tempo do consumidor não conta).
+    """
+
+    def __init__(self, targets):
+        self.targets = list(targets)
+        self.seconds: dict[str, float] = {}
+        self.calls: dict[str, int] = {}
+        self._saved = []
+        self._lock = Lock()
+
+    def _add(self, stage: str, dt: float, calls: int = 1) -> None:
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + dt
+            self.calls[stage] = self.calls.get(stage, 0) + calls
+
+    def _wrap(self, stage: str, fn):
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def gen_wrapper(*args, **kwargs):
+                it = fn(*args, **kwargs)
+                self._add(stage, 0.0)
+                while True:
+                    t0 = time.perf_counter()
+                    try:
+                        item = next(it)
+                    except StopIteration:
+                        self._add(stage, time.perf_counter() - t0, calls=0)
+                        return
+                    self._add(stage, time.perf_counter() - t0, calls=0)
+                    yield item
+            return gen_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._add(stage, time.perf_counter() - t0)
+        return wrapper
+
+    def reset(self) -> None:
+        with self._lock:
+            self.seconds.clear()
+            self.calls.clear()
+
+    def __enter__(self) -> "StageTimer":
+        for stage, owner, attr in self.targets:
+            fn = inspect.getattr_static(owner, attr)
+            self._saved.append((owner, attr, fn))
+            setattr(owner, attr, self._wrap(stage, getattr(owner, attr)))
+        return self
+
+    def __exit__(self, *exc) -> None:
+        for owner, attr, fn in reversed(self._saved):
+            setattr(owner, attr, fn)
+        self._saved.clear()
+
+
+# ---------------- benchmarks ----------------
+# Cada setup_* devolve (run, audio_seconds, stages): run(out_dir) executa uma vez;
+# stages = alvos do StageTimer. Imports dos engines ficam aqui dentro (podem faltar).
+
+def _duration(path: Path) -> float:
+    import soundfile as sf
+    info = sf.info(str(path))
+    return info.frames / float(info.samplerate)
+
+
+def setup_tts(args, fx):
+    from app.engines import tts_xtts
+    from app.engines.tts_xtts import XTTSEngine
+
+    text = fx.script(args.sentences, seed=args.seed)
+    voice = Path(args.voice) if args.voice else fx.voice_sample()
+    engine = XTTSEngine.instance()
+    engine.segment_cache.max_bytes = 0   # mede a síntese, não o cache em disco
+    out = {}
+
+    def run(out_dir: Path) -> None:
+        out["wav"] = engine.synthesize_smart_to_file(text, voice, args.lang, out_dir / "tts.wav")
+
+    stages = [
+        ("synthesize_smart_to_array", XTTSEngine, "synthesize_smart_to_array"),
+        ("tts_model_segment", XTTSEngine, "_tts_model_nosplit"),
+        ("join_with_silence", tts_xtts, "_join_with_silence"),
+        ("write_wav", tts_xtts.sf, "write"),
+    ]
+    # a duração só é conhecida depois da 1ª síntese
+    return run, lambda: _duration(out["wav"]), stages
+
+
+def setup_asr(args, fx):
+    from app.audio import utils
+    from app.engines.asr_whisper import ASREngine
+
+    src = fx.wav("speech", args.seconds, 44100, seed=args.seed)
+    engine = ASREngine.instance()
+
+    def run(out_dir: Path) -> None:
+        engine.transcribe(utils.ensure_wav_mono_16000(src, out_dir / "asr16k.wav"))
+
+    stages = [
+        ("ensure_wav_mono_16000", utils, "ensure_wav_mono_sr"),
+        ("transcribe", ASREngine, "transcribe"),
+    ]
+    return run, lambda: args.seconds, stages
+
+
+def setup_s2s(args, fx):
+    from app.audio.stream import StreamingWavWriter
+    from app.engines import vc_s2s
+    from app.engines.asr_whisper import ASREngine
+    from app.engines.tts_xtts import XTTSEngine
+
+    src = fx.wav("speech", args.seconds, 44100, seed=args.seed)
+    voice = Path(args.voice) if args.voice else fx.voice_sample()
+    XTTSEngine.instance().segment_cache.max_bytes = 0
+    ASREngine.instance()
+    vc = vc_s2s.VCEngine.instance()
+
+    def run(out_dir: Path) -> None:
+        vc.convert(src, voice, out_dir / "s2s.wav", language=args.lang)
+
+    stages = [
+        ("ensure_wav_mono_16000", vc_s2s, "ensure_wav_mono_16000"),
+        ("asr_segments", ASREngine, "iter_segments"),
+        ("tts", XTTSEngine, "synthesize_smart_to_array"),
+        ("fit_segment", vc_s2s, "_fit_segment"),
+        ("time_stretch", vc_s2s, "time_stretch"),
+        ("resample", vc_s2s, "_resample_to"),
+        ("write_wav", StreamingWavWriter, "append"),
+    ]
+    return run, lambda: args.seconds, stages
+
+
+def setup_speed_pitch(args, fx):
+    from app.audio import post, stretch
+
+    src = fx.wav("speech", args.seconds, 22050, seed=args.seed)
+
+    def run(out_dir: Path) -> None:
+        post.apply_speed_pitch(src, out_dir / "sp_ffmpeg.wav", speed=1.15, semitones=2, backend="ffmpeg")
+        post.apply_speed_pitch(src, out_dir / "sp_numpy.wav", speed=1.15, semitones=2, backend="numpy")
+
+    stages = [
+        ("ffmpeg", post, "_run_ffmpeg"),
+        ("numpy_pitch_shift", stretch, "pitch_shift"),
+        ("numpy_time_stretch", stretch, "time_stretch"),
+        ("numpy_resample", stretch, "resample"),
+    ]
+    return run, lambda: args.seconds, stages
+
+
+def setup_mp3(args, fx):
+    from app.audio import post
+
+    src = fx.wav("speech", args.seconds, 44100, seed=args.seed)
+
+    def run(out_dir: Path) -> None:
+        post.wav_to_mp3(src, out_dir / "out.mp3")
+
+    return run, lambda: args.seconds, [("ffmpeg", post, "_run_ffmpeg")]
+
+
+def setup_stats(args, fx):
+    from app.audio import utils
+
+    src = fx.wav("speech", args.seconds, 44100, seed=args.seed)
+
+    def run(out_dir: Path) -> None:
+        utils.measure_audio_stats(src)
+
+    stages = [
+        ("read_blocks", utils, "_iter_mono_blocks"),
+        ("gated_loudness", utils, "_gated_loudness"),
+    ]
+    return run, lambda: args.seconds, stages
+
+
+SETUPS = {
+    "tts": setup_tts, "asr": setup_asr, "s2s": setup_s2s,
+    "speed_pitch": setup_speed_pitch, "mp3": setup_mp3, "stats": setup_stats,
+}
+
+
+def run_bench(name: str, args, fx) -> dict:
+    """Executa um benchmark; erros de import (modelo ausente) viram 'skipped', os demais 'failed'."""
+    try:
+        return _measure(name, args, fx)
+    except ImportError as e:
+        return {"status": "skipped", "reason": f"{type(e).__name__}: {e}"}
+    except Exception as e:
+        traceback.print_exc()
+        return {"status": "failed", "reason": f"{type(e).__name__}: {e}"}
+
+
+def _measure(name: str, args, fx) -> dict:
+    t0 = time.perf_counter()
+    run, audio_seconds, targets = SETUPS[name](args, fx)
+    load_s = time.perf_counter() - t0
+
+    walls, rss, per_run = [], [], []
+    with tempfile.TemporaryDirectory(prefix=f"bench_{name}_") as tmp:
+        out_dir = Path(tmp)
+        run(out_dir)   # aquecimento (1ª chamada paga alocações/caches do SO)
+        with StageTimer(targets) as timer:
+            for _ in range(max(1, args.repeat)):
+                timer.reset()
+                with PeakRSS() as mem:
+                    t0 = time.perf_counter()
+                    run(out_dir)
+                    walls.append(time.perf_counter() - t0)
+                rss.append(mem.peak)
+                per_run.append((dict(timer.seconds), dict(timer.calls)))
+        audio_s = float(audio_seconds())
+
+    wall = statistics.median(walls)
+    n = len(per_run)
+    stages = {}
+    for stage in dict.fromkeys(st for st, _, _ in targets):
+        secs = [r[0].get(stage, 0.0) for r in per_run]
+        calls = [r[1].get(stage, 0) for r in per_run]
+        if not any(calls) and not any(secs):
+            continue
+        mean = sum(secs) / n
+        stages[stage] = {
+            "seconds": round(mean, 4),
+            "calls": round(sum(calls) / n, 1),
+            "share": round(mean / wall, 3) if wall > 0 else None,
+        }
+    return {
+        "status": "ok",
+        "audio_s": round(audio_s, 3),
+        "load_s": round(load_s, 3),
+        "wall_s": round(wall, 4),
+        "wall_min_s": round(min(walls), 4),
+        "rtf": round(wall / audio_s, 4) if audio_s > 0 else None,
+        "peak_rss_mb": round(max(rss), 1),
+        "stages": stages,
+    }
+
+
+# ---------------- relatório ----------------
+
+def _git_commit() -> str | None:
+    try:
+        p = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=str(ROOT),
+                           capture_output=True, text=True, timeout=5)
+        return p.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _meta(args) -> dict:
+    from app.threads import available_cores
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cores": available_cores(),
+        "commit": _git_commit(),
+        "stub": bool(args.stub),
+        "args": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+    }
+
+
+def print_report(result: dict, base: dict | None = None) -> None:
+    for name, r in result["benches"].items():
+        if r["status"] != "ok":
+            print(f"{name:<12} {r['status']} ({r['reason']})")
+            continue
+        line = (f"{name:<12} wall {r['wall_s']:8.3f} s  RTF {r['rtf']:7.4f}  "
+                f"RSS {r['peak_rss_mb']:7.1f} MB  load {r['load_s']:.2f} s")
+        old = (base or {}).get("benches", {}).get(name, {})
+        if old.get("status") == "ok" and old.get("wall_s"):
+            line += f"  ({(r['wall_s'] / old['wall_s'] - 1.0) * 100.0:+.1f}% vs base)"
+        print(line)
+        for stage, s in sorted(r["stages"].items(), key=lambda kv: -kv[1]["seconds"]):
+            share = f"{s['share'] * 100:5.1f}%" if s["share"] is not None else "   ? "
+            print(f"    {stage:<28} {s['seconds']:8.4f} s  {share}  x{s['calls']:g}")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="RTF, memória e tempo por etapa dos engines e do pós-processamento.")
+    ap.add_argument("--only", action="append", choices=BENCHES, help="roda só estes (repetível)")
+    ap.add_argument("--stub", action="store_true", help="troca torch/TTS/faster-whisper por modelos falsos (offline)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seconds", type=float, default=30.0, help="duração das entradas de áudio sintéticas")
+    ap.add_argument("--sentences", type=int, default=10, help="frases do script do tts")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--lang", default="pt")
+    ap.add_argument("--voice", type=Path, help="WAV de referência (padrão: fala sintética de 10 s)")
+    ap.add_argument("--json", type=Path, help="grava o resultado em JSON")
+    ap.add_argument("--compare", type=Path, help="JSON de uma execução anterior para comparar o tempo")
+    args = ap.parse_args(argv)
+
+    if args.stub:
+        from bench import stubs
+        stubs.install()
+    from bench import fixtures
+
+    base = json.loads(args.compare.read_text(encoding="utf-8")) if args.compare else None
+    result = {"meta": _meta(args), "benches": {}}
+    for name in args.only or BENCHES:
+        print(f"[BENCH] {name} ...", flush=True)
+        result["benches"][name] = run_bench(name, args, fixtures)
+
+    print()
+    print_report(result, base)
+    if args.json:
+        args.json.write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+    return 1 if any(r["status"] == "failed" for r in result["benches"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+# bench/startup.py
+"""
+Custo de import no startup, por módulo (python -X importtime num processo novo).
+
+Uso:
+  python bench/startup.py                      # app.main (GUI)
+  python bench/startup.py -m app.cli -m app.server --repeat 5
+  python bench/startup.py --json out.json --max-ms 800
+
+Para cada módulo-alvo mede o tempo total do import (mediana de --repeat execuções)
+e lista os imports mais caros (tempo acumulado). Também verifica se algum módulo
+pesado (torch, TTS, whisper...) foi carregado: no startup eles devem ser lazy.
+Código de saída 1 se um alvo falhar, passar de --max-ms ou carregar um módulo pesado.
+"""
+from __future__ import annotations
+from pathlib import Path
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# módulos que só podem ser importados no 1º uso do engine
+HEAVY = ("torch", "TTS", "whisper", "faster_whisper", "ctranslate2", "librosa", "transformers")
+
+
+def _importtime(module: str) -> dict:
+    """Um import de `module` num interpretador novo; devolve tempos por módulo (ms)."""
+    code = f"import {module}"
+    p = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                       cwd=str(ROOT), capture_output=True, text=True)
+    rows = []
+    for line in p.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+            rows.append((name.rstrip(), int(self_us), int(cum_us)))
+        except ValueError:
+            continue
+    error = None
+    if p.returncode != 0:
+        error = (p.stderr.strip().splitlines() or ["?"])[-1]
+    # tempo total = acumulado da linha do próprio alvo (a última com o seu nome)
+    top = next((cum for name, _, cum in reversed(rows) if name.strip() == module), None)
+    loaded = {name.strip() for name, _, _ in rows}
+    return {
+        "total_ms": round((top if top is not None else sum(s for _, s, _ in rows)) / 1000.0, 2),
+        "rows": rows,
+        "heavy_loaded": sorted(h for h in HEAVY if h in loaded),
+        "error": error,
+    }
+
+
+def bench_module(module: str, repeat: int = 3, top: int = 15) -> dict:
+    runs = [_importtime(module) for _ in range(max(1, repeat))]
+    last = runs[-1]
+    # custo acumulado por módulo (depth = nível de aninhamento no import)
+    by_mod = sorted(((name.strip(), cum / 1000.0, self_us / 1000.0, len(name) - len(name.lstrip()))
+                     for name, self_us, cum in last["rows"]), key=lambda r: -r[1])
+    by_pkg: dict = {}
+    for name, self_us, _ in last["rows"]:
+        pkg = name.strip().split(".")[0]
+        by_pkg[pkg] = by_pkg.get(pkg, 0.0) + self_us / 1000.0
+    return {
+        "module": module,
+        "median_ms": round(statistics.median(r["total_ms"] for r in runs), 2),
+        "runs_ms": [r["total_ms"] for r in runs],
+        "heavy_loaded": last["heavy_loaded"],
+        "error": last["error"],
+        "top_modules": [{"module": n, "cumulative_ms": round(c, 2), "self_ms": round(s, 2), "depth": d // 2}
+                        for n, c, s, d in by_mod[:top]],
+        "by_package_ms": {k: round(v, 2) for k, v in sorted(by_pkg.items(), key=lambda kv: -kv[1])[:top]},
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Tempo de import no startup, por módulo.")
+    ap.add_argument("-m", "--module", action="append", help="módulo-alvo (repetível; padrão: app.main)")
+    ap.add_argument("--repeat", type=int, default=3, help="execuções por alvo (mediana)")
+    ap.add_argument("--top", type=int, default=15, help="quantos imports listar")
+    ap.add_argument("--max-ms", type=float, default=0.0, help="falha se a mediana passar disso (0 = sem limite)")
+    ap.add_argument("--json", type=Path, help="grava o resultado em JSON")
+    args = ap.parse_args(argv)
+
+    results = [bench_module(m, args.repeat, args.top) for m in (args.module or ["app.main"])]
+    failed = False
+    for r in results:
+        print(f"\n== {r['module']}: {r['median_ms']:.1f} ms (runs: {r['runs_ms']})")
+        if r["error"]:
+            print(f"   ERRO no import: {r['error']}")
+            failed = True
+        for row in r["top_modules"]:
+            print(f"   {row['cumulative_ms']:9.1f} ms  {'  ' * row['depth']}{row['module']}")
+        if r["heavy_loaded"]:
+            print(f"   !! módulos pesados carregados no startup: {', '.join(r['heavy_loaded'])}")
+            failed = True
+        if args.max_ms and r["median_ms"] > args.max_ms:
+            print(f"   !! acima do limite de {args.max_ms:.0f} ms")
+            failed = True
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+# bench/stubs.py
+"""
+Modelos falsos para rodar os benchmarks offline (sem torch, Coqui TTS nem faster-whisper).
+
+install() registra em sys.modules módulos mínimos `torch`, `TTS`/`TTS.api` e
+`faster_whisper` com a MESMA superfície que os engines do app usam. Assim o código
+real de XTTSEngine / ASREngine / VCEngine roda inteiro (segmentação, junção, DSP,
+escrita, filas, threads) e só a inferência vira um gerador de sinal barato e
+determinístico. O tempo medido é o do app, não o do modelo.
+
+Tem que ser chamado ANTES de importar app.engines.*.
+"""
+from __future__ import annotations
+from contextlib import ContextDecorator
+from types import ModuleType, SimpleNamespace
+import sys
+import zlib
+
+import numpy as np
+
+from bench.fixtures import sentences, speech_like
+
+STUB_VERSION = "stub"
+TTS_SR = 22050
+TTS_SEC_PER_CHAR = 0.065   # ~15 caracteres por segundo, ritmo de fala
+ASR_SEGMENT_SEC = 4.0
+
+
+# ---------------- torch ----------------
+
+class _InferenceMode(ContextDecorator):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def _torch_module() -> ModuleType:
+    torch = ModuleType("torch")
+    torch.__version__ = STUB_VERSION
+    torch.__stub__ = True
+    threads = {"n": 1}
+    torch.get_num_threads = lambda: threads["n"]
+    torch.set_num_threads = lambda n: threads.__setitem__("n", int(n))
+    torch.set_num_interop_threads = lambda n: None
+    torch.manual_seed = lambda seed: None
+    torch.inference_mode = lambda *a, **k: _InferenceMode()
+    torch.no_grad = lambda *a, **k: _InferenceMode()
+    torch.Tensor = np.ndarray
+    torch.long = np.int64
+
+    nn = ModuleType("torch.nn")
+
+    class Module:  # só para as classes do app que herdam de nn.Module poderem ser definidas
+        def __init__(self, *a, **k):
+            pass
+
+    nn.Module = Module
+    nn.Linear = type("Linear", (Module,), {})
+    functional = ModuleType("torch.nn.functional")
+    nn.functional = functional
+    torch.nn = nn
+    torch.backends = SimpleNamespace(quantized=SimpleNamespace(supported_engines=[], engine=None))
+    return torch
+
+
+# ---------------- Coqui TTS ----------------
+
+class StubTTS:
+    """Imita TTS.api.TTS: tts() devolve "fala" sintética com duração proporcional ao texto."""
+
+    def __init__(self, model_name: str = "", *a, **k):
+        self.model_name = model_name
+        # tts_model=None: o XTTSEngine usa o caminho tts.tts() (sem latentes/lotes)
+        self.synthesizer = SimpleNamespace(tts_model=None, output_sample_rate=TTS_SR)
+
+    def to(self, device):
+        return self
+
+    def tts(self, text: str, speaker_wav=None, language=None, **kwargs):
+        text = (text or "").strip()
+        seconds = max(0.3, len(text) * TTS_SEC_PER_CHAR)
+        return speech_like(seconds, TTS_SR, seed=zlib.crc32(text.encode("utf-8")) & 0xFFFF)
+
+
+def _tts_modules() -> dict:
+    pkg = ModuleType("TTS")
+    pkg.__version__ = STUB_VERSION
+    api = ModuleType("TTS.api")
+    api.TTS = StubTTS
+    pkg.api = api
+    return {"TTS": pkg, "TTS.api": api}
+
+
+# ---------------- faster-whisper ----------------
+
+def _duration_of(audio) -> float:
+    if isinstance(audio, np.ndarray):
+        return len(audio) / 16000.0
+    import soundfile as sf
+    info = sf.info(str(audio))
+    return info.frames / float(info.samplerate)
+
+
+class StubWhisperModel:
+    """Imita faster_whisper.WhisperModel: um segmento de texto fixo a cada ASR_SEGMENT_SEC."""
+
+    def __init__(self, *a, **k):
+        pass
+
+    def transcribe(self, audio, word_timestamps: bool = False, **kwargs):
+        duration = _duration_of(audio)
+        n = max(1, int(np.ceil(duration / ASR_SEGMENT_SEC)))
+        texts = sentences(n, seed=int(duration * 1000))
+
+        def gen():
+            for i, text in enumerate(texts):
+                start = i * ASR_SEGMENT_SEC
+                end = min(duration, start + ASR_SEGMENT_SEC * 0.9)
+                words = []
+                if word_timestamps:
+                    toks = text.split()
+                    step = (end - start) / max(1, len(toks))
+                    words = [SimpleNamespace(start=start + j * step, end=start + (j + 1) * step,
+                                             word=" " + w, probability=0.9) for j, w in enumerate(toks)]
+                yield SimpleNamespace(start=start, end=end, text=" " + text, words=words)
+
+        return gen(), SimpleNamespace(language="pt", duration=duration)
+
+
+def _faster_whisper_module() -> ModuleType:
+    fw = ModuleType("faster_whisper")
+    fw.WhisperModel = StubWhisperModel
+    return fw
+
+
+def install() -> None:
+    """
+    Registra os módulos falsos, substituindo o que houver em sys.modules (torch inclusive).
+    Pode ser chamado de novo; RuntimeError se os engines do app já foram importados com
+    o torch real (eles ficariam presos aos módulos reais).
+    """
+    if "app.engines.tts_xtts" in sys.modules and not getattr(sys.modules.get("torch"), "__stub__", False):
+        raise RuntimeError("stubs.install() precisa rodar antes de importar os engines do app.")
+    torch = _torch_module()
+    sys.modules.update({
+        "torch": torch,
+        "torch.nn": torch.nn,
+        "torch.nn.functional": torch.nn.functional,
+        **_tts_modules(),
+        "faster_whisper": _faster_whisper_module(),
+    })
+
+
+def installed() -> bool:
+    return getattr(sys.modules.get("torch"), "__stub__", False)
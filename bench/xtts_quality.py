@@ -0,0 +1,256 @@
+# bench/xtts_quality.py
+"""
+Qualidade e custo de um backend otimizado do XTTS (int8 / onnx) contra o fp32.
+
+Uso:
+  python bench/xtts_quality.py --voice "Minha voz" --backend int8
+  python bench/xtts_quality.py --voice data/voices/ab12cd34/clean.wav --backend int8+onnx \
+      --sentences frases.txt --json out.json
+
+Um único modelo é carregado: primeiro roda tudo em fp32, depois aplica o backend no
+lugar (app/engines/xtts_optimize.py) e roda as mesmas frases com as mesmas seeds.
+Mede por frase: latência, duração, diferença de nível (dB) e distância log-mel alinhada
+por DTW (dB; o int8 muda a amostragem token a token, então as ondas não batem amostra a
+amostra). Com "onnx", mede também o SNR do decoder sozinho (mesmos latentes nos dois).
+Depois do backend aplicado, os latentes de uma voz "nova" (cópia do WAV, fora de
+qualquer cache) são calculados de novo: o backend não pode quebrar o cadastro de vozes.
+Memória: RSS do processo após cada fase (o alocador nem sempre devolve ao SO a memória
+dos pesos fp32 trocados; para o ganho exato de RAM, rode o app com cada backend).
+Código de saída 1 se passar de --max-mel-db ou ficar abaixo de --min-decoder-snr.
+"""
+from __future__ import annotations
+from pathlib import Path
+import argparse
+import gc
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bench.rtf import _rss_mb  # noqa: E402
+
+DEFAULT_SENTENCES = [
+    "Bom dia, este é um teste de síntese de voz.",
+    "O relatório trimestral mostra crescimento de doze por cento nas vendas.",
+    "Você pode repetir, por favor? Eu não entendi a última parte.",
+    "A reunião foi adiada para quinta-feira, às três e meia da tarde.",
+    "Obrigado por assistir; até o próximo episódio!",
+]
+
+
+# ---------------- métricas ----------------
+
+def _mel_filterbank(sr: int, n_fft: int, n_mels: int = 80) -> np.ndarray:
+    def hz_to_mel(f):
+        return 2595.0 * np.log10(1.0 + f / 700.0)
+
+    def mel_to_hz(m):
+        return 700.0 * (10.0 ** (m / 2595.0) - 1.0)
+
+    mels = np.linspace(hz_to_mel(0.0), hz_to_mel(sr / 2.0), n_mels + 2)
+    bins = np.floor((n_fft + 1) * mel_to_hz(mels) / sr).astype(int)
+    fb = np.zeros((n_mels, n_fft // 2 + 1), dtype=np.float32)
+    for i in range(1, n_mels + 1):
+        lo, mid, hi = bins[i - 1], bins[i], bins[i + 1]
+        if mid > lo:
+            fb[i - 1, lo:mid] = (np.arange(lo, mid) - lo) / (mid - lo)
+        if hi > mid:
+            fb[i - 1, mid:hi] = (hi - np.arange(mid, hi)) / (hi - mid)
+    return fb
+
+
+def log_mel(wav: np.ndarray, sr: int, n_fft: int = 1024, hop: int = 256) -> np.ndarray:
+    """[frames, 80] em dB."""
+    wav = np.asarray(wav, dtype=np.float32).reshape(-1)
+    if len(wav) < n_fft:
+        wav = np.pad(wav, (0, n_fft - len(wav)))
+    n = 1 + (len(wav) - n_fft) // hop
+    idx = np.arange(n_fft)[None, :] + hop * np.arange(n)[:, None]
+    spec = np.abs(np.fft.rfft(wav[idx] * np.hanning(n_fft).astype(np.float32), axis=1)) ** 2
+    return 10.0 * np.log10(spec @ _mel_filterbank(sr, n_fft).T + 1e-10)
+
+
+def dtw_mel_distance(a: np.ndarray, b: np.ndarray) -> float:
+    """Distância L1 média (dB por banda) entre dois log-mels, ao longo do caminho DTW."""
+    cost = np.abs(a[:, None, :] - b[None, :, :]).mean(axis=2)
+    n, m = cost.shape
+    acc = np.full((n + 1, m + 1), np.inf)
+    steps = np.zeros((n + 1, m + 1), dtype=np.int32)
+    acc[0, 0] = 0.0
+    for i in range(1, n + 1):
+        for j in range(1, m + 1):
+            prev = ((acc[i - 1, j - 1], steps[i - 1, j - 1]),
+                    (acc[i - 1, j], steps[i - 1, j]),
+                    (acc[i, j - 1], steps[i, j - 1]))
+            best, k = min(prev, key=lambda p: p[0])
+            acc[i, j] = best + cost[i - 1, j - 1]
+            steps[i, j] = k + 1
+    return float(acc[n, m] / max(1, steps[n, m]))
+
+
+def snr_db(ref: np.ndarray, test: np.ndarray) -> float:
+    n = min(len(ref), len(test))
+    ref, test = ref[:n], test[:n]
+    noise = float(np.sum((ref - test) ** 2))
+    return float("inf") if noise == 0.0 else 10.0 * np.log10(float(np.sum(ref ** 2)) / noise + 1e-20)
+
+
+def _rms_db(wav: np.ndarray) -> float:
+    return 20.0 * np.log10(float(np.sqrt(np.mean(np.square(wav)))) + 1e-9)
+
+
+# ---------------- execução ----------------
+
+def _synthesize_all(engine, sentences, speaker_wav: Path, language: str, seed: int):
+    import torch
+
+    outs = []
+    for k, text in enumerate(sentences):
+        torch.manual_seed(seed + k)
+        t0 = time.perf_counter()
+        wav, sr = engine._tts_model_nosplit(text, speaker_wav, language)   # sem o cache de segmentos
+        outs.append((wav, sr, time.perf_counter() - t0))
+    return outs
+
+
+def _decoder_probe(model, speaker_embedding, seed: int, frames: int = 200) -> np.ndarray:
+    """Saída do decoder para latentes fixos (mesma entrada para fp32 e onnx)."""
+    import torch
+
+    channels = int(getattr(getattr(model, "args", None), "gpt_n_model_channels", 1024))
+    gen = torch.Generator().manual_seed(seed)
+    latents = torch.randn(1, frames, channels, generator=gen) * 0.5
+    with torch.inference_mode():
+        wav = model.hifigan_decoder(latents, g=speaker_embedding)
+    return wav.detach().cpu().numpy().reshape(-1)
+
+
+def _fresh_embedding(engine, speaker_wav: Path):
+    """speaker_embedding de uma cópia do WAV (sem latentes em cache: passa pelo speaker_encoder)."""
+    with tempfile.TemporaryDirectory() as td:
+        copy = Path(td) / "fresh.wav"
+        shutil.copy2(speaker_wav, copy)
+        _, speaker_embedding = engine.speaker_latents(copy)
+    return speaker_embedding
+
+
+def _cosine(a, b) -> float:
+    a = a.detach().float().cpu().numpy().reshape(-1)
+    b = b.detach().float().cpu().numpy().reshape(-1)
+    return float(np.dot(a, b) / max(1e-12, np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def run(voice: str, backend: str, sentences, language: str, seed: int) -> dict:
+    from app.engines.tts_xtts import XTTSEngine
+    from app.engines.xtts_optimize import apply_backend, parse_backend
+
+    parse_backend(backend)   # erro de digitação antes de carregar o modelo
+    speaker_wav = Path(voice)
+    if not speaker_wav.exists():
+        from app.pipeline import resolve_voice
+        speaker_wav = Path(resolve_voice(voice).clean_wav)
+
+    rss0 = _rss_mb()
+    t0 = time.perf_counter()
+    engine = XTTSEngine(device="cpu", backend="fp32")
+    load_s = time.perf_counter() - t0
+    model = engine._model
+    _, speaker_embedding = engine.speaker_latents(speaker_wav)
+
+    engine._tts_model_nosplit("Aquecimento.", speaker_wav, language)   # 1ª chamada paga alocações
+    ref = _synthesize_all(engine, sentences, speaker_wav, language, seed)
+    dec_ref = _decoder_probe(model, speaker_embedding, seed) if "onnx" in parse_backend(backend) else None
+    gc.collect()
+    rss_fp32 = _rss_mb()
+
+    t0 = time.perf_counter()
+    engine.backend = apply_backend(model, backend, "cpu")
+    apply_s = time.perf_counter() - t0
+    if engine.backend == "fp32":
+        raise RuntimeError(f"Backend '{backend}' não pôde ser aplicado (veja o log acima).")
+    fresh_cos = _cosine(speaker_embedding, _fresh_embedding(engine, speaker_wav))
+    engine._tts_model_nosplit("Aquecimento.", speaker_wav, language)
+    opt = _synthesize_all(engine, sentences, speaker_wav, language, seed)
+    gc.collect()
+    rss_opt = _rss_mb()
+
+    rows = []
+    for text, (wa, sr, ta), (wb, _, tb) in zip(sentences, ref, opt):
+        rows.append({
+            "text": text,
+            "latency_fp32_s": round(ta, 3),
+            "latency_opt_s": round(tb, 3),
+            "speedup": round(ta / tb, 3) if tb > 0 else None,
+            "duration_fp32_s": round(len(wa) / sr, 3),
+            "duration_ratio": round(len(wb) / max(1, len(wa)), 3),
+            "level_diff_db": round(_rms_db(wb) - _rms_db(wa), 2),
+            "mel_dtw_db": round(dtw_mel_distance(log_mel(wa, sr), log_mel(wb, sr)), 3),
+        })
+    result = {
+        "backend": engine.backend,
+        "voice": str(speaker_wav),
+        "language": language,
+        "seed": seed,
+        "load_s": round(load_s, 2),
+        "apply_s": round(apply_s, 2),
+        "rss_mb": {"start": round(rss0, 1), "fp32": round(rss_fp32, 1), "optimized": round(rss_opt, 1)},
+        "summary": {
+            "speedup_median": round(statistics.median(r["speedup"] for r in rows), 3),
+            "mel_dtw_db_mean": round(statistics.mean(r["mel_dtw_db"] for r in rows), 3),
+            "mel_dtw_db_max": max(r["mel_dtw_db"] for r in rows),
+            "duration_ratio_median": round(statistics.median(r["duration_ratio"] for r in rows), 3),
+            "fresh_voice_embedding_cos": round(fresh_cos, 4),
+        },
+        "sentences": rows,
+    }
+    if dec_ref is not None:
+        result["summary"]["decoder_snr_db"] = round(snr_db(dec_ref, _decoder_probe(model, speaker_embedding, seed)), 2)
+    return result
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Compara um backend otimizado do XTTS com o fp32.")
+    ap.add_argument("--voice", required=True, help="id/nome da voz-base ou caminho de um WAV de referência")
+    ap.add_argument("--backend", default="int8", help="int8, onnx ou int8+onnx")
+    ap.add_argument("--sentences", type=Path, help="arquivo texto, uma frase por linha")
+    ap.add_argument("--lang", default="pt")
+    ap.add_argument("--seed", type=int, default=1234)
+    ap.add_argument("--max-mel-db", type=float, default=6.0,
+                    help="limite da distância log-mel média (dB) em relação ao fp32")
+    ap.add_argument("--min-decoder-snr", type=float, default=30.0,
+                    help="SNR mínimo (dB) do decoder ONNX em relação ao PyTorch")
+    ap.add_argument("--json", type=Path, help="grava o resultado em JSON")
+    args = ap.parse_args(argv)
+
+    sentences = DEFAULT_SENTENCES
+    if args.sentences:
+        sentences = [s.strip() for s in args.sentences.read_text(encoding="utf-8").splitlines() if s.strip()]
+
+    res = run(args.voice, args.backend, sentences, args.lang, args.seed)
+    for r in res["sentences"]:
+        print(f"{r['speedup']:>6.2f}x  mel {r['mel_dtw_db']:5.2f} dB  dur x{r['duration_ratio']:.2f}  {r['text'][:60]}")
+    s = res["summary"]
+    print(f"\n[{res['backend']}] speedup mediano {s['speedup_median']:.2f}x | "
+          f"log-mel {s['mel_dtw_db_mean']:.2f} dB (máx {s['mel_dtw_db_max']:.2f}) | "
+          f"RSS fp32 {res['rss_mb']['fp32']:.0f} MB -> {res['rss_mb']['optimized']:.0f} MB")
+    if "decoder_snr_db" in s:
+        print(f"decoder ONNX vs PyTorch: SNR {s['decoder_snr_db']:.1f} dB")
+    print(f"latentes de voz nova com o backend: cos {s['fresh_voice_embedding_cos']:.4f} vs fp32")
+    if args.json:
+        args.json.write_text(json.dumps(res, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    ok = s["mel_dtw_db_mean"] <= args.max_mel_db
+    if "decoder_snr_db" in s:
+        ok = ok and s["decoder_snr_db"] >= args.min_decoder_snr
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())